@@ -0,0 +1,34 @@
+"""Add partial index for messages pending Graphiti ingestion
+
+Revision ID: 3b9f2c7d41a8
+Revises: 111d3837be93
+Create Date: 2026-10-17 10:12:03.418522
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9f2c7d41a8'
+down_revision: Union[str, None] = '111d3837be93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_chat_message_graphiti_pending',
+        'chat_message',
+        ['created_at'],
+        unique=False,
+        postgresql_where=sa.text("processed_in_graphiti = false AND role <> 'assistant'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chat_message_graphiti_pending', table_name='chat_message')
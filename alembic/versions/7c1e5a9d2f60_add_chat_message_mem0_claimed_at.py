@@ -0,0 +1,36 @@
+"""Add mem0_claimed_at to chat messages
+
+Revision ID: 7c1e5a9d2f60
+Revises: 3b9f2c7d41a8
+Create Date: 2026-10-17 14:31:52.207614
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e5a9d2f60'
+down_revision: Union[str, None] = '3b9f2c7d41a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'chat_message',
+        sa.Column(
+            'mem0_claimed_at',
+            sa.DateTime(timezone=True),
+            nullable=True,
+            comment='When a worker claimed the message for Mem0 ingestion',
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('chat_message', 'mem0_claimed_at')
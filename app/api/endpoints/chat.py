@@ -1,9 +1,11 @@
 """Chat API endpoints for the digital twin."""
 
 from fastapi import APIRouter, Depends, Query, HTTPException, Request, Body
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import asyncio
+import json
 import logging
 from pydantic import BaseModel, Field
 from uuid import uuid4
@@ -12,6 +14,7 @@ from app.api.deps import get_current_user, get_db, security, get_current_user_or
 from app.services.agent.graph_agent import TwinAgent
 from app.core.config import settings
 from app.core.constants import DEFAULT_USER
+from app.db.session import AsyncSessionLocal
 from app.db.models.chat_message import MessageRole
 from app.services.conversation.service import ConversationService
 from app.worker.celery_app import celery_app
@@ -39,6 +42,96 @@ class ConversationResponse(BaseModel):
     updated_at: str
     message_count: int = 0
 
+async def _start_turn(
+    conversation_service: ConversationService, request: ChatRequest, user_id: str
+) -> Tuple[Any, str]:
+    """Get or create the request's conversation and store the user's message.
+    
+    Returns:
+        The conversation and the stored user message's ID
+    """
+    # Get or create conversation
+    conversation = None
+    if request.conversation_id:
+        conversation = await conversation_service.get_conversation(
+            conversation_id=request.conversation_id,
+            user_id=user_id
+        )
+    
+    if not conversation:
+        # Create new conversation
+        conversation = await conversation_service.create_conversation(
+            user_id=user_id,
+            meta_data=request.metadata
+        )
+    
+    logger.info(f"Using conversation {conversation.id} for chat message")
+    
+    # Store user message
+    user_message, _ = await conversation_service.add_message(
+        conversation_id=conversation.id,
+        user_id=user_id,
+        content=request.message,
+        role=MessageRole.USER,
+        meta_data=request.metadata
+    )
+    return conversation, str(user_message.id)
+
+
+async def _finish_turn(
+    conversation_service: ConversationService, conversation_id: str, user_id: str,
+    user_message_id: str, response: str, metadata: Optional[Dict[str, Any]]
+) -> Any:
+    """Store the assistant's reply and queue the post-turn Celery tasks.
+    
+    Returns:
+        The queued process_chat_message task
+    """
+    # Store assistant response
+    assistant_message, _ = await conversation_service.add_message(
+        conversation_id=conversation_id,
+        user_id=user_id,
+        content=response,
+        role=MessageRole.ASSISTANT,
+        meta_data=metadata
+    )
+    logger.info(f"Assistant message stored with ID: {assistant_message.id}")
+    
+    # --- Run Celery tasks in separate threads --- 
+    mem0_task_future = asyncio.to_thread(
+        celery_app.send_task,
+        'app.worker.tasks.conversation_tasks.process_chat_message',
+        args=[user_message_id],
+        kwargs={}
+    )
+    logger.info(f"Queuing process_chat_message task for message {user_message_id}")
+    
+    check_summary_task_future = asyncio.to_thread(
+        celery_app.send_task,
+        'app.worker.tasks.conversation_tasks.check_and_queue_summarization',
+        args=[str(conversation_id)],
+        kwargs={}
+    )
+    logger.info(f"Queuing check_and_queue_summarization task for conversation {conversation_id}")
+    
+    # Await both task queuing operations concurrently
+    mem0_task, check_summary_task = await asyncio.gather(
+        mem0_task_future,
+        check_summary_task_future
+    )
+    # --- End Celery task queuing --- 
+    
+    # Log actual task IDs after awaiting
+    logger.info(f"Successfully queued process_chat_message task {mem0_task.id}")
+    logger.info(f"Successfully queued check_and_queue_summarization task {check_summary_task.id}")
+    return mem0_task
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @router.post("")
 async def chat(
     request: ChatRequest,
@@ -55,33 +148,7 @@ async def chat(
         
         # Create conversation service
         conversation_service = ConversationService(db)
-        
-        # Get or create conversation
-        conversation = None
-        if request.conversation_id:
-            conversation = await conversation_service.get_conversation(
-                conversation_id=request.conversation_id,
-                user_id=user_id
-            )
-        
-        if not conversation:
-            # Create new conversation
-            conversation = await conversation_service.create_conversation(
-                user_id=user_id,
-                meta_data=request.metadata
-            )
-        
-        logger.info(f"Using conversation {conversation.id} for chat message")
-        
-        # Store user message
-        user_message, _ = await conversation_service.add_message(
-            conversation_id=conversation.id,
-            user_id=user_id,
-            content=request.message,
-            role=MessageRole.USER,
-            meta_data=request.metadata
-        )
-        user_message_id = str(user_message.id)
+        conversation, user_message_id = await _start_turn(conversation_service, request, user_id)
         
         # Create agent and get response
         agent = TwinAgent(db)
@@ -91,43 +158,9 @@ async def chat(
             conversation_id=conversation.id
         )
         
-        # Store assistant response
-        assistant_message, _ = await conversation_service.add_message(
-            conversation_id=conversation.id,
-            user_id=user_id,
-            content=response,
-            role=MessageRole.ASSISTANT,
-            meta_data=request.metadata
-        )
-        logger.info(f"Assistant message stored with ID: {assistant_message.id}")
-        
-        # --- Run Celery tasks in separate threads --- 
-        mem0_task_future = asyncio.to_thread(
-            celery_app.send_task,
-            'app.worker.tasks.conversation_tasks.process_chat_message',
-            args=[user_message_id],
-            kwargs={}
+        mem0_task = await _finish_turn(
+            conversation_service, conversation.id, user_id, user_message_id, response, request.metadata
         )
-        logger.info(f"Queuing process_chat_message task for message {user_message_id}")
-        
-        check_summary_task_future = asyncio.to_thread(
-            celery_app.send_task,
-            'app.worker.tasks.conversation_tasks.check_and_queue_summarization',
-            args=[str(conversation.id)],
-            kwargs={}
-        )
-        logger.info(f"Queuing check_and_queue_summarization task for conversation {conversation.id}")
-        
-        # Await both task queuing operations concurrently
-        mem0_task, check_summary_task = await asyncio.gather(
-            mem0_task_future,
-            check_summary_task_future
-        )
-        # --- End Celery task queuing --- 
-        
-        # Log actual task IDs after awaiting
-        logger.info(f"Successfully queued process_chat_message task {mem0_task.id}")
-        logger.info(f"Successfully queued check_and_queue_summarization task {check_summary_task.id}")
          
         return {
             "conversation_id": conversation.id,
@@ -145,6 +178,50 @@ async def chat(
         )
 
 
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    current_user: dict = Depends(get_current_user_or_mock),
+) -> StreamingResponse:
+    """
+    Send a message to the digital twin and stream the reply as server-sent events.
+    
+    Emits a "token" event per piece of the reply, then a "done" event with the
+    conversation and task IDs, or an "error" event if the turn fails.
+    """
+    user_id = current_user.get("id", DEFAULT_USER["id"])
+    
+    async def events():
+        # The session must outlive the endpoint call, so the stream opens its own
+        async with AsyncSessionLocal() as db:
+            try:
+                conversation_service = ConversationService(db)
+                conversation, user_message_id = await _start_turn(conversation_service, request, user_id)
+                
+                agent = TwinAgent(db)
+                chunks = []
+                async for chunk in agent.chat_stream(
+                    user_message=request.message,
+                    user_id=user_id,
+                    conversation_id=conversation.id
+                ):
+                    chunks.append(chunk)
+                    yield _sse_event("token", {"text": chunk})
+                
+                mem0_task = await _finish_turn(
+                    conversation_service, conversation.id, user_id, user_message_id, "".join(chunks), request.metadata
+                )
+                yield _sse_event("done", {
+                    "conversation_id": conversation.id,
+                    "mem0_task_id": mem0_task.id if mem0_task else None
+                })
+            except Exception as e:
+                logger.error(f"Error in chat stream processing: {str(e)}", exc_info=True)
+                yield _sse_event("error", {"detail": f"An error occurred during chat processing: {str(e)}"})
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
 @router.get("/conversations")
 async def list_conversations(
     limit: int = Query(10, description="Maximum number of conversations to return"),
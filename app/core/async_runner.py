@@ -0,0 +1,59 @@
+"""Persistent per-process event loop for running async code from sync callers.
+
+Celery tasks and the sync ingestion services both drive coroutines from
+synchronous code; they share this module so services don't depend on the
+worker package.
+"""
+
+import asyncio
+import logging
+from typing import Any, Coroutine, TypeVar
+
+try:
+    import uvloop
+except ImportError:  # pragma: no cover - uvloop is optional (not available on Windows)
+    uvloop = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# One event loop per process, reused by every caller instead of building
+# and tearing down a fresh loop (and its executor) per asyncio.run() call
+_worker_loop = None
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """Get or create this process's persistent event loop (uvloop when installed)."""
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        if uvloop is not None:
+            _worker_loop = uvloop.new_event_loop()
+        else:
+            _worker_loop = asyncio.new_event_loop()
+        # Coroutines that finish without suspending run inline (Python 3.12+)
+        if hasattr(asyncio, "eager_task_factory"):
+            _worker_loop.set_task_factory(asyncio.eager_task_factory)
+        asyncio.set_event_loop(_worker_loop)
+        logger.info(f"Created worker event loop: {type(_worker_loop).__name__}")
+    return _worker_loop
+
+
+def close_worker_loop() -> None:
+    """Close this process's event loop, if one was created."""
+    global _worker_loop
+    if _worker_loop is not None and not _worker_loop.is_closed():
+        _worker_loop.close()
+    _worker_loop = None
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine to completion on the process's persistent event loop.
+
+    Args:
+        coro: The coroutine to run
+
+    Returns:
+        The coroutine's result
+    """
+    return get_worker_loop().run_until_complete(coro)
@@ -64,10 +64,16 @@ class Settings(BaseSettings):
     NEO4J_URI: str
     NEO4J_USER: str
     NEO4J_PASSWORD: str
+    NEO4J_MAX_CONNECTION_POOL_SIZE: int = 50
 
     # Mem0
     MEM0_API_KEY: str
     MEM0_INFERENCE: bool = True
+    MEM0_INGEST_CONCURRENCY: int = 8  # parallel Mem0 adds when draining pending messages
+    MEM0_INGEST_PAGE_SIZE: int = 50  # messages loaded per page when ingesting a whole conversation
+    MEM0_CLAIM_TIMEOUT_SECONDS: int = 300  # a worker's claim on a message expires after this, e.g. if it died mid-call
+    MEM0_SEARCH_TIMEOUT_SECONDS: float = 3.0  # total budget for one search, retries included
+    MEM0_SEARCH_ATTEMPT_TIMEOUT_SECONDS: float = 1.5  # per search attempt, so a hung call leaves time to retry
 
     # OpenAI
     OPENAI_API_KEY: str
@@ -75,11 +81,37 @@ class Settings(BaseSettings):
     CHAT_MODEL: str = "gpt-4o-mini"
     OPENAI_TEMPERATURE: float = 0.7
 
+    # Deadline for each agent retrieval source (Mem0, Graphiti); keep it at least
+    # MEM0_SEARCH_TIMEOUT_SECONDS so Mem0 retries fit inside it
+    AGENT_RETRIEVAL_TIMEOUT_SECONDS: float = 3.0
+
+    # Semantic cache of merged agent context, keyed on (user_id, conversation_id, query embedding)
+    CONTEXT_CACHE_ENABLED: bool = True
+    CONTEXT_CACHE_SIMILARITY_THRESHOLD: float = 0.92
+    CONTEXT_CACHE_TTL_SECONDS: int = 300
+    CONTEXT_CACHE_MAX_ENTRIES_PER_USER: int = 64
+
+    # Exact-match cache of twin responses, keyed on (user_id, conversation_id, normalized query)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAXSIZE: int = 1024
+    RESPONSE_CACHE_TTL_SECONDS: int = 600
+
     # Entity, relationship, trait Extraction
     GEMINI_API_KEY: str | None = None
 
     ENABLE_PROFILE_UPDATES: bool = False
     ENABLE_GRAPHITI_INGESTION: bool = True
+    GRAPHITI_INGEST_CONCURRENCY: int = 8  # chat messages processed at once when draining a batch
+    GRAPHITI_INGEST_PAGE_SIZE: int = 50  # messages loaded per page when ingesting a whole conversation
+    GRAPHITI_ENTITY_ID_CACHE_SIZE: int = 4096  # resolved entity node IDs remembered per extraction pipeline
+    GRAPHITI_EXTRACTION_BATCH_SIZE: int = 8  # chat messages packed into one Gemini extraction call
+    GRAPHITI_MIN_EXTRACTABLE_CHARS: int = 3  # shorter chat messages skip extraction entirely
+    GRAPHITI_BUFFER_FLUSH_SECONDS: int = 2  # how long new chat messages wait to be batched into one Graphiti task
+    GRAPHITI_BUFFER_BATCH_SIZE: int = 32  # most buffered chat messages one flush processes together
+
+    # Redis cache of chat entity extraction results, keyed on normalized message text
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_TTL_SECONDS: int = 86400
 
     # Auth
     # AUTH0_DOMAIN: str
@@ -107,6 +139,8 @@ class Settings(BaseSettings):
     TOKEN_EXPIRE_MINUTES: int | None = None
     CELERY_BROKER_URL: str | None = None
     CELERY_RESULT_BACKEND: str | None = None
+    # Messages each worker process reserves ahead (4 is Celery's default); raise it when tasks mostly wait on Mem0/LLM I/O
+    CELERY_WORKER_PREFETCH_MULTIPLIER: int = 4
     GRAPHITI_HOST: str | None = None
     GRAPHITI_PORT: str | None = None
 
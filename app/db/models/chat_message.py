@@ -2,7 +2,7 @@ from datetime import datetime, UTC
 import uuid
 from enum import Enum
 from typing import Optional, Dict, Any
-from sqlalchemy import String, ForeignKey, DateTime, JSON, Text, Enum as SQLEnum, Integer, Boolean, Float, event
+from sqlalchemy import String, ForeignKey, DateTime, JSON, Text, Enum as SQLEnum, Integer, Boolean, Float, Index, event, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
@@ -18,6 +18,14 @@ class MessageRole(str, Enum):
 class ChatMessage(Base):
     """Chat message model."""
     __tablename__ = "chat_message"  # Explicitly set the table name to match ForeignKey reference
+    __table_args__ = (
+        # Lets the pending-messages query seek straight to unprocessed non-assistant messages in order
+        Index(
+            "ix_chat_message_graphiti_pending",
+            "created_at",
+            postgresql_where=text("processed_in_graphiti = false AND role <> 'assistant'"),
+        ),
+    )
     
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     conversation_id: Mapped[str] = mapped_column(String(36), ForeignKey("conversation.id", ondelete="CASCADE"), index=True)
@@ -43,6 +51,8 @@ class ChatMessage(Base):
     mem0_message_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True,
                                                         comment="Mem0 memory ID if stored in Mem0")
     mem0_metadata: Mapped[Dict[str, Any]] = mapped_column(JSON, default=dict)
+    mem0_claimed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True,
+                                                              comment="When a worker claimed the message for Mem0 ingestion")
     embedding_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     importance_score: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     
@@ -3,13 +3,23 @@ from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy import create_engine
 from contextlib import asynccontextmanager, contextmanager
 
+import orjson
+
 from app.core.config import settings
 
+
+def _json_serializer(value) -> str:
+    """Serialize JSON columns with orjson; non-string keys are stringified like json.dumps does."""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
 # Create async engine
 engine = create_async_engine(
     str(settings.SQLALCHEMY_DATABASE_URI),
     echo=False,
     future=True,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
 )
 
 # Create a synchronous engine for use in Celery tasks
@@ -17,6 +27,8 @@ sync_engine = create_engine(
     str(settings.SYNC_SQLALCHEMY_DATABASE_URI),
     echo=False,
     future=True,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
 )
 
 # Create async session factory
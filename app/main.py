@@ -10,7 +10,7 @@ from pathlib import Path
 from app.api.router import api_router
 from app.core.config import settings
 from app.scripts.create_test_user import create_test_user
-from app.services.graph import GraphitiService
+from app.services.graph import GraphitiService, close_neo4j_driver
 
 logger = logging.getLogger(__name__)
 
@@ -69,6 +69,12 @@ async def startup_db_client():
     except Exception as e:
         logger.error(f"Error during startup: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_neo4j_driver():
+    """Close the shared Neo4j connection pool."""
+    close_neo4j_driver()
+
+
 @app.get("/health")
 async def health_check() -> dict[str, str]:
     """Health check endpoint."""
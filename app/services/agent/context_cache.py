@@ -0,0 +1,196 @@
+"""Caches in front of the agent graph.
+
+SemanticContextCache maps (user_id, conversation_id, query embedding) to the
+merged context built for that query so a near-identical question in the same
+conversation can skip Mem0 and Graphiti retrieval.
+ResponseCache maps (user_id, conversation_id, normalized query) to the final twin
+response so an exact repeat in the same conversation skips the graph entirely.
+
+Entries record the user's memory version (see app.services.common.memory_version)
+and are ignored once ingestion has bumped it.
+"""
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+from langchain_openai import OpenAIEmbeddings
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def normalize_query(message: str) -> str:
+    """Case- and whitespace-insensitive form of a user message, for exact-match keys."""
+    return " ".join(message.lower().split())
+
+
+@dataclass
+class CacheEntry:
+    """A cached query and the context that was merged for it."""
+
+    embedding: List[float]
+    merged_context: str
+    created_at: float
+    memory_version: int
+
+
+class SemanticContextCache:
+    """In-process, per-conversation semantic cache of merged retrieval context."""
+
+    def __init__(
+        self,
+        embeddings: Optional[Any] = None,
+        similarity_threshold: float = settings.CONTEXT_CACHE_SIMILARITY_THRESHOLD,
+        ttl_seconds: int = settings.CONTEXT_CACHE_TTL_SECONDS,
+        max_entries_per_user: int = settings.CONTEXT_CACHE_MAX_ENTRIES_PER_USER,
+    ):
+        """Initialize the cache.
+
+        Args:
+            embeddings: LangChain embeddings client (defaults to OpenAI)
+            similarity_threshold: Minimum cosine similarity for a hit
+            ttl_seconds: How long an entry stays valid
+            max_entries_per_user: Oldest entries of a conversation are evicted beyond this size
+        """
+        self.embeddings = embeddings or OpenAIEmbeddings(
+            api_key=settings.OPENAI_API_KEY,
+            model=settings.EMBEDDING_MODEL or DEFAULT_EMBEDDING_MODEL,
+        )
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_user = max_entries_per_user
+        self._entries: Dict[Tuple[str, Optional[str]], "OrderedDict[str, CacheEntry]"] = {}
+
+    async def embed(self, query: str) -> List[float]:
+        """Embed a query as a unit vector so similarity is a plain dot product."""
+        vector = await self.embeddings.aembed_query(query)
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def lookup(
+        self, user_id: str, conversation_id: Optional[str], embedding: List[float], memory_version: int
+    ) -> Optional[Tuple[str, float]]:
+        """Find the closest cached context for this conversation.
+
+        Args:
+            user_id: The user ID
+            conversation_id: The conversation the context was merged for
+            embedding: Normalized query embedding from embed()
+            memory_version: The user's current memory version; older entries are stale
+
+        Returns:
+            (merged_context, similarity) on a hit, otherwise None
+        """
+        entries = self._entries.get((user_id, conversation_id))
+        if not entries:
+            return None
+
+        self._evict_expired(entries, memory_version)
+
+        best_key = None
+        best_score = -1.0
+        for key, entry in entries.items():
+            score = sum(a * b for a, b in zip(embedding, entry.embedding))
+            if score > best_score:
+                best_key, best_score = key, score
+
+        if best_key is None or best_score < self.similarity_threshold:
+            return None
+
+        entries.move_to_end(best_key)
+        return entries[best_key].merged_context, best_score
+
+    def store(
+        self,
+        user_id: str,
+        conversation_id: Optional[str],
+        query: str,
+        embedding: List[float],
+        merged_context: str,
+        memory_version: int,
+    ) -> None:
+        """Cache the merged context for a query.
+
+        Args:
+            user_id: The user ID
+            conversation_id: The conversation the context was merged for
+            query: The user's message
+            embedding: Normalized query embedding from embed()
+            merged_context: Context built for the query
+            memory_version: The user's memory version the context was retrieved at
+        """
+        entries = self._entries.setdefault((user_id, conversation_id), OrderedDict())
+        entries[query] = CacheEntry(
+            embedding=embedding, merged_context=merged_context, created_at=time.time(), memory_version=memory_version
+        )
+        entries.move_to_end(query)
+        while len(entries) > self.max_entries_per_user:
+            entries.popitem(last=False)
+
+    def _evict_expired(self, entries: "OrderedDict[str, CacheEntry]", memory_version: int) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        stale = [k for k, entry in entries.items() if entry.created_at < cutoff or entry.memory_version != memory_version]
+        for key in stale:
+            del entries[key]
+
+
+class ResponseCache:
+    """In-process TTL cache of twin responses keyed on the exact (normalized) query."""
+
+    def __init__(
+        self,
+        maxsize: int = settings.RESPONSE_CACHE_MAXSIZE,
+        ttl_seconds: int = settings.RESPONSE_CACHE_TTL_SECONDS,
+    ):
+        """Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of cached responses across all users
+            ttl_seconds: How long a response stays valid
+        """
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl_seconds)
+
+    @staticmethod
+    def _key(user_id: str, conversation_id: Optional[str], message: str) -> Tuple[str, Optional[str], str]:
+        return user_id, conversation_id, normalize_query(message)
+
+    def get(self, user_id: str, conversation_id: Optional[str], message: str, memory_version: int) -> Optional[str]:
+        """Return the cached response for this exact question, if built from the current memories."""
+        entry = self._cache.get(self._key(user_id, conversation_id, message))
+        if entry is None or entry[0] != memory_version:
+            return None
+        return entry[1]
+
+    def put(self, user_id: str, conversation_id: Optional[str], message: str, memory_version: int, response: str) -> None:
+        """Cache a successful response."""
+        self._cache[self._key(user_id, conversation_id, message)] = (memory_version, response)
+
+
+# Shared across TwinAgent instances, which are created per request
+_context_cache = None
+_response_cache = None
+
+
+def get_context_cache() -> SemanticContextCache:
+    """Get or create the shared semantic context cache."""
+    global _context_cache
+    if _context_cache is None:
+        _context_cache = SemanticContextCache()
+    return _context_cache
+
+
+def get_response_cache() -> ResponseCache:
+    """Get or create the shared response cache."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
+
@@ -5,62 +5,175 @@ using Mem0 for memory and Graphiti for knowledge graph retrieval.
 """
 
 import os
+import asyncio
+import functools
 import logging
-from typing import Dict, List, Any, Optional, TypedDict, Coroutine
+from typing import AsyncIterator, Dict, List, Any, Optional, TypedDict, Coroutine
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig, RunnableLambda, RunnableParallel
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 
 from app.services.memory import MemoryService
 from app.services.graph import GraphitiService, ContentScope
+from app.services.agent.context_cache import get_context_cache, get_response_cache, normalize_query
+from app.services.common.memory_version import get_memory_version
 from app.core.config import settings
 import time
+from dataclasses import dataclass, field
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of characters of each Mem0 result to include in the context
+MEM0_PREVIEW_CHARS = 1000
+
+# Short conversational turns that never need memory or graph retrieval
+TRIVIAL_MESSAGES = frozenset({"hi", "hello", "hey", "thanks", "thank you", "ok", "okay", "bye"})
+TRIVIAL_MESSAGE_MAX_LENGTH = 20
+
+# One slot per retriever so the parallel branches are never serialized
+RETRIEVAL_MAX_CONCURRENCY = 2
+# Cap in-flight calls per backend across all concurrent chat turns in this process
+RETRIEVAL_MAX_INFLIGHT_CALLS = 16
+# Per-backend semaphores for the event loop they were created on, see _retrieval_semaphore
+_retrieval_semaphores: Dict[str, asyncio.Semaphore] = {}
+_retrieval_semaphores_loop: Optional[asyncio.AbstractEventLoop] = None
+# Marks the end of a streamed turn on the token queue
+_STREAM_END = object()
+# Turns currently running, keyed on (user_id, conversation_id, normalized message),
+# so identical concurrent questions in one conversation share one workflow run
+_inflight_turns: Dict[tuple, asyncio.Future] = {}
+
+# Shared clients: TwinAgent is created per request, these are not
+_memory_service = None
+_graphiti_service = None
+
+
+def _get_memory_service() -> MemoryService:
+    """Get or create the shared Mem0 memory service."""
+    global _memory_service
+    if _memory_service is None:
+        _memory_service = MemoryService()
+    return _memory_service
+
+
+def _get_graphiti_service() -> GraphitiService:
+    """Get or create the shared Graphiti service."""
+    global _graphiti_service
+    if _graphiti_service is None:
+        _graphiti_service = GraphitiService()
+    return _graphiti_service
+
+
+def _retrieval_semaphore(backend: str) -> asyncio.Semaphore:
+    """Get the in-flight call limit for a retrieval backend on the running event loop.
+    
+    Created lazily, and afresh whenever the loop changes, so a semaphore is never
+    used from a loop it wasn't made for.
+    """
+    global _retrieval_semaphores_loop
+    loop = asyncio.get_running_loop()
+    if loop is not _retrieval_semaphores_loop:
+        _retrieval_semaphores.clear()
+        _retrieval_semaphores_loop = loop
+    semaphore = _retrieval_semaphores.get(backend)
+    if semaphore is None:
+        semaphore = _retrieval_semaphores[backend] = asyncio.Semaphore(RETRIEVAL_MAX_INFLIGHT_CALLS)
+    return semaphore
+
+
+@functools.lru_cache(maxsize=8)
+def _get_llm(model_name: str) -> ChatOpenAI:
+    """Get a shared chat model client for the given model."""
+    return ChatOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        model=model_name,
+        temperature=settings.OPENAI_TEMPERATURE,
+    )
+
+
+def _message_content(message: Any) -> Optional[str]:
+    """Content of a Mem0 'message' field, which may be a dict or a plain string."""
+    if isinstance(message, dict):
+        return message.get("content")
+    if isinstance(message, str):
+        return message
+    return None
+
+
+def _normalize_mem0_hit(hit: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a Mem0 search hit to the fields _merge_context reads.
+    
+    Content falls back from "content" to "memory" to "message", similarity from
+    "similarity" to "score" to 0.5, and metadata defaults to an empty dict.
+    """
+    similarity = hit.get("similarity")
+    if similarity is None:
+        similarity = hit.get("score")
+    return {
+        "content": hit.get("content") or hit.get("memory") or _message_content(hit.get("message")) or "",
+        "similarity": 0.5 if similarity is None else similarity,
+        "metadata": hit.get("metadata") or {},
+        "categories": hit.get("categories"),
+        "content_truncated": hit.get("content_truncated", False),
+    }
+
+
 # Define the agent state schema as TypedDict for LangGraph compatibility
 class AgentStateDict(TypedDict, total=False):
     user_id: str
+    conversation_id: Optional[str]
+    memory_version: Optional[int]
     messages: List[Any]
+    last_user_message: str
     mem0_results: List[Dict[str, Any]]
     graphiti_results: Dict[str, List]
     merged_context: str
     twin_response: str
     error: str
+    retrieval_degraded: bool
+    skip_retrieval: bool
+    query_embedding: List[float]
+    cache_hit: bool
 
-# Keep the original AgentState class for object-oriented usage
+# Kept for callers outside the graph; nodes work on AgentStateDict directly
+@dataclass(slots=True)
 class AgentState:
     """State for the agent's thought process."""
     
-    def __init__(
-        self,
-        user_id: str,
-        messages: List[Any],
-        mem0_results: Optional[List[Dict[str, Any]]] = None,
-        graphiti_results: Optional[Dict[str, List]] = None,
-        merged_context: Optional[str] = None,
-        twin_response: Optional[str] = None,
-        error: Optional[str] = None,
-    ):
-        self.user_id = user_id
-        self.messages = messages  # The conversation history
-        self.mem0_results = mem0_results or []  # Results from Mem0
-        self.graphiti_results = graphiti_results or {}  # Results from Graphiti
-        self.merged_context = merged_context  # Combined context
-        self.twin_response = twin_response  # Generated response
-        self.error = error  # Error if any
+    user_id: str
+    messages: List[Any]  # The conversation history
+    conversation_id: Optional[str] = None  # Conversation this turn belongs to, for cache keys
+    memory_version: Optional[int] = None  # User's memory version at the start of the turn; None disables caching
+    last_user_message: Optional[str] = None  # Latest HumanMessage content, set once per turn
+    mem0_results: List[Dict[str, Any]] = field(default_factory=list)  # Results from Mem0
+    graphiti_results: Dict[str, List] = field(default_factory=dict)  # Results from Graphiti
+    merged_context: Optional[str] = None  # Combined context
+    twin_response: Optional[str] = None  # Generated response
+    error: Optional[str] = None  # Error if any
+    retrieval_degraded: bool = False  # True when a retriever failed or timed out; the turn's context and reply aren't cached
+    skip_retrieval: bool = False  # True for trivial turns that need no context
+    query_embedding: Optional[List[float]] = None  # Normalized embedding of the user message, for the context cache
+    cache_hit: bool = False  # True when merged_context came from the context cache
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert state to dictionary."""
         return {
             "user_id": self.user_id,
             "messages": self.messages,
+            "conversation_id": self.conversation_id,
+            "memory_version": self.memory_version,
+            "last_user_message": self.last_user_message,
             "mem0_results": self.mem0_results,
             "graphiti_results": self.graphiti_results,
             "merged_context": self.merged_context,
             "twin_response": self.twin_response,
             "error": self.error,
+            "retrieval_degraded": self.retrieval_degraded,
+            "skip_retrieval": self.skip_retrieval,
+            "query_embedding": self.query_embedding,
+            "cache_hit": self.cache_hit,
         }
 
     @classmethod
@@ -69,17 +182,34 @@ class AgentState:
         return cls(
             user_id=state_dict.get("user_id", ""),
             messages=state_dict.get("messages", []),
-            mem0_results=state_dict.get("mem0_results", []),
-            graphiti_results=state_dict.get("graphiti_results", {}),
+            conversation_id=state_dict.get("conversation_id"),
+            memory_version=state_dict.get("memory_version"),
+            last_user_message=state_dict.get("last_user_message"),
+            mem0_results=state_dict.get("mem0_results") or [],
+            graphiti_results=state_dict.get("graphiti_results") or {},
             merged_context=state_dict.get("merged_context"),
             twin_response=state_dict.get("twin_response"),
             error=state_dict.get("error"),
+            retrieval_degraded=state_dict.get("retrieval_degraded", False),
+            skip_retrieval=state_dict.get("skip_retrieval", False),
+            query_embedding=state_dict.get("query_embedding"),
+            cache_hit=state_dict.get("cache_hit", False),
         )
 
 
 class TwinAgent:
     """LangGraph-based agent implementing the digital twin."""
     
+    _COMPILED_WORKFLOW = None
+    
+    _SYSTEM_PREFIX = (
+        "You are a helpful assistant with access to the user's personal knowledge base.\n"
+        "You should answer questions using the context provided when relevant,\n"
+        "but you can also use your general knowledge for common questions.\n"
+        "Always be truthful, helpful, and concise.\n"
+        "\n"
+    )
+    
     def __init__(self, db_session):
         """Initialize the agent.
         
@@ -87,97 +217,257 @@ class TwinAgent:
             db_session: SQLAlchemy session
         """
         self.db = db_session
-        self.mem0_service = MemoryService()
-        self.graphiti_service = GraphitiService()
-        
-        # Initialize LLM
-        self.llm = ChatOpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            model=settings.OPENAI_MODEL,
-            temperature=settings.OPENAI_TEMPERATURE,
+        # Set by chat_stream() for the duration of a streamed turn
+        self._token_queue: Optional[asyncio.Queue] = None
+        self.mem0_service = _get_memory_service()
+        self.graphiti_service = _get_graphiti_service()
+        self.context_cache = get_context_cache() if settings.CONTEXT_CACHE_ENABLED else None
+        self.response_cache = get_response_cache() if settings.RESPONSE_CACHE_ENABLED else None
+        self.llm = _get_llm(settings.OPENAI_MODEL)
+        
+        # Fan-out over both retrievers; RunnableParallel keeps per-branch tracing
+        self.retrievers = RunnableParallel(
+            mem0=RunnableLambda(self._retrieve_from_mem0).with_config(run_name="retrieve_from_mem0"),
+            graphiti=RunnableLambda(self._retrieve_from_graphiti).with_config(run_name="retrieve_from_graphiti"),
         )
+    
+    @classmethod
+    def _get_compiled_workflow(cls):
+        """Compile the workflow once and share it across agent instances.
         
-        # Build the workflow
-        self.workflow = StateGraph(AgentStateDict)
+        Nodes look up the agent for the current turn from the run config, so the
+        compiled graph holds no per-request state.
+        """
+        if cls._COMPILED_WORKFLOW is None:
+            cls._COMPILED_WORKFLOW = cls._build_workflow().compile()
+        return cls._COMPILED_WORKFLOW
+    
+    @classmethod
+    def _build_workflow(cls) -> StateGraph:
+        """Build the agent's state graph."""
+        def node(method_name: str):
+            async def run(state: AgentStateDict, config: RunnableConfig) -> AgentStateDict:
+                agent = config["configurable"]["agent"]
+                return await getattr(agent, method_name)(state)
+            return run
+        
+        workflow = StateGraph(AgentStateDict)
         
         # Define nodes
-        self.workflow.add_node("retrieve_from_mem0", self._retrieve_from_mem0)
-        self.workflow.add_node("retrieve_from_graphiti", self._retrieve_from_graphiti)
-        self.workflow.add_node("merge_context", self._merge_context)
-        self.workflow.add_node("generate_response", self._generate_response)
+        workflow.add_node("classify", node("_classify"))
+        workflow.add_node("lookup_cache", node("_lookup_cache"))
+        workflow.add_node("retrieve_context", node("_retrieve_context"))
+        workflow.add_node("merge_context", node("_merge_context"))
+        workflow.add_node("generate_response", node("_generate_response"))
         
         # Connect nodes
-        self.workflow.set_entry_point("retrieve_from_mem0")
-        self.workflow.add_edge("retrieve_from_mem0", "retrieve_from_graphiti")
-        self.workflow.add_edge("retrieve_from_graphiti", "merge_context")
-        self.workflow.add_edge("merge_context", "generate_response")
+        workflow.set_entry_point("classify")
+        workflow.add_conditional_edges(
+            "classify",
+            cls._route_after_classify,
+            {
+                "generate_response": "generate_response",
+                "lookup_cache": "lookup_cache"
+            }
+        )
+        workflow.add_conditional_edges(
+            "lookup_cache",
+            cls._should_use_cache,
+            {
+                "generate_response": "generate_response",
+                "retrieve_context": "retrieve_context"
+            }
+        )
+        # A failed step ends the turn instead of paying for the remaining nodes and the LLM call
+        workflow.add_conditional_edges(
+            "retrieve_context",
+            cls._route_after,
+            {"end": END, "continue": "merge_context"}
+        )
+        workflow.add_conditional_edges(
+            "merge_context",
+            cls._route_after,
+            {"end": END, "continue": "generate_response"}
+        )
         
         # Define exit
-        self.workflow.add_conditional_edges(
+        workflow.add_conditional_edges(
             "generate_response",
-            self._should_end,
+            cls._should_end,
             {
                 END: END,
-                "retrieve_from_graphiti": "retrieve_from_graphiti" # fallback loop
+                "retrieve_context": "retrieve_context" # fallback loop
             }
         )
+        return workflow
+    
+    @staticmethod
+    def _extract_last_user(state: Dict[str, Any]) -> Optional[str]:
+        """Return the latest user message for this turn.
+        
+        chat() records it in the state up front; the scan over messages is only a
+        fallback for states built elsewhere (e.g. resumed runs).
+        """
+        last_user_message = state.get("last_user_message")
+        if last_user_message:
+            return last_user_message
+        for message in reversed(state.get("messages", [])):
+            if isinstance(message, HumanMessage):
+                return message.content
+        return None
+    
+    async def _classify(self, state: AgentStateDict) -> AgentStateDict:
+        """Flag trivial turns (greetings, thanks) that can skip retrieval entirely."""
+        last_user_message = self._extract_last_user(state) or ""
+        
+        normalized = last_user_message.lower().strip().strip(".!?")
+        skip_retrieval = (
+            len(last_user_message) < TRIVIAL_MESSAGE_MAX_LENGTH
+            and normalized in TRIVIAL_MESSAGES
+        )
+        if skip_retrieval:
+            logger.info("AGENT: Trivial message, skipping Mem0 and Graphiti retrieval")
+            return {"skip_retrieval": True, "merged_context": ""}
+        
+        return {"skip_retrieval": False}
+    
+    @staticmethod
+    def _route_after_classify(state: Dict[str, Any]) -> str:
+        """Route trivial turns straight to the LLM, everything else to the context cache."""
+        if state.get("skip_retrieval"):
+            return "generate_response"
+        return "lookup_cache"
+    
+    async def _lookup_cache(self, state: AgentStateDict) -> AgentStateDict:
+        """Reuse merged context from a near-identical recent question, if any."""
+        if not self.context_cache or state.get("memory_version") is None:
+            return {}
+        
+        update: AgentStateDict = {}
+        try:
+            query = self._extract_last_user(state) or ""
+            update["query_embedding"] = await self.context_cache.embed(query)
+            hit = self.context_cache.lookup(
+                state["user_id"], state.get("conversation_id"), update["query_embedding"], state["memory_version"]
+            )
+            if hit:
+                update["merged_context"], similarity = hit
+                update["cache_hit"] = True
+                logger.info(f"AGENT: Context cache hit (similarity: {similarity:.3f}), skipping retrieval")
+        except Exception as e:
+            # The cache is an optimization only; fall through to normal retrieval
+            logger.warning(f"AGENT: Context cache lookup failed: {str(e)}")
+        
+        return update
+    
+    @staticmethod
+    def _should_use_cache(state: Dict[str, Any]) -> str:
+        """Route cache hits straight to the LLM, misses to retrieval."""
+        if state.get("cache_hit"):
+            return "generate_response"
+        return "retrieve_context"
     
-    async def _retrieve_from_mem0(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _retrieve_context(self, state: AgentStateDict) -> AgentStateDict:
+        """Retrieve context from Mem0 and Graphiti concurrently.
+        
+        Both retrievals only depend on the last user message, so they run as
+        parallel branches and the turn pays for the slower of the two instead of
+        their sum. Each branch returns a partial update for the fields it owns; a
+        branch that fails contributes nothing, and only both failing is an error.
+        """
+        start_time = time.time()
+        
+        try:
+            branches = await self.retrievers.ainvoke(
+                state, config={"max_concurrency": RETRIEVAL_MAX_CONCURRENCY}
+            )
+        except Exception as e:
+            error = f"Context retrieval error: {str(e)}"
+            logger.error(error)
+            return {"error": error}
+        
+        mem0_update = branches["mem0"]
+        graphiti_update = branches["graphiti"]
+        update: AgentStateDict = {
+            "mem0_results": mem0_update.get("mem0_results") or [],
+            "graphiti_results": graphiti_update.get("graphiti_results") or {},
+        }
+        
+        # A failed branch contributes no results; the turn only ends when no source succeeded
+        errors = [e for e in (mem0_update.get("error"), graphiti_update.get("error")) if e]
+        if len(errors) == 2:
+            update["error"] = "; ".join(dict.fromkeys(errors))
+        elif errors:
+            logger.warning(f"AGENT: Continuing with partial context: {errors[0]}")
+            update["retrieval_degraded"] = True
+        if mem0_update.get("retrieval_degraded") or graphiti_update.get("retrieval_degraded"):
+            update["retrieval_degraded"] = True
+        
+        logger.info(f"Context retrieval completed in {time.time() - start_time:.2f} seconds")
+        return update
+    
+    async def _search_mem0(self, query: str, user_id: str) -> List[Dict[str, Any]]:
+        """Search Mem0, holding a slot of the shared Mem0 concurrency budget.
+        
+        Transient API failures are retried with backoff inside MemoryService, within
+        the same deadline the caller enforces.
+        """
+        async with _retrieval_semaphore("mem0"):
+            return await self.mem0_service.search(
+                query=query,
+                user_id=user_id,
+                limit=5,
+                preview_chars=MEM0_PREVIEW_CHARS,
+                timeout=settings.AGENT_RETRIEVAL_TIMEOUT_SECONDS
+            )
+    
+    async def _search_graphiti(self, query: str, user_id: str) -> List[Dict[str, Any]]:
+        """Search Graphiti, holding a slot of the shared Graphiti concurrency budget.
+        
+        Transient Neo4j failures are retried with backoff inside GraphitiService.
+        """
+        async with _retrieval_semaphore("graphiti"):
+            return await self.graphiti_service.search(
+                query=query,
+                user_id=user_id,
+                limit=5,
+                owner_id=user_id
+                # explicitly not passing scope=ContentScope.GLOBAL so we get global too
+            )
+    
+    async def _retrieve_from_mem0(self, state: AgentStateDict) -> AgentStateDict:
         """Retrieve relevant context from Mem0."""
-        state_obj = AgentState.from_dict(state)
+        update: AgentStateDict = {}
         
         # add a timer to see how long the search takes
         start_time = time.time()
     
         try:
-            # Get the last user message
-            last_user_message = None
-            for message in reversed(state_obj.messages):
-                if isinstance(message, HumanMessage):
-                    last_user_message = message.content
-                    break
+            last_user_message = self._extract_last_user(state)
             
             if not last_user_message:
-                state_obj.error = "No user message found"
-                return state_obj.to_dict()
-            
-            # Directly await the async call - we're already in an event loop
-            mem0_results = await self.mem0_service.search(
-                query=last_user_message,
-                user_id=state_obj.user_id,
-                limit=5
-            )
+                return {"error": "No user message found"}
             
-            # Process the Mem0 results to handle potential format issues
-            processed_results = []
-            for result in mem0_results:
-                # Create a processed copy
-                processed = dict(result)
-                
-                # Handle content extraction based on Mem0 API response format
-                if "content" not in processed or not processed["content"]:
-                    # Check for memory field (primary content field in the API response)
-                    if "memory" in processed:
-                        processed["content"] = processed["memory"]
-                    # Fallback to message field if present
-                    elif "message" in processed:
-                        if isinstance(processed["message"], dict) and "content" in processed["message"]:
-                            processed["content"] = processed["message"]["content"]
-                        elif isinstance(processed["message"], str):
-                            processed["content"] = processed["message"]
-                
-                # Get similarity score from the appropriate field
-                if "similarity" not in processed or processed["similarity"] is None:
-                    if "score" in processed and processed["score"] is not None:
-                        processed["similarity"] = processed["score"]
-                    else:
-                        processed["similarity"] = 0.5  # Default reasonable value
-                
-                # Ensure metadata is a dict
-                if "metadata" not in processed or processed["metadata"] is None:
-                    processed["metadata"] = {}
-                
-                processed_results.append(processed)
+            # Bound the wait so a slow Mem0 call can't hold up the whole turn
+            try:
+                mem0_results = await asyncio.wait_for(
+                    self._search_mem0(last_user_message, state["user_id"]),
+                    timeout=settings.AGENT_RETRIEVAL_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"Mem0 search exceeded {settings.AGENT_RETRIEVAL_TIMEOUT_SECONDS}s, continuing without memory results")
+                mem0_results = []
+                update["retrieval_degraded"] = True
+            
+            # MemoryService reports failures as {"error": ...} hits rather than raising
+            failed_hits = [result for result in mem0_results if "error" in result]
+            if failed_hits:
+                logger.warning(f"Mem0 search failed, continuing without memory results: {failed_hits[0]['error']}")
+                mem0_results = [result for result in mem0_results if "error" not in result]
+                update["retrieval_degraded"] = True
+            
+            # Normalize Mem0 hits to the fields _merge_context reads
+            processed_results = [_normalize_mem0_hit(result) for result in mem0_results]
             
             # Log detailed results for debugging
             logger.info(f"Retrieved {len(processed_results)} results from Mem0")
@@ -189,36 +479,30 @@ class TwinAgent:
             #     content_preview = content[:100] + "..." if len(content) > 100 else content
                 # logger.info(f"Mem0 result {i+1}: {content_preview} (relevance: {similarity:.2f}, source: {source})")
             
-            state_obj.mem0_results = processed_results
+            update["mem0_results"] = processed_results
             
         except Exception as e:
-            state_obj.error = f"Mem0 retrieval error: {str(e)}"
-            logger.error(state_obj.error)
+            update["error"] = f"Mem0 retrieval error: {str(e)}"
+            logger.error(update["error"])
         
         # add a timer to see how long the search takes
         end_time = time.time()
         logger.info(f"Mem0 search completed in {end_time - start_time:.2f} seconds")
         
-        return state_obj.to_dict()
+        return update
     
-    async def _retrieve_from_graphiti(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _retrieve_from_graphiti(self, state: AgentStateDict) -> AgentStateDict:
         """Retrieve relevant context from Graphiti."""
-        state_obj = AgentState.from_dict(state)
+        update: AgentStateDict = {}
         
         # add a timer to see how long the search takes
         start_time = time.time()
         
         try:
-            # Get the last user message
-            last_user_message = None
-            for message in reversed(state_obj.messages):
-                if isinstance(message, HumanMessage):
-                    last_user_message = message.content
-                    break
+            last_user_message = self._extract_last_user(state)
             
             if not last_user_message:
-                state_obj.error = "No user message found"
-                return state_obj.to_dict()
+                return {"error": "No user message found"}
             
             # Skipping this call for now because it's slow and not that useful vs graph search
             # logger.info(f"AGENT: Searching for entities in Graphiti for message: {last_user_message}")
@@ -232,13 +516,16 @@ class TwinAgent:
             # logger.info(f"AGENT: node_search returned: {entity_results}")
             
             # Also search general graph results
-            graph_results = await self.graphiti_service.search(
-                query=last_user_message,
-                user_id=state_obj.user_id,
-                limit=5,
-                owner_id=state_obj.user_id
-                # explicitly not passing scope=ContentScope.GLOBAL so we get global too
-            )
+            # Bound the wait so a slow graph query can't hold up the whole turn
+            try:
+                graph_results = await asyncio.wait_for(
+                    self._search_graphiti(last_user_message, state["user_id"]),
+                    timeout=settings.AGENT_RETRIEVAL_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"Graphiti search exceeded {settings.AGENT_RETRIEVAL_TIMEOUT_SECONDS}s, continuing without graph results")
+                graph_results = []
+                update["retrieval_degraded"] = True
             
             # Log detailed entity results
             # logger.info(f"Retrieved {len(entity_results)} entities from Graphiti")
@@ -259,27 +546,29 @@ class TwinAgent:
                 logger.info(f"Fact {i+1}: {fact_text} (confidence: {safe_score:.2f})")
             
             # Combine the results
-            state_obj.graphiti_results = {
+            update["graphiti_results"] = {
                 # "entities": entity_results,
                 "graph": graph_results
             }
             
         except Exception as e:
-            state_obj.error = f"Graphiti retrieval error: {str(e)}"
-            logger.error(state_obj.error)
+            update["error"] = f"Graphiti retrieval error: {str(e)}"
+            logger.error(update["error"])
         
         # add a timer to see how long the search takes
         end_time = time.time()
         logger.info(f"Graphiti search completed in {end_time - start_time:.2f} seconds")
         
-        return state_obj.to_dict()
+        return update
     
-    async def _merge_context(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _merge_context(self, state: AgentStateDict) -> AgentStateDict:
         """Merge context from different sources."""
-        state_obj = AgentState.from_dict(state)
+        messages = state.get("messages") or []
+        mem0_results = state.get("mem0_results") or []
+        graphiti_results = state.get("graphiti_results") or {}
         
         try:
-            merged_context = "Relevant context:\n\n"
+            parts = []
             
             # Get previous conversation context if this is a new conversation
             try:
@@ -288,9 +577,9 @@ class TwinAgent:
                 
                 # Extract conversation ID from messages if available
                 conversation_id = None
-                if state_obj.messages and len(state_obj.messages) > 0:
+                if messages:
                     # Look for the conversation_id in message metadata
-                    for msg in state_obj.messages:
+                    for msg in messages:
                         if hasattr(msg, 'additional_kwargs') and 'conversation_id' in msg.additional_kwargs:
                             conversation_id = msg.additional_kwargs['conversation_id']
                             break
@@ -298,29 +587,30 @@ class TwinAgent:
                 if conversation_id:
                     # Check if this is a new conversation with few messages - good time to add previous context
                     # We can do this by checking the message count
-                    if len(state_obj.messages) <= 3:  # Only add for new/short conversations
+                    if len(messages) <= 3:  # Only add for new/short conversations
                         # Create the summarization service
                         summarization_service = ConversationSummarizationService(self.db)
                         
                         # Get context (ie the summary) from previous conversations
                         previous_context = await summarization_service.get_previous_conversation_context(
-                            user_id=state_obj.user_id,
+                            user_id=state["user_id"],
                             current_conversation_id=conversation_id
                         )
                         
                         if previous_context:
-                            merged_context += previous_context + "\n\n"
+                            parts.append(previous_context)
+                            parts.append("\n\n")
                     else:
-                        logger.info(f"AGENT: Conversation has {len(state_obj.messages)} messages, skipping previous context retrieval.")
+                        logger.info(f"AGENT: Conversation has {len(messages)} messages, skipping previous context retrieval.")
                 else:
                     logger.info("AGENT: No conversation ID found, skipping previous context retrieval.")
             except Exception as e:
                 logger.warning(f"AGENT: Error getting previous conversation context: {str(e)}", exc_info=True)
             
             # Add Mem0 results
-            if state_obj.mem0_results:
-                merged_context += "From memory:\n"
-                for i, result in enumerate(state_obj.mem0_results):
+            if mem0_results:
+                parts.append("From memory:\n")
+                for i, result in enumerate(mem0_results):
                     content = result.get("content", "")
                     similarity = result.get("similarity", 0)
                     metadata = result.get("metadata", {})
@@ -342,19 +632,16 @@ class TwinAgent:
                     # Format relevance with two decimal places
                     relevance_str = f"{similarity:.2f}" if similarity is not None else "N/A"
                     
-                    # Use a reasonable preview length - longer than before
-                    preview_length = 1000
-                    content_preview = content
-                    if len(content) > preview_length:
-                        content_preview = content[:preview_length] + "..."
+                    # Content is already capped at MEM0_PREVIEW_CHARS by the memory service
+                    ellipsis = "..." if result.get("content_truncated") else ""
                     
-                    merged_context += f"{i+1}. {content_preview} (relevance: {relevance_str}, {meta_str})\n\n"
+                    parts.append(f"{i+1}. {content}{ellipsis} (relevance: {relevance_str}, {meta_str})\n\n")
             
             # Add Graphiti entity results
-            if state_obj.graphiti_results and "entities" in state_obj.graphiti_results:
-                entities = state_obj.graphiti_results["entities"]
+            if "entities" in graphiti_results:
+                entities = graphiti_results["entities"]
                 if entities:
-                    merged_context += "From knowledge graph (entities):\n"
+                    parts.append("From knowledge graph (entities):\n")
                     for i, entity in enumerate(entities):
                         name = entity.get("name", "")
                         labels = entity.get("labels", [])
@@ -364,13 +651,13 @@ class TwinAgent:
                         # Safely format labels
                         labels_str = ", ".join(labels) if labels else ""
                         
-                        merged_context += f"{i+1}. {name} ({labels_str}): {context}\n\n"
+                        parts.append(f"{i+1}. {name} ({labels_str}): {context}\n\n")
             
             # Add Graphiti graph results
-            if state_obj.graphiti_results and "graph" in state_obj.graphiti_results:
-                graph = state_obj.graphiti_results["graph"]
+            if "graph" in graphiti_results:
+                graph = graphiti_results["graph"]
                 if graph:
-                    merged_context += "From knowledge graph (facts):\n"
+                    parts.append("From knowledge graph (facts):\n")
                     for i, fact in enumerate(graph):
                         fact_text = fact.get("fact", "")
                         score = fact.get("score", 0)
@@ -378,61 +665,126 @@ class TwinAgent:
                         # Handle potentially None score with safe default
                         safe_score = 0.0 if score is None else score
                         
-                        merged_context += f"{i+1}. {fact_text} (confidence: {safe_score:.2f})\n\n"
+                        parts.append(f"{i+1}. {fact_text} (confidence: {safe_score:.2f})\n\n")
             
-            state_obj.merged_context = merged_context
+            # Nothing retrieved: leave the header out of the prompt entirely
+            merged_context = "Relevant context:\n\n" + "".join(parts) if parts else ""
             logger.info("AGENT: Successfully merged context from different sources")
             
+            # Context missing a failed or timed-out source must not be reused for similar questions
+            if (self.context_cache and state.get("query_embedding") and not state.get("error")
+                    and not state.get("retrieval_degraded")):
+                self.context_cache.store(
+                    user_id=state["user_id"],
+                    conversation_id=state.get("conversation_id"),
+                    query=self._extract_last_user(state) or "",
+                    embedding=state["query_embedding"],
+                    merged_context=merged_context,
+                    memory_version=state["memory_version"],
+                )
+            
+            return {"merged_context": merged_context}
+            
         except Exception as e:
-            state_obj.error = f"AGENT: Context merging error: {str(e)}"
-            logger.error(state_obj.error, exc_info=True)
-        
-        return state_obj.to_dict()
+            error = f"AGENT: Context merging error: {str(e)}"
+            logger.error(error, exc_info=True)
+            return {"error": error}
     
-    async def _generate_response(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _generate_response(self, state: AgentStateDict) -> AgentStateDict:
         """Generate a response using the LLM."""
-        state_obj = AgentState.from_dict(state)
-        
         try:
-            # Create system prompt with merged context
-            system_content = f"""You are a helpful assistant with access to the user's personal knowledge base.
-            You should answer questions using the context provided when relevant, 
-            but you can also use your general knowledge for common questions.
-            Always be truthful, helpful, and concise.
-            
-            {state_obj.merged_context}
-            """
+            # Static prefix first so it is byte-identical across turns for provider prompt caching
+            merged_context = state.get("merged_context")
+            system_content = self._SYSTEM_PREFIX + merged_context if merged_context else self._SYSTEM_PREFIX.rstrip()
             
             # Log the full system prompt for debugging
             logger.info(f"System prompt sent to LLM:\n{system_content}")
             
             # Prepare messages
             messages = [SystemMessage(content=system_content)]
-            messages.extend(state_obj.messages)
+            messages.extend(state.get("messages") or [])
             
             # Call the LLM
-            response = await self.llm.ainvoke(messages)
+            extra_body = {"prompt_cache_key": f"twin:{state.get('user_id')}"}
+            if self._token_queue is not None:
+                # Streaming caller: forward tokens as they arrive
+                chunks = []
+                async for chunk in self.llm.astream(messages, extra_body=extra_body):
+                    if chunk.content:
+                        chunks.append(chunk.content)
+                        self._token_queue.put_nowait(chunk.content)
+                content = "".join(chunks)
+            else:
+                response = await self.llm.ainvoke(messages, extra_body=extra_body)
+                content = response.content
             
-            # Save the response
-            state_obj.twin_response = response.content
             logger.info("Successfully generated response from LLM")
+            return {"twin_response": content}
             
         except Exception as e:
-            state_obj.error = f"Response generation error: {str(e)}"
-            logger.error(state_obj.error)
-        
-        return state_obj.to_dict()
+            error = f"Response generation error: {str(e)}"
+            logger.error(error)
+            return {"error": error}
     
-    def _should_end(self, state: Dict[str, Any]) -> str:
+    @staticmethod
+    def _route_after(state: Dict[str, Any]) -> str:
+        """Stop the workflow once a step has recorded an error."""
+        return "end" if state.get("error") else "continue"
+    
+    @staticmethod
+    def _should_end(state: Dict[str, Any]) -> str:
         """Determine if the workflow should end."""
-        state_obj = AgentState.from_dict(state)
-        
         # End if there's an error or we have a response
-        if state_obj.error or state_obj.twin_response:
+        if state.get("error") or state.get("twin_response"):
             return END
         
-        # Continue to retrieve from Graphiti
-        return "retrieve_from_graphiti"
+        # Retry retrieval
+        return "retrieve_context"
+    
+    async def chat_stream(
+        self, user_message: str, user_id: str, conversation_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Process a user message and yield the response as it is generated.
+        
+        LLM tokens are yielded as they arrive. Turns that never reach the LLM
+        (cached responses, errors) yield the full reply as a single chunk.
+        
+        Args:
+            user_message: The user's message
+            user_id: The user ID
+            conversation_id: Optional conversation ID for context preservation
+            
+        Yields:
+            Pieces of the agent's response
+            
+        Raises:
+            RuntimeError: If the turn fails after some tokens were already yielded
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._token_queue = queue
+        
+        async def run_turn() -> str:
+            try:
+                return await self.chat(user_message, user_id, conversation_id)
+            finally:
+                queue.put_nowait(_STREAM_END)
+        
+        turn = asyncio.create_task(run_turn())
+        streamed = []
+        try:
+            while (token := await queue.get()) is not _STREAM_END:
+                streamed.append(token)
+                yield token
+            response = await turn
+            if not streamed:
+                yield response
+            elif response != "".join(streamed):
+                # Generation failed part-way, so the tokens already sent are not the reply
+                raise RuntimeError(f"Streamed turn failed after {len(streamed)} tokens: {response}")
+        finally:
+            self._token_queue = None
+            if not turn.done():
+                turn.cancel()
     
     async def chat(self, user_message: str, user_id: str, conversation_id: Optional[str] = None) -> str:
         """Process a user message and generate a response.
@@ -445,6 +797,47 @@ class TwinAgent:
         Returns:
             The agent's response
         """
+        # Cached entries built before the user's latest ingested memories are stale;
+        # without a version (Redis down) both caches are bypassed
+        memory_version = await get_memory_version(user_id) if self.response_cache or self.context_cache else None
+        
+        # An exact repeat of a recent question in this conversation needs no retrieval or LLM call
+        if self.response_cache and memory_version is not None:
+            cached_response = self.response_cache.get(user_id, conversation_id, user_message, memory_version)
+            if cached_response is not None:
+                logger.info("AGENT: Response cache hit, skipping workflow")
+                return cached_response
+        
+        # Coalesce identical questions that arrive while one is still being answered
+        turn_key = (user_id, conversation_id, normalize_query(user_message))
+        inflight = _inflight_turns.get(turn_key)
+        if inflight is not None:
+            logger.info("AGENT: Identical turn already in flight, waiting for its response")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The turn we joined was cancelled; answer this one ourselves
+        
+        inflight = asyncio.get_running_loop().create_future()
+        _inflight_turns[turn_key] = inflight
+        try:
+            response = await self._run_turn(user_message, user_id, conversation_id, memory_version)
+            inflight.set_result(response)
+            return response
+        finally:
+            if _inflight_turns.get(turn_key) is inflight:
+                del _inflight_turns[turn_key]
+            if not inflight.done():
+                inflight.cancel()
+    
+    async def _run_turn(self, user_message: str, user_id: str, conversation_id: Optional[str],
+                        memory_version: Optional[int]) -> str:
+        """Run the workflow for one user message and turn the final state into a reply.
+        
+        Context and the reply are cached under memory_version, unless that is None.
+        """
         try:
             # Create initial state with user message
             # Add conversation_id to the message metadata for context preservation
@@ -455,19 +848,25 @@ class TwinAgent:
             state = AgentState(
                 user_id=user_id,
                 messages=[user_msg],
+                conversation_id=conversation_id,
+                memory_version=memory_version,
+                last_user_message=user_message,
                 mem0_results=[],
                 graphiti_results={},
             ).to_dict()
             
             # Execute the workflow on this state - using compile() and invoke directly
-            compiled_graph = self.workflow.compile()
-            result = await compiled_graph.ainvoke(state)
+            compiled_graph = self._get_compiled_workflow()
+            result = await compiled_graph.ainvoke(state, config={"configurable": {"agent": self}})
             
             # Create final state object from result
             final_state = AgentState.from_dict(result)
             
             # Return the response or an error message
             if final_state.twin_response:
+                # A reply built without one of the context sources is not worth repeating
+                if self.response_cache and memory_version is not None and not final_state.retrieval_degraded:
+                    self.response_cache.put(user_id, conversation_id, user_message, memory_version, final_state.twin_response)
                 return final_state.twin_response
             elif final_state.error:
                 return f"I encountered an error: {final_state.error}"
@@ -1,17 +1,31 @@
-"""Common constants shared across multiple services."""
+"""Common constants shared across multiple services.
+
+Everything here is immutable: sets are frozensets, mappings are read-only views.
+"""
+
+from types import MappingProxyType
+
+__all__ = [
+    "TRAIT_TYPE_TO_RELATIONSHIP_MAPPING",
+    "RELATIONSHIP_TYPES",
+    "RELATIONSHIP_TYPES_TUPLE",
+    "ENTITY_TYPE_MAPPING",
+    "ENTITY_PAIR_RELATIONSHIP_MAPPING",
+    "IMPORTANT_ENTITY_TYPES",
+]
 
 # Mapping from trait types to relationship types
-TRAIT_TYPE_TO_RELATIONSHIP_MAPPING = {
+TRAIT_TYPE_TO_RELATIONSHIP_MAPPING = MappingProxyType({
     "skill": "HAS_SKILL",
     "interest": "INTERESTED_IN",
     "preference": "PREFERS",
     "like": "LIKES",
     "dislike": "DISLIKES",
     "attribute": "HAS_ATTRIBUTE"
-}
+})
 
-# Valid relationship types for entity connections
-RELATIONSHIP_TYPES = [
+# Valid relationship types for entity connections, in prompt/index order
+RELATIONSHIP_TYPES_TUPLE = (
     "ASSOCIATED_WITH",    # Generic association between entities
     "HAS_MEMBER",         # Organization has a person as member
     "RELATED_TO",         # Generic relation between people
@@ -44,10 +58,13 @@ RELATIONSHIP_TYPES = [
     "DISLIKES",           # Entity dislikes another entity
     "LIKES",              # Entity likes another entity
     "HAS_ATTRIBUTE",      # Entity has an attribute
-]
+)
+
+# Same types as a set, for membership checks
+RELATIONSHIP_TYPES = frozenset(RELATIONSHIP_TYPES_TUPLE)
 
 # Entity types mapping for NLP extraction
-ENTITY_TYPE_MAPPING = {
+ENTITY_TYPE_MAPPING = MappingProxyType({
     "PERSON": "Person",
     "ORG": "Organization",
     "GPE": "Location",
@@ -74,7 +91,43 @@ ENTITY_TYPE_MAPPING = {
     "PREFERENCE": "Preference",
     "LIKE": "Like",
     "DISLIKE": "Dislike"
-}
+})
+
+# Default relationship type for a (source entity type, target entity type) pair,
+# used when the LLM returns a type outside RELATIONSHIP_TYPES
+ENTITY_PAIR_RELATIONSHIP_MAPPING = MappingProxyType({
+    ("Person", "Organization"): "ASSOCIATED_WITH",
+    ("Organization", "Person"): "HAS_MEMBER",
+    ("Person", "Person"): "RELATED_TO",
+    ("Person", "Location"): "LOCATED_IN",
+    ("Organization", "Location"): "BASED_IN",
+    ("Person", "Document"): "CREATED",
+    ("Document", "Person"): "CREATED_BY",
+    ("Person", "Event"): "PARTICIPATED_IN",
+    ("Event", "Person"): "INVOLVED",
+    ("Organization", "Event"): "ORGANIZED",
+    ("Event", "Organization"): "ORGANIZED_BY",
+    ("Event", "Location"): "LOCATED_IN",
+    ("Event", "Date"): "OCCURRED_ON",
+    ("Document", "Date"): "PUBLISHED_ON",
+    ("Organization", "Document"): "PUBLISHED",
+    ("Document", "Organization"): "PUBLISHED_BY",
+    ("Person", "Product"): "ASSOCIATED_WITH",
+    ("Organization", "Product"): "PRODUCED",
+    ("Product", "Organization"): "PRODUCED_BY",
+    # Added trait/attribute relationship mappings
+    ("Person", "Cardinal"): "HAS_ATTRIBUTE",  # For age and numeric attributes
+    ("Person", "Attribute"): "HAS_ATTRIBUTE",
+    ("Person", "Interest"): "INTERESTED_IN",
+    ("Person", "Skill"): "HAS_SKILL",
+    ("Person", "Preference"): "LIKES",
+    ("Person", "Dislike"): "DISLIKES",
+    # Common entity types that should be treated as attributes
+    ("Person", "Number"): "HAS_ATTRIBUTE",
+    ("Person", "Quantity"): "HAS_ATTRIBUTE",
+    ("Person", "Age"): "HAS_ATTRIBUTE",
+    ("Person", "Date"): "HAS_ATTRIBUTE",  # For birthdays, etc.
+})
 
 # Important entity types that we want to prioritize and preserve
-IMPORTANT_ENTITY_TYPES = ["Person", "Organization", "Location", "Product", "Event", "Date", "Time", "Preference", "Like", "Dislike", "Skill", "Interest", "Attribute"] 
\ No newline at end of file
+IMPORTANT_ENTITY_TYPES = frozenset({"Person", "Organization", "Location", "Product", "Event", "Date", "Time", "Preference", "Like", "Dislike", "Skill", "Interest", "Attribute"})
@@ -0,0 +1,69 @@
+"""Per-user memory version counters shared through Redis.
+
+Ingestion runs in Celery workers while the agent's caches live in the API
+process, so neither can reach the other's memory. Ingestion bumps a user's
+version whenever it stores new memories; caches remember the version their
+entries were built from and ignore entries from an older one.
+"""
+
+import logging
+from typing import Optional
+
+import redis
+import redis.asyncio
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "memory_version"
+
+# Shared per process; the async client serves the API event loop
+_redis_client = None
+_async_redis_client = None
+
+
+def _key(user_id: str) -> str:
+    return f"{KEY_PREFIX}:{user_id}"
+
+
+def get_redis_client() -> redis.Redis:
+    """Get or create the Redis client used to bump versions."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_client
+
+
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """Get or create the async Redis client used to read versions."""
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+    return _async_redis_client
+
+
+def bump_memory_version(user_id: str) -> None:
+    """Mark everything cached for a user before now as stale.
+
+    Redis errors are logged; cached entries then live until their TTL.
+    """
+    try:
+        get_redis_client().incr(_key(user_id))
+    except redis.RedisError as e:
+        logger.warning(f"Failed to bump memory version for user {user_id}: {e}")
+
+
+async def get_memory_version(user_id: str) -> Optional[int]:
+    """Current memory version for a user.
+
+    Returns:
+        The version (0 before any bump), or None when Redis can't be reached,
+        in which case callers should not trust their caches
+    """
+    try:
+        value = await get_async_redis_client().get(_key(user_id))
+    except redis.RedisError as e:
+        logger.warning(f"Failed to read memory version for user {user_id}: {e}")
+        return None
+    return int(value) if value else 0
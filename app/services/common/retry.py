@@ -0,0 +1,41 @@
+"""Retry policy for transient failures in calls to external services."""
+
+from typing import Callable
+
+import httpx
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+# Total attempts per call, including the first one
+RETRY_ATTEMPTS = 3
+
+
+def is_transient_http_error(exc: BaseException) -> bool:
+    """True for connection failures, rate limits and 5xx responses."""
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+
+def transient_retry(is_transient: Callable[[BaseException], bool]) -> AsyncRetrying:
+    """Build an async retry loop with exponential backoff and jitter.
+
+    Usage:
+        async for attempt in transient_retry(is_transient_http_error):
+            with attempt:
+                result = await call()
+
+    Args:
+        is_transient: Predicate deciding whether an exception is worth retrying
+
+    Returns:
+        AsyncRetrying that re-raises the last error once attempts are exhausted
+    """
+    return AsyncRetrying(
+        stop=stop_after_attempt(RETRY_ATTEMPTS),
+        wait=wait_exponential_jitter(multiplier=0.2, max=2),
+        retry=retry_if_exception(is_transient),
+        reraise=True,
+    )
@@ -1,12 +1,30 @@
 import logging
-from typing import Dict, List, Any, Optional, Tuple, Union
+import re
+from typing import Dict, List, Any, Optional, Sequence, Tuple, Union
+
+import numpy as np
 
 from app.db.models.chat_message import ChatMessage, MessageRole
 from app.db.models.conversation import Conversation
+from app.services.common.memory_version import bump_memory_version
 import abc
 
 logger = logging.getLogger(__name__)
 
+# Keywords that bump a message's importance; matched as substrings, like "meet" in "meeting"
+_IMPORTANCE_RE = re.compile(
+    r"meet|schedule|important|deadline|urgent|remember|don't forget|need to|critical",
+    re.IGNORECASE,
+)
+
+# Default importance by role; assistant/twin messages are never stored
+_BASE_IMPORTANCE_BY_ROLE = {
+    MessageRole.USER: 0.5,
+    MessageRole.ASSISTANT: 0.0,
+    MessageRole.SYSTEM: 0.7,
+}
+_DEFAULT_BASE_IMPORTANCE = 0.3
+
 
 class BaseChatMem0Ingestion(abc.ABC):
     """Base service for ingesting chat messages into Mem0."""
@@ -53,26 +71,16 @@ class BaseChatMem0Ingestion(abc.ABC):
             return 0.0
             
         # Default importance by role
-        base_importance = {
-            MessageRole.USER: 0.5,
-            MessageRole.ASSISTANT: 0.0,  # set to 0 to never store assistant messages
-            MessageRole.SYSTEM: 0.7
-        }.get(message.role, 0.3)
+        base_importance = _BASE_IMPORTANCE_BY_ROLE.get(message.role, _DEFAULT_BASE_IMPORTANCE)
         
         # Adjust based on content length (longer might be more important)
         content_length = len(message.content)
         length_factor = min(content_length / 500, 1.0) * 0.3
         
         # Adjust based on keywords (placeholder for more sophisticated NLP)
-        keyword_factor = 0.0
-        important_keywords = ["meet", "schedule", "important", "deadline", "urgent", 
-                             "remember", "don't forget", "need to", "critical"]
-        
-        for keyword in important_keywords:
-            if keyword in message.content.lower():
-                keyword_factor += 0.05
-        
-        keyword_factor = min(keyword_factor, 0.2)
+        # Each distinct keyword counts once, capped at 4
+        matched_keywords = {match.lower() for match in _IMPORTANCE_RE.findall(message.content)}
+        keyword_factor = min(len(matched_keywords) * 0.05, 0.2)
         
         # Calculate final score
         importance_score = base_importance + length_factor + keyword_factor
@@ -80,6 +88,48 @@ class BaseChatMem0Ingestion(abc.ABC):
         
         return importance_score
     
+    def _on_memory_stored(self, message: ChatMessage) -> None:
+        """Mark agent caches that may now be missing this user's new memory as stale."""
+        bump_memory_version(message.user_id)
+    
+    @classmethod
+    def _calculate_importance_batch(cls, messages: Sequence[ChatMessage]) -> np.ndarray:
+        """Vectorized _calculate_importance for a batch of messages.
+        
+        Args:
+            messages: Messages to score
+            
+        Returns:
+            Array of importance scores (0.0-1.0), in message order
+        """
+        count = len(messages)
+        base = np.fromiter(
+            (_BASE_IMPORTANCE_BY_ROLE.get(m.role, _DEFAULT_BASE_IMPORTANCE) for m in messages),
+            dtype=np.float64, count=count
+        )
+        lengths = np.fromiter((len(m.content) for m in messages), dtype=np.int32, count=count)
+        keyword_counts = np.fromiter(
+            (len({match.lower() for match in _IMPORTANCE_RE.findall(m.content)}) for m in messages),
+            dtype=np.int16, count=count
+        )
+        is_assistant = np.fromiter((m.role == MessageRole.ASSISTANT for m in messages), dtype=bool, count=count)
+        
+        length_factor = np.minimum(lengths / 500, 1.0) * 0.3
+        keyword_factor = np.minimum(keyword_counts * 0.05, 0.2)
+        scores = np.clip(base + length_factor + keyword_factor, 0.1, 1.0)
+        
+        # Assistant/twin messages always score 0
+        scores[is_assistant] = 0.0
+        return scores
+    
+    def _prescore_messages(self, messages: Sequence[ChatMessage]) -> None:
+        """Fill in importance_score for every unscored message in one batch."""
+        unscored = [m for m in messages if m.importance_score is None and self.should_ingest(m)]
+        if not unscored:
+            return
+        for message, score in zip(unscored, self._calculate_importance_batch(unscored).tolist()):
+            message.importance_score = score
+    
     def _get_ttl_for_importance(self, importance_score: float) -> int:
         """Determine TTL (in days) based on importance score.
         
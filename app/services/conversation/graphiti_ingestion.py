@@ -5,21 +5,61 @@ import logging
 import json
 from collections import defaultdict
 import asyncio
+import re
 
 from app.db.models.chat_message import ChatMessage, MessageRole
 from app.db.models.conversation import Conversation
 from app.db.models.user_profile import UserProfile
 from app.services.graph import GraphitiService
-from app.services.ingestion.entity_extraction_gemini import EntityExtractor
+from app.services.ingestion.entity_extraction_factory import get_entity_extractor
+from app.services.ingestion.extraction_cache import CachedEntityExtractor
 from app.services.traits import TraitExtractionService
+from app.services.common.memory_version import bump_memory_version
 from app.services.extraction_pipeline import ExtractionPipeline
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select, update, func, or_, tuple_
+from sqlalchemy.orm import joinedload, raiseload
 from app.db.models.user import User
+from app.core.config import settings
+from app.core.async_runner import run_async
 
 logger = logging.getLogger(__name__)
 
+# Loads what aprocess_message needs alongside each pending message; any other
+# relationship access raises, rather than quietly costing a query per message
+MESSAGE_LOAD_OPTIONS = (
+    joinedload(ChatMessage.conversation),
+    joinedload(ChatMessage.user).joinedload(User.profile),
+    raiseload("*"),
+)
+
+# Messages the pipeline has work for; assistant and blank messages only ever get flagged
+ELIGIBLE_MESSAGE_CRITERIA = (
+    ChatMessage.role != MessageRole.ASSISTANT,
+    func.length(func.trim(ChatMessage.content)) > 0,
+)
+
+# Acknowledgements and filler that never carry entities or traits on their own
+FILLER_WORDS = frozenset({
+    "ok", "okay", "k", "kk", "sure", "yes", "yeah", "yep", "no", "nope", "nah",
+    "thanks", "thank", "you", "thx", "ty", "cool", "great", "nice", "good", "sounds",
+    "got", "it", "lol", "haha", "hi", "hey", "hello", "bye", "alright", "right", "hmm", "oh", "ah",
+})
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def is_extractable(content: str) -> bool:
+    """Whether a message could yield entities or traits, so is worth an LLM call.
+    
+    Messages shorter than GRAPHITI_MIN_EXTRACTABLE_CHARS, with no words at all
+    (punctuation, emoji), or made up only of filler words are not.
+    """
+    stripped = content.strip()
+    if len(stripped) < settings.GRAPHITI_MIN_EXTRACTABLE_CHARS:
+        return False
+    words = _WORD_PATTERN.findall(stripped.lower())
+    return bool(words) and not all(word in FILLER_WORDS for word in words)
+
 
 class ChatGraphitiIngestion:
     """
@@ -31,18 +71,29 @@ class ChatGraphitiIngestion:
     """
     
 
-    def __init__(self, db_session: Session, graphiti_service: Optional[GraphitiService] = None, entity_extractor=None):
+    def __init__(self, db_session: Session, graphiti_service: Optional[GraphitiService] = None, entity_extractor=None,
+                 max_concurrency: int = settings.GRAPHITI_INGEST_CONCURRENCY,
+                 extraction_batch_size: int = settings.GRAPHITI_EXTRACTION_BATCH_SIZE):
         """Initialize the service.
         
         Args:
             db_session: SQLAlchemy session
             graphiti_service: Optional GraphitiService instance
             entity_extractor: Optional EntityExtractor instance
+            max_concurrency: Maximum messages processed at once in a batch
+            extraction_batch_size: Messages packed into one entity extraction call
         """
         self.db = db_session
-        self.entity_extractor = entity_extractor or EntityExtractor()
+        self.max_concurrency = max_concurrency
+        self.extraction_batch_size = extraction_batch_size
+        if entity_extractor is None:
+            entity_extractor = get_entity_extractor()
+            if settings.EXTRACTION_CACHE_ENABLED:
+                entity_extractor = CachedEntityExtractor(entity_extractor)
+        self.entity_extractor = entity_extractor
         self.graphiti = graphiti_service or GraphitiService()
-        self.trait_service = TraitExtractionService(db_session)
+        # Profile updates are committed together with the message flags
+        self.trait_service = TraitExtractionService(db_session, autocommit=False)
         
         # Create extraction pipeline
         self.extraction_pipeline = ExtractionPipeline(
@@ -58,6 +109,32 @@ class ChatGraphitiIngestion:
         Args:
             message: ChatMessage to process
             
+        Returns:
+            Dictionary with processing results
+        """
+        logger.info(f"Process_chat_message {message.id} with pipeline on the worker event loop")
+        try:
+            return run_async(self.aprocess_message(message))
+        except RuntimeError as e:
+            # Handle cases where the worker loop cannot be used (e.g., nested event loops)
+            # This might indicate a deeper issue, but provides a fallback/error path
+            logger.error(f"Failed to run async pipeline for message {message.id} on the worker event loop: {e}. This might happen if called from an already running event loop.", exc_info=True)
+            return {
+                "status": "error",
+                "reason": f"run_async failed: {e}",
+                "message_id": message.id
+            }
+    
+    async def aprocess_message(self, message: ChatMessage, entity_results: Optional[Dict[str, Any]] = None,
+                               commit: bool = True) -> Dict[str, Any]:
+        """Async version of process_message, for use inside an event loop.
+        
+        Args:
+            message: ChatMessage to process
+            entity_results: Optional entity extraction already done for this message
+            commit: Mark and commit the message here; batch callers pass False and
+                apply the "is_stored_in_graphiti" result to all messages at once
+            
         Returns:
             Dictionary with processing results
         """
@@ -73,108 +150,97 @@ class ChatGraphitiIngestion:
             # Skip assistant messages, we only want to process user messages
             if message.role == MessageRole.ASSISTANT:
                 logger.info(f"Skipping assistant message {message.id}")
-                message.processed_in_graphiti = True  # Mark as processed
-                message.is_stored_in_graphiti = False  # But we didn't store anything
-                self.db.commit()
+                # Mark as processed, but we didn't store anything
+                self._mark_processed(message, stored=False, commit=commit)
                 return {
                     "status": "skipped",
                     "reason": "assistant_message",
-                    "message_id": message.id
+                    "message_id": message.id,
+                    "is_stored_in_graphiti": False
                 }
             
             # Skip if message is empty
             if not message.content or not message.content.strip():
                 logger.info(f"Skipping empty message {message.id}")
-                message.processed_in_graphiti = True  # Mark as processed
-                message.is_stored_in_graphiti = False  # But we didn't store anything
-                self.db.commit()
+                # Mark as processed, but we didn't store anything
+                self._mark_processed(message, stored=False, commit=commit)
                 return {
                     "status": "skipped",
                     "reason": "empty_message",
-                    "message_id": message.id
+                    "message_id": message.id,
+                    "is_stored_in_graphiti": False
                 }
             
-            # Get the conversation for context
-            conversation = None
-            if message.conversation_id:
-                conversation_query = select(Conversation).where(Conversation.id == message.conversation_id)
-                conversation_result = self.db.execute(conversation_query)
-                conversation = conversation_result.scalar_one_or_none()
-                
-            # Get the user for user profile updates
-            user_query = select(User).where(User.id == message.user_id).options(joinedload(User.profile))
-            user_result = self.db.execute(user_query)
-            user = user_result.scalar_one_or_none()
-            
-            if not user:
-                logger.warning(f"User {message.user_id} not found, skipping profile updates")
-                
-            # Use asyncio.run to execute the async pipeline processing
-            logger.info(f"Process_chat_message {message.id} with pipeline using asyncio.run")
-            try:
-                pipeline_result = asyncio.run(
-                    # extract entities, relationships, traits
-                    # process into Graphiti if enabled
-                    # update user profile if enabled
-                    self.extraction_pipeline.process_chat_message(
-                        message_content=message.content,
-                        user_id=message.user_id,
-                        message_id=message.id,
-                        metadata={
-                            "message_id": message.id,
-                            "conversation_title": conversation.title if conversation else None,
-                            "conversation_id": message.conversation_id
-                        },
-                        scope="user",
-                        owner_id=message.user_id
-                    )
-                )
-            except RuntimeError as e:
-                # Handle cases where asyncio.run cannot be used (e.g., nested event loops)
-                # This might indicate a deeper issue, but provides a fallback/error path
-                logger.error(f"Failed to run async pipeline for message {message.id} using asyncio.run: {e}. This might happen if called from an already running event loop.", exc_info=True)
+            # Skip messages like "ok" or "thanks" without calling the LLM
+            if not is_extractable(message.content):
+                logger.info(f"Skipping message {message.id}, too short to extract from")
+                # Mark as processed, but we didn't store anything
+                self._mark_processed(message, stored=False, commit=commit)
                 return {
-                    "status": "error",
-                    "reason": f"asyncio.run failed: {e}",
-                    "message_id": message.id
+                    "status": "skipped",
+                    "reason": "too_short",
+                    "message_id": message.id,
+                    "is_stored_in_graphiti": False
                 }
             
+            # Conversation for context. Batches eager-load it; otherwise the many-to-one
+            # lazy load is served from the identity map once any message of the
+            # conversation has loaded it. The user and profile are loaded by the trait
+            # service only if traits were actually extracted.
+            conversation = message.conversation
+                
+            # extract entities, relationships, traits
+            # process into Graphiti if enabled
+            # update user profile if enabled
+            pipeline_result = await self.extraction_pipeline.process_chat_message(
+                message_content=message.content,
+                user_id=message.user_id,
+                message_id=message.id,
+                metadata={
+                    "message_id": message.id,
+                    "conversation_title": conversation.title if conversation else None,
+                    "conversation_id": message.conversation_id
+                },
+                scope="user",
+                owner_id=message.user_id,
+                entity_results=entity_results
+            )
+            
             # Get the processing results
             processing_result = pipeline_result.get("processing", {})
+            entities = processing_result.get("entities") or []
+            relationships = processing_result.get("relationships") or []
+            traits = processing_result.get("traits") or []
             
             # Skip processing if no entities or traits were found
-            if not processing_result.get("entities", []) and not processing_result.get("traits", []) and not processing_result.get("relationships", []):
+            if not entities and not traits and not relationships:
                 logger.info(f"Skipped storing {message.id} as no entities or relationships or traits were processed in Graphiti")
-                message.processed_in_graphiti = True  # Mark as processed
-                message.is_stored_in_graphiti = False  # But we didn't store anything
-                self.db.commit()
+                # Mark as processed, but we didn't store anything
+                self._mark_processed(message, stored=False, commit=commit)
                 return {
                     "status": "skipped",
                     "reason": "no_entities_or_traits",
-                    "message_id": message.id
+                    "message_id": message.id,
+                    "is_stored_in_graphiti": False
                 }
             
-            # Mark message as processed
-            message.processed_in_graphiti = True  # Always mark as processed
-
-            # Only mark as stored if something was actually created
-            entities_created = len(processing_result.get("entities", [])) > 0
-            traits_created = len(processing_result.get("traits", [])) > 0
-            message.is_stored_in_graphiti = entities_created or traits_created
-            
-            self.db.commit()
+            # Always mark as processed, but only as stored if something was actually created
+            stored = bool(entities or traits)
+            self._mark_processed(message, stored=stored, commit=commit)
             
             logger.info(f"Successfully processed message {message.id} for Graphiti")
             return {
                 "status": "success",
-                "entities": processing_result.get("entities", []),
-                "relationships": processing_result.get("relationships", []),
-                "traits": processing_result.get("traits", []),
-                "message_id": message.id
+                "entities": entities,
+                "relationships": relationships,
+                "traits": traits,
+                "message_id": message.id,
+                "is_stored_in_graphiti": stored
             }
             
         except Exception as e:
-            self.db.rollback()
+            if commit:
+                self.db.rollback()
             logger.error(f"Error processing message {message.id} for Graphiti: {str(e)}")
             return {
                 "status": "error",
@@ -182,6 +248,195 @@ class ChatGraphitiIngestion:
                 "message_id": message.id
             }
     
+    def _mark_processed(self, message: ChatMessage, stored: bool, commit: bool) -> None:
+        """Flag a single message as processed and commit, unless a batch will do it in bulk."""
+        if not commit:
+            return
+        message.processed_in_graphiti = True
+        message.is_stored_in_graphiti = stored
+        self.db.commit()
+        if stored:
+            bump_memory_version(message.user_id)
+    
+    def _mark_processed_bulk(self, process_results: List[Dict[str, Any]]) -> None:
+        """Flag every message a batch finished with, using one UPDATE per stored value.
+        
+        Args:
+            process_results: Results from _aprocess_messages; only those carrying
+                "is_stored_in_graphiti" are updated
+        """
+        ids_by_stored = defaultdict(list)
+        for process_result in process_results:
+            if "is_stored_in_graphiti" in process_result:
+                ids_by_stored[process_result["is_stored_in_graphiti"]].append(process_result["message_id"])
+        
+        for stored, message_ids in ids_by_stored.items():
+            self.db.execute(
+                update(ChatMessage)
+                .where(ChatMessage.id.in_(message_ids))
+                .values(processed_in_graphiti=True, is_stored_in_graphiti=stored)
+            )
+    
+    def _skip_ineligible_pending(self) -> None:
+        """Flag every pending assistant or blank message as processed, without loading it.
+        
+        Committed along with the batch that follows.
+        """
+        result = self.db.execute(
+            update(ChatMessage)
+            .where(
+                ChatMessage.processed_in_graphiti == False,
+                or_(
+                    ChatMessage.role == MessageRole.ASSISTANT,
+                    ChatMessage.content.is_(None),
+                    func.length(func.trim(ChatMessage.content)) == 0,
+                ),
+            )
+            .values(processed_in_graphiti=True, is_stored_in_graphiti=False)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            logger.info(f"Flagged {result.rowcount} assistant or empty messages as processed for Graphiti")
+    
+    def _extraction_groups(self, messages: List[ChatMessage]) -> List[List[ChatMessage]]:
+        """Split the messages that need entity extraction into batches for one LLM call each.
+        
+        Args:
+            messages: Messages about to be processed
+            
+        Returns:
+            Groups of at most extraction_batch_size messages; empty when batching
+            wouldn't save a call
+        """
+        if not settings.ENABLE_GRAPHITI_INGESTION:
+            return []
+        
+        extractable = [
+            message
+            for message in messages
+            if not message.processed_in_graphiti
+            and message.role != MessageRole.ASSISTANT
+            and message.content and is_extractable(message.content)
+        ]
+        if len(extractable) < 2:
+            return []
+        
+        return [extractable[i:i + self.extraction_batch_size]
+                for i in range(0, len(extractable), self.extraction_batch_size)]
+    
+    async def _aextract_group(self, group: List[ChatMessage]) -> Dict[str, Dict[str, Any]]:
+        """Run entity extraction for a group of messages in one LLM call.
+        
+        Args:
+            group: Messages from _extraction_groups
+            
+        Returns:
+            Dictionary mapping message ID to its process_document-style result
+        """
+        documents = [(message.id, message.content) for message in group]
+        try:
+            return await asyncio.to_thread(self.entity_extractor.process_documents_batch, documents)
+        except Exception as e:
+            # Messages without a batch result are extracted individually
+            logger.error(f"Batch entity extraction failed for {len(group)} messages: {e}")
+            return {}
+    
+    async def _aprocess_messages(self, messages: List[ChatMessage]) -> List[Dict[str, Any]]:
+        """Process messages through a two-stage extract -> write pipeline.
+        
+        Extractor workers run batched entity extraction and hand each message to
+        the write queue as soon as its batch returns; writer workers (at most
+        max_concurrency) run the rest of the pipeline, so Gemini and Neo4j waits
+        overlap across messages. Messages needing no batched extraction go straight
+        to the writers. DB session work stays on the event loop thread; messages
+        are not flagged here, see _mark_processed_bulk.
+        
+        Args:
+            messages: Messages to process, with conversation and user eager-loaded
+                (see MESSAGE_LOAD_OPTIONS)
+            
+        Returns:
+            Per-message processing results, in message order
+        """
+        groups = self._extraction_groups(messages)
+        batched_ids = {message.id for group in groups for message in group}
+        
+        extract_q: asyncio.Queue = asyncio.Queue()
+        write_q: asyncio.Queue = asyncio.Queue()
+        for group in groups:
+            extract_q.put_nowait(group)
+        for message in messages:
+            if message.id not in batched_ids:
+                write_q.put_nowait((message, None))
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        
+        async def extractor() -> None:
+            while not extract_q.empty():
+                group = extract_q.get_nowait()
+                entity_results = await self._aextract_group(group)
+                for message in group:
+                    write_q.put_nowait((message, entity_results.get(message.id)))
+        
+        async def writer() -> None:
+            while True:
+                item = await write_q.get()
+                if item is None:
+                    return
+                message, entity_results = item
+                results[message.id] = await self.aprocess_message(message, entity_results, commit=False)
+        
+        writers = [asyncio.create_task(writer()) for _ in range(self.max_concurrency)]
+        try:
+            await asyncio.gather(*(extractor() for _ in range(min(self.max_concurrency, len(groups)))))
+            for _ in writers:
+                write_q.put_nowait(None)
+            await asyncio.gather(*writers)
+        finally:
+            for task in writers:
+                task.cancel()
+        
+        process_results = [results[message.id] for message in messages]
+        
+        too_short = sum(1 for process_result in process_results if process_result.get("reason") == "too_short")
+        if too_short:
+            logger.info(f"Skipped extraction for {too_short} of {len(messages)} messages as too short")
+        return process_results
+    
+    def _process_batch(self, messages: List[ChatMessage], results: Dict[str, Any]) -> Dict[str, Any]:
+        """Process loaded messages with bounded concurrency, then commit them in one go.
+        
+        If the commit fails the messages stay pending and are processed again; their
+        entities and relationships are merged in Neo4j, so the retry doesn't duplicate them.
+        
+        Args:
+            messages: Messages loaded with MESSAGE_LOAD_OPTIONS
+            results: Summary dictionary to tally per-message statuses into
+            
+        Returns:
+            The updated results dictionary
+        """
+        process_results = run_async(self._aprocess_messages(messages))
+        self._mark_processed_bulk(process_results)
+        self.db.commit()
+        
+        # New graph facts make the agent's cached answers for these users stale
+        for user_id in {message.user_id for message, process_result in zip(messages, process_results)
+                        if process_result.get("is_stored_in_graphiti")}:
+            bump_memory_version(user_id)
+        
+        for process_result in process_results:
+            results["details"].append(process_result)
+            
+            if process_result["status"] == "success":
+                results["success"] += 1
+            elif process_result["status"] == "skipped":
+                results["skipped"] += 1
+            else:
+                results["errors"] += 1
+        
+        return results
+    
     def process_pending_messages(self, limit: int = 50) -> Dict[str, Any]:
         """Process pending messages that haven't been processed through Graphiti.
         
@@ -192,15 +447,20 @@ class ChatGraphitiIngestion:
             Dictionary with processing results
         """
         try:
-            # Find unprocessed messages
+            # Flag assistant and blank messages in SQL, so the limit only counts real work
+            self._skip_ineligible_pending()
+            
+            # Find unprocessed messages, with everything processing needs in the same round-trip
             query = (
                 select(ChatMessage)
-                .where(ChatMessage.processed_in_graphiti == False)
+                .options(*MESSAGE_LOAD_OPTIONS)
+                .where(ChatMessage.processed_in_graphiti == False, *ELIGIBLE_MESSAGE_CRITERIA)
+                .order_by(ChatMessage.created_at)
                 .limit(limit)
             )
             
             result = self.db.execute(query)
-            messages = result.scalars().all()
+            messages = result.unique().scalars().all()
             
             results = {
                 "total": len(messages),
@@ -210,21 +470,10 @@ class ChatGraphitiIngestion:
                 "details": []
             }
             
-            # Process each message
-            for message in messages:
-                process_result = self.process_message(message)
-                results["details"].append(process_result)
-                
-                if process_result["status"] == "success":
-                    results["success"] += 1
-                elif process_result["status"] == "skipped":
-                    results["skipped"] += 1
-                else:
-                    results["errors"] += 1
-            
-            return results
+            return self._process_batch(messages, results)
             
         except Exception as e:
+            self.db.rollback()
             logger.error(f"Error processing pending messages for Graphiti: {str(e)}")
             return {
                 "status": "error",
@@ -235,50 +484,101 @@ class ChatGraphitiIngestion:
                 "errors": 0
             }
     
-    def process_conversation(self, conversation_id: str) -> Dict[str, Any]:
-        """Process all messages in a conversation for Graphiti.
+    def process_messages(self, message_ids: List[str]) -> Dict[str, Any]:
+        """Process specific messages through Graphiti as one batch.
+        
+        Messages that are missing or already processed are ignored.
         
         Args:
-            conversation_id: ID of the conversation to process
+            message_ids: IDs of the messages to process
             
         Returns:
             Dictionary with processing results
         """
         try:
-            # Find unprocessed messages in the conversation
             query = (
                 select(ChatMessage)
-                .where(ChatMessage.conversation_id == conversation_id)
+                .options(*MESSAGE_LOAD_OPTIONS)
+                .where(ChatMessage.id.in_(message_ids))
                 .where(ChatMessage.processed_in_graphiti == False)
             )
             
             result = self.db.execute(query)
-            messages = result.scalars().all()
+            messages = result.unique().scalars().all()
             
             results = {
                 "total": len(messages),
                 "success": 0,
                 "skipped": 0,
                 "errors": 0,
+                "details": []
+            }
+            
+            return self._process_batch(messages, results)
+            
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error processing {len(message_ids)} messages for Graphiti: {str(e)}")
+            return {
+                "status": "error",
+                "reason": str(e),
+                "total": 0,
+                "success": 0,
+                "skipped": 0,
+                "errors": 0
+            }
+    
+    def process_conversation(self, conversation_id: str) -> Dict[str, Any]:
+        """Process all messages in a conversation for Graphiti.
+        
+        Args:
+            conversation_id: ID of the conversation to process
+            
+        Returns:
+            Dictionary with processing results
+        """
+        try:
+            results = {
+                "total": 0,
+                "success": 0,
+                "skipped": 0,
+                "errors": 0,
                 "conversation_id": conversation_id,
                 "details": []
             }
             
-            # Process each message
-            for message in messages:
-                process_result = self.process_message(message)
-                results["details"].append(process_result)
+            # Walk unprocessed messages in chronological pages so a long conversation is never
+            # loaded at once; keyset paging on (created_at, id) also moves past messages that
+            # failed to process, with the random UUID id only breaking created_at ties
+            last_key = None
+            while True:
+                query = (
+                    select(ChatMessage)
+                    .options(*MESSAGE_LOAD_OPTIONS)
+                    .where(ChatMessage.conversation_id == conversation_id)
+                    .where(ChatMessage.processed_in_graphiti == False)
+                    .order_by(ChatMessage.created_at, ChatMessage.id)
+                    .limit(settings.GRAPHITI_INGEST_PAGE_SIZE)
+                )
+                if last_key is not None:
+                    query = query.where(tuple_(ChatMessage.created_at, ChatMessage.id) > tuple_(*last_key))
+                
+                result = self.db.execute(query)
+                messages = result.unique().scalars().all()
+                if not messages:
+                    break
+                last_key = (messages[-1].created_at, messages[-1].id)
                 
-                if process_result["status"] == "success":
-                    results["success"] += 1
-                elif process_result["status"] == "skipped":
-                    results["skipped"] += 1
-                else:
-                    results["errors"] += 1
+                results["total"] += len(messages)
+                self._process_batch(messages, results)
+                
+                if len(messages) < settings.GRAPHITI_INGEST_PAGE_SIZE:
+                    break
             
             return results
             
         except Exception as e:
+            self.db.rollback()
             logger.error(f"Error processing conversation {conversation_id} for Graphiti: {str(e)}")
             return {
                 "status": "error",
@@ -124,6 +124,8 @@ class ChatMem0Ingestion(BaseChatMem0Ingestion):
             message.processed_in_mem0 = True
             # Set is_stored_in_mem0 based on whether we got a memory ID
             message.is_stored_in_mem0 = memory_id is not None
+            if message.is_stored_in_mem0:
+                self._on_memory_stored(message)
                                     
             await self.db.commit()
             
@@ -173,6 +175,9 @@ class ChatMem0Ingestion(BaseChatMem0Ingestion):
                 "details": []
             }
             
+            # Score the whole batch up front instead of one message at a time
+            self._prescore_messages(messages)
+            
             # Process each message
             for message in messages:
                 process_result = await self.process_message(message)
@@ -227,6 +232,9 @@ class ChatMem0Ingestion(BaseChatMem0Ingestion):
                 "details": []
             }
             
+            # Score the whole batch up front instead of one message at a time
+            self._prescore_messages(messages)
+            
             # Process each message
             for message in messages:
                 process_result = await self.process_message(message)
@@ -1,18 +1,30 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Any, Optional, Tuple
 import uuid
 
 from app.db.models.chat_message import ChatMessage
 from app.db.models.conversation import Conversation
-from app.services.memory import MemoryClient
+from app.services.memory import get_mem0_client
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, or_
 from app.core.config import settings
 from app.services.conversation.base_mem0_ingestion import BaseChatMem0Ingestion
 
 logger = logging.getLogger(__name__)
 
 
+def mem0_unclaimed(now: Optional[datetime] = None):
+    """SQL criterion for messages no worker holds a live Mem0 claim on.
+    
+    Claims older than MEM0_CLAIM_TIMEOUT_SECONDS belong to a worker that died
+    mid-call and can be taken over.
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(seconds=settings.MEM0_CLAIM_TIMEOUT_SECONDS)
+    return or_(ChatMessage.mem0_claimed_at.is_(None), ChatMessage.mem0_claimed_at < cutoff)
+
+
 class SyncChatMem0Ingestion(BaseChatMem0Ingestion):
     """Service for ingesting chat messages into Mem0 synchronously."""
     
@@ -24,12 +36,10 @@ class SyncChatMem0Ingestion(BaseChatMem0Ingestion):
         """
         super().__init__(db_session)
         
-        # Initialize the Mem0 client directly
-        api_key = settings.MEM0_API_KEY
-        if not api_key:
-            logger.warning("MEM0_API_KEY not set, memory functions will not work correctly")
-        
-        self.mem0_client = MemoryClient(api_key=api_key)
+        # Reuse the process-wide Mem0 client rather than re-validating the API key per task
+        self.mem0_client = get_mem0_client()
+        if not self.mem0_client:
+            logger.warning("SyncChatMem0Ingestion initialized without a valid Mem0 client")
     
     def process_message(self, message: ChatMessage) -> Dict[str, Any]:
         """Process a chat message and ingest it into Mem0.
@@ -84,61 +94,9 @@ class SyncChatMem0Ingestion(BaseChatMem0Ingestion):
                     "message_id": message.id
                 }
             
-            # Build metadata using base class method
-            meta_data = self._build_message_metadata(message, conversation)
-            
-            # Determine TTL based on importance
-            ttl_days = self._get_ttl_for_importance(message.importance_score)
-            
-            # Get formatted messages for Mem0
-            messages = self._format_mem0_messages(message.content)
-            
-            # Add to memory using the synchronous Mem0 client
-            raw_result = self.mem0_client.add(
-                messages, 
-                user_id=message.user_id, 
-                metadata=meta_data,
-                version="v2",
-                output_format="v1.1",
-                ttl_days=ttl_days,
-                infer=settings.MEM0_INFERENCE
-            )
-            
-            # Process the result to handle different response formats
-            memory_id = None
-            if isinstance(raw_result, dict):
-                # Handle v2 API format which returns {'results': [...]}
-                if "results" in raw_result and raw_result["results"]:
-                    result_obj = raw_result["results"][0]
-                    memory_id = result_obj.get("id") or result_obj.get("memory_id")
-                # Direct response format (v1)
-                elif "memory_id" in raw_result:
-                    memory_id = raw_result["memory_id"]
-                elif "id" in raw_result:
-                    memory_id = raw_result["id"]
-                # Handle empty results array case
-                elif "results" in raw_result and not raw_result["results"]:
-                    # Don't generate a memory ID since Mem0 decided not to store it
-                    memory_id = None
-                    logger.info(f"Mem0 returned empty results array - content not stored in Mem0")
-            
-            # Update message with Mem0 ID
-            message.mem0_message_id = memory_id
-            # Mark as processed always, whether it was stored or not
-            message.processed_in_mem0 = True
-            # Set is_stored_in_mem0 based on whether we got a memory ID
-            message.is_stored_in_mem0 = memory_id is not None
-            
+            process_result = self._apply_mem0_result(message, *self._add_to_mem0(message, conversation))
             self.db.commit()
-            
-            logger.info(f"Successfully ingested message {message.id} to Mem0 with ID {memory_id}")
-            return {
-                "status": "success",
-                "memory_id": memory_id,
-                "importance_score": message.importance_score,
-                "ttl_days": ttl_days,
-                "message_id": message.id
-            }
+            return process_result
             
         except Exception as e:
             self.db.rollback()
@@ -149,6 +107,150 @@ class SyncChatMem0Ingestion(BaseChatMem0Ingestion):
                 "message_id": message.id
             }
     
+    def _add_to_mem0(self, message: ChatMessage, conversation: Conversation) -> Tuple[Any, int]:
+        """Send one message to Mem0 without touching the DB session (safe to run in a thread).
+        
+        Args:
+            message: The (already scored) ChatMessage to store
+            conversation: The message's conversation, for metadata
+            
+        Returns:
+            Tuple of (raw Mem0 response, TTL in days)
+        """
+        # Build metadata using base class method
+        meta_data = self._build_message_metadata(message, conversation)
+        
+        # Determine TTL based on importance
+        ttl_days = self._get_ttl_for_importance(message.importance_score)
+        
+        # Get formatted messages for Mem0
+        messages = self._format_mem0_messages(message.content)
+        
+        # Add to memory using the synchronous Mem0 client
+        raw_result = self.mem0_client.add(
+            messages, 
+            user_id=message.user_id, 
+            metadata=meta_data,
+            version="v2",
+            output_format="v1.1",
+            ttl_days=ttl_days,
+            infer=settings.MEM0_INFERENCE
+        )
+        return raw_result, ttl_days
+    
+    def _apply_mem0_result(self, message: ChatMessage, raw_result: Any, ttl_days: int) -> Dict[str, Any]:
+        """Record a Mem0 response on the message (the caller commits).
+        
+        Args:
+            message: The ChatMessage that was sent
+            raw_result: Mem0's response from _add_to_mem0
+            ttl_days: TTL the memory was stored with
+            
+        Returns:
+            Dictionary with processing results
+        """
+        # Process the result to handle different response formats
+        memory_id = None
+        if isinstance(raw_result, dict):
+            # Handle v2 API format which returns {'results': [...]}
+            if "results" in raw_result and raw_result["results"]:
+                result_obj = raw_result["results"][0]
+                memory_id = result_obj.get("id") or result_obj.get("memory_id")
+            # Direct response format (v1)
+            elif "memory_id" in raw_result:
+                memory_id = raw_result["memory_id"]
+            elif "id" in raw_result:
+                memory_id = raw_result["id"]
+            # Handle empty results array case
+            elif "results" in raw_result and not raw_result["results"]:
+                # Don't generate a memory ID since Mem0 decided not to store it
+                memory_id = None
+                logger.info(f"Mem0 returned empty results array - content not stored in Mem0")
+        
+        # Update message with Mem0 ID
+        message.mem0_message_id = memory_id
+        # Mark as processed always, whether it was stored or not
+        message.processed_in_mem0 = True
+        # Set is_stored_in_mem0 based on whether we got a memory ID
+        message.is_stored_in_mem0 = memory_id is not None
+        if message.is_stored_in_mem0:
+            self._on_memory_stored(message)
+        
+        logger.info(f"Successfully ingested message {message.id} to Mem0 with ID {memory_id}")
+        return {
+            "status": "success",
+            "memory_id": memory_id,
+            "importance_score": message.importance_score,
+            "ttl_days": ttl_days,
+            "message_id": message.id
+        }
+    
+    def _ingest_batch(self, messages: List[ChatMessage]) -> List[Dict[str, Any]]:
+        """Ingest a batch of messages, overlapping the Mem0 calls, and commit once.
+        
+        Args:
+            messages: Unprocessed messages to ingest
+            
+        Returns:
+            Per-message processing results, in message order
+        """
+        # Score the whole batch up front instead of one message at a time
+        self._prescore_messages(messages)
+        
+        # Look up every conversation in the batch with one query
+        conversation_ids = {m.conversation_id for m in messages if self.should_ingest(m)}
+        conversations = {}
+        if conversation_ids:
+            conv_result = self.db.execute(
+                select(Conversation).where(Conversation.id.in_(conversation_ids))
+            )
+            conversations = {c.id: c for c in conv_result.scalars().all()}
+        
+        # Resolve skips and lookups on this thread; only the Mem0 calls fan out
+        details: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+        to_send: List[Tuple[int, ChatMessage, Conversation]] = []
+        for i, message in enumerate(messages):
+            if not self.should_ingest(message):
+                message.processed_in_mem0 = True
+                message.is_stored_in_mem0 = False
+                details[i] = {
+                    "status": "skipped",
+                    "reason": "assistant_message_excluded",
+                    "message_id": message.id
+                }
+            elif message.conversation_id not in conversations:
+                logger.error(f"Conversation {message.conversation_id} not found for message {message.id}")
+                details[i] = {
+                    "status": "error",
+                    "reason": "conversation_not_found",
+                    "message_id": message.id
+                }
+            else:
+                to_send.append((i, message, conversations[message.conversation_id]))
+        
+        # Overlap Mem0 latency across messages; the session is only touched on this thread
+        if to_send:
+            max_workers = min(settings.MEM0_INGEST_CONCURRENCY, len(to_send))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    (i, message, executor.submit(self._add_to_mem0, message, conversation))
+                    for i, message, conversation in to_send
+                ]
+                for i, message, future in futures:
+                    try:
+                        details[i] = self._apply_mem0_result(message, *future.result())
+                    except Exception as e:
+                        logger.error(f"Error ingesting message {message.id} to Mem0: {str(e)}")
+                        details[i] = {
+                            "status": "error",
+                            "reason": str(e),
+                            "message_id": message.id
+                        }
+        
+        # One commit for the whole batch
+        self.db.commit()
+        return details
+    
     def process_pending_messages(self, limit: int = 50) -> Dict[str, Any]:
         """Process pending messages that haven't been processed for Mem0.
         
@@ -159,11 +261,12 @@ class SyncChatMem0Ingestion(BaseChatMem0Ingestion):
             Dictionary with processing results
         """
         try:
-            # Find unprocessed messages
+            # Find and claim unprocessed messages; rows another drain has locked are skipped
             query = (
                 select(ChatMessage)
-                .where(ChatMessage.processed_in_mem0 == False)
+                .where(ChatMessage.processed_in_mem0 == False, mem0_unclaimed())
                 .limit(limit)
+                .with_for_update(skip_locked=True)
             )
             
             result = self.db.execute(query)
@@ -177,9 +280,7 @@ class SyncChatMem0Ingestion(BaseChatMem0Ingestion):
                 "details": []
             }
             
-            # Process each message
-            for message in messages:
-                process_result = self.process_message(message)
+            for process_result in self._ingest_batch(messages):
                 results["details"].append(process_result)
                 
                 if process_result["status"] == "success":
@@ -212,38 +313,50 @@ class SyncChatMem0Ingestion(BaseChatMem0Ingestion):
             Dictionary with processing results
         """
         try:
-            # Find unprocessed messages in the conversation
-            query = (
-                select(ChatMessage)
-                .where(ChatMessage.conversation_id == conversation_id)
-                .where(ChatMessage.processed_in_mem0 == False)
-            )
-            
-            result = self.db.execute(query)
-            messages = result.scalars().all()
-            
             results = {
-                "total": len(messages),
+                "total": 0,
                 "success": 0,
                 "skipped": 0,
                 "errors": 0,
                 "conversation_id": conversation_id,
                 "details": []
             }
-
-            logger.info(f"Processing {len(messages)} messages for conversation {conversation_id}")
             
-            # Process each message
-            for message in messages:
-                process_result = self.process_message(message)
-                results["details"].append(process_result)
+            # Walk unprocessed messages in id-ordered pages so a long conversation is never
+            # loaded at once; keyset paging also moves past messages that failed to ingest
+            last_id = None
+            while True:
+                query = (
+                    select(ChatMessage)
+                    .where(ChatMessage.conversation_id == conversation_id)
+                    .where(ChatMessage.processed_in_mem0 == False, mem0_unclaimed())
+                    .order_by(ChatMessage.id)
+                    .limit(settings.MEM0_INGEST_PAGE_SIZE)
+                )
+                if last_id is not None:
+                    query = query.where(ChatMessage.id > last_id)
                 
-                if process_result["status"] == "success":
-                    results["success"] += 1
-                elif process_result["status"] == "skipped":
-                    results["skipped"] += 1
-                else:
-                    results["errors"] += 1
+                result = self.db.execute(query)
+                messages = result.scalars().all()
+                if not messages:
+                    break
+                last_id = messages[-1].id
+                
+                logger.info(f"Processing {len(messages)} messages for conversation {conversation_id}")
+                results["total"] += len(messages)
+                
+                for process_result in self._ingest_batch(messages):
+                    results["details"].append(process_result)
+                    
+                    if process_result["status"] == "success":
+                        results["success"] += 1
+                    elif process_result["status"] == "skipped":
+                        results["skipped"] += 1
+                    else:
+                        results["errors"] += 1
+                
+                if len(messages) < settings.MEM0_INGEST_PAGE_SIZE:
+                    break
             
             # Update conversation with summary if needed
             if results["success"] > 0:
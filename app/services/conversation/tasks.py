@@ -1,7 +1,7 @@
 """
 Re-export worker tasks with appropriate aliases for testing.
 """
-from app.services.conversation.conversation_tasks import (
+from app.worker.tasks.conversation_tasks import (
     process_chat_message as process_message,
     process_conversation,
     process_pending_messages
@@ -3,8 +3,11 @@
 import logging
 import os
 import asyncio
+from functools import lru_cache
 from typing import Dict, List, Any, Optional, Tuple, Set
 
+from cachetools import LRUCache
+
 from app.services.graph import GraphitiService
 from app.services.ingestion.entity_extraction_factory import get_entity_extractor
 from app.core.config import settings
@@ -16,6 +19,12 @@ logger = logging.getLogger(__name__)
 # Import settings from config.py
 logger.info(f"ExtractionPipeline config: ENABLE_GRAPHITI_INGESTION={settings.ENABLE_GRAPHITI_INGESTION}, ENABLE_PROFILE_UPDATES={settings.ENABLE_PROFILE_UPDATES}")
 
+@lru_cache(maxsize=256)
+def _relationship_phrase(rel_type: str) -> str:
+    """Readable form of a relationship type for fallback facts, e.g. WORKS_FOR -> works for."""
+    return rel_type.lower().replace("_", " ")
+
+
 class ExtractionPipeline:
     """Unified extraction pipeline for entities, relationships, and traits with Graphiti integration."""
     
@@ -50,9 +59,13 @@ class ExtractionPipeline:
         self.entity_extractor = entity_extractor or get_entity_extractor()
         self.trait_service = trait_service
         self.graphiti = graphiti_service or GraphitiService()
+        # (scope, owner_id, entity_type, name) -> elementId of entities already found or created;
+        # lives as long as the pipeline, which ingestion services build per task
+        self._entity_ids: LRUCache = LRUCache(maxsize=settings.GRAPHITI_ENTITY_ID_CACHE_SIZE)
     
     async def extract_from_content(self, content, user_id, metadata, source_type=None, 
-                                  process_chunks=False, chunk_boundaries=None, update_profile=True):
+                                  process_chunks=False, chunk_boundaries=None, update_profile=True,
+                                  entity_results=None):
         """Extract entities, relationships, and traits from content.
         if settings.ENABLE_GRAPHITI_INGESTION:
             This will extract entities, relationships, and traits
@@ -66,6 +79,8 @@ class ExtractionPipeline:
             source_type: Source type ("chat" or "document")
             process_chunks: Whether to process in chunks
             chunk_boundaries: Optional chunk boundaries for documents
+            entity_results: Optional pre-computed process_document result for unchunked
+                content, e.g. from EntityExtractor.process_documents_batch
             
         Returns:
             Dictionary with extracted entities, relationships, and traits (as dictionaries)
@@ -101,7 +116,7 @@ class ExtractionPipeline:
                 
                 # Process entities and relationships in this chunk (if needed)
                 if extract_entities:
-                    entity_results = self.entity_extractor.process_document(chunk_content)
+                    entity_results = await asyncio.to_thread(self.entity_extractor.process_document, chunk_content)
                     logger.info(f"extract_from_content: Extracted {len(entity_results.get('entities', []))} entities and {len(entity_results.get('relationships', []))} relationships from chunk {i}")
                     
                     # Update start/end positions to match original document
@@ -164,7 +179,8 @@ class ExtractionPipeline:
             
             if extract_entities:
                 # Process entire content at once for entities and relationships if we're storing in Graphiti
-                entity_results = self.entity_extractor.process_document(content)
+                if entity_results is None:
+                    entity_results = await asyncio.to_thread(self.entity_extractor.process_document, content)
                 extraction_results["entities"] = entity_results.get("entities", [])
                 extraction_results["relationships"] = entity_results.get("relationships", [])
             
@@ -235,6 +251,15 @@ class ExtractionPipeline:
         Returns:
             Dictionary with processing results as created entities, relationships, and traits
         """
+        # Every lookup and write for this source shares one Neo4j session
+        with self.graphiti.session():
+            return await self._process_extracted_data(
+                extraction_results, user_id, source_id, context_title, scope, owner_id, source
+            )
+    
+    async def _process_extracted_data(self, extraction_results, user_id, source_id,
+                                      context_title=None, scope="user", owner_id=None, source=None):
+        """Body of process_extracted_data, run inside a shared graph session."""
         entities = extraction_results.get("entities", [])
         relationships = extraction_results.get("relationships", [])
         traits = extraction_results.get("traits", [])
@@ -253,80 +278,108 @@ class ExtractionPipeline:
         source_type = source
         logger.info(f"process_extracted_data: Source type is {source_type} from source_id: {source_id}")
         
-        # Process entities
+        # Filter and dedupe entities before touching the graph
+        candidate_entities = {}
         for entity in entities:
             if entity.get("confidence", 0) < self.MIN_CONFIDENCE_ENTITY:
                 logger.info(f"process_extracted_data: Skipping entity {entity.get('text', '')} because confidence is too low")
                 continue
                 
-            entity_type = entity.get("entity_type", "Unknown")
             entity_name = entity.get("text", "").strip()
-            
-            if not entity_name or entity_name in entity_map:
-                logger.info(f"process_extracted_data: Skipping entity {entity.get('text', '')} because it already exists")
+            if not entity_name:
                 continue
-                
-            try:
-                # Check if entity already exists in graph
-                existing_entity = await self.graphiti.find_entity(
-                    name=entity_name,
-                    entity_type=entity_type,
-                    scope=scope,
-                    owner_id=owner_id
-                )
-                
-                if existing_entity and existing_entity.get("id"):
-                    # Entity already exists and has a valid ID, just store its ID
-                    entity_map[entity_name] = existing_entity.get("id")
-                    logger.info(f"process_extracted_data: Entity {entity_name} already exists with ID {existing_entity.get('id')}")
+            
+            # Keep the most confident mention of each name
+            seen = candidate_entities.get(entity_name)
+            if seen is not None:
+                logger.info(f"process_extracted_data: Skipping duplicate mention of entity {entity_name}")
+                if entity.get("confidence", 0) <= seen.get("confidence", 0):
                     continue
-                elif existing_entity:
-                    # Entity exists but has no valid ID - log a warning and proceed to create it
-                    logger.warning(f"process_extracted_data: Entity {entity_name} exists but has no valid ID. Creating a new instance.")
+            
+            candidate_entities[entity_name] = entity
+        
+        # Entities resolved for an earlier message skip the graph lookup entirely
+        uncached_entities = {}
+        for entity_name, entity in candidate_entities.items():
+            cached_id = self._entity_ids.get((scope, owner_id, entity.get("entity_type", "Unknown"), entity_name))
+            if cached_id:
+                entity_map[entity_name] = cached_id
+            else:
+                uncached_entities[entity_name] = entity
+        
+        # Look up every remaining candidate in one round-trip
+        existing_entities = await self.graphiti.find_entities(
+            [(name, entity.get("entity_type", "Unknown")) for name, entity in uncached_entities.items()],
+            scope=scope,
+            owner_id=owner_id
+        )
+        
+        # Properties shared by every entity created for this source
+        base_properties = {
+            "user_id": user_id,
+            "source": source_type,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        if source_type == "chat":
+            # For chat source, use message_id and conversation_title
+            base_properties["message_id"] = source_id
+            base_properties["conversation_title"] = context_title
+        else:
+            # For document source, use source_id (file path) and context_title
+            base_properties["source_id"] = source_id
+            base_properties["context_title"] = context_title
+        
+        # Process entities
+        entities_to_create = []
+        for entity_name, entity in uncached_entities.items():
+            entity_type = entity.get("entity_type", "Unknown")
+            existing_entity = existing_entities.get((entity_name, entity_type))
+            
+            if existing_entity and existing_entity.get("id"):
+                # Entity already exists and has a valid ID, just store its ID
+                entity_map[entity_name] = existing_entity.get("id")
+                self._entity_ids[(scope, owner_id, entity_type, entity_name)] = existing_entity.get("id")
+                logger.info(f"process_extracted_data: Entity {entity_name} already exists with ID {existing_entity.get('id')}")
+                continue
+            elif existing_entity:
+                # Entity exists but has no valid ID - log a warning and proceed to create it
+                logger.warning(f"process_extracted_data: Entity {entity_name} exists but has no valid ID. Creating a new instance.")
 
-                # Create new entity
-                entity_properties = {}
-                
-                # For Document entities, use "title" property instead of "name"
-                if entity_type == "Document":
-                    entity_properties["title"] = entity_name
-                else:
-                    entity_properties["name"] = entity_name
-                    
-                # Add common properties
-                entity_properties["user_id"] = user_id
-                entity_properties["source"] = source_type
-                entity_properties["confidence"] = entity.get("confidence", 0.7)
-                entity_properties["context"] = entity.get("context", "")
-                 # Add created_at timestamp and UUID directly on nodes
-                entity_properties["created_at"] = datetime.now(timezone.utc).isoformat()
-                entity_properties["uuid"] = str(uuid.uuid4())  # Generate a UUID for direct reference
- 
-                # Add source-specific properties
-                if source_type == "chat":
-                    # For chat source, use message_id and conversation_title
-                    entity_properties["message_id"] = source_id
-                    entity_properties["conversation_title"] = context_title
-                else:
-                    # For document source, use source_id and context_title
-                    entity_properties["source_id"] = source_id #file path
-                    entity_properties["context_title"] = context_title
-                
-                entity_id = await self.graphiti.create_entity(
-                    entity_type=entity_type,
-                    properties=entity_properties,
-                    scope=scope,
-                    owner_id=owner_id
-                )
-                
-                entity_map[entity_name] = entity_id
-                created_entities.append({
-                    "id": entity_id,
-                    "name": entity_name,
-                    "type": entity_type
-                })
-            except Exception as e:
-                logger.error(f"process_extracted_data: Error handling entity {entity_name}: {str(e)}")
+            # Create new entity from the per-message properties
+            entity_properties = base_properties.copy()
+            
+            # For Document entities, use "title" property instead of "name"
+            if entity_type == "Document":
+                entity_properties["title"] = entity_name
+            else:
+                entity_properties["name"] = entity_name
+                
+            entity_properties["confidence"] = entity.get("confidence", 0.7)
+            entity_properties["context"] = entity.get("context", "")
+            # UUID directly on nodes for direct reference
+            entity_properties["uuid"] = str(uuid.uuid4())
+            
+            entities_to_create.append((entity_name, entity_type, entity_properties))
+        
+        # Write all new entities in one query per label
+        entity_ids = await self.graphiti.create_entities(
+            [(entity_type, entity_properties) for _, entity_type, entity_properties in entities_to_create],
+            scope=scope,
+            owner_id=owner_id
+        )
+        
+        for (entity_name, entity_type, _), entity_id in zip(entities_to_create, entity_ids):
+            if not entity_id:
+                logger.error(f"process_extracted_data: Error handling entity {entity_name}: not created")
+                continue
+            
+            entity_map[entity_name] = entity_id
+            self._entity_ids[(scope, owner_id, entity_type, entity_name)] = entity_id
+            created_entities.append({
+                "id": entity_id,
+                "name": entity_name,
+                "type": entity_type
+            })
         
         # Process traits - EDIT: Nvm, let's not process traits into entities here, let Gemini handle the relationship
         # trait relationships
@@ -404,88 +457,100 @@ class ExtractionPipeline:
         #         logger.error(f"process_extracted_data: Error handling trait {trait_name}: {str(e)}")
         
         
-        # Process relationships
+        # Filter and dedupe relationships before touching the graph
         processed_relationships = set()
+        candidate_relationships = []
         
         for relationship in relationships:
             if relationship.get("confidence", 0) < self.MIN_CONFIDENCE_RELATIONSHIP:
-                logger.info(f"process_extracted_data: Skipping relationship {relationship} because confidence is too low")
+                logger.debug("process_extracted_data: Skipping relationship %s because confidence is too low", relationship)
                 continue
                 
             source_name = relationship.get("source", "").strip()
             target_name = relationship.get("target", "").strip()
             rel_type = relationship.get("relationship", "MENTIONED_WITH")
             
+            # Unique key for this relationship to avoid duplicates
+            rel_key = (source_name, rel_type, target_name)
+            
+            if rel_key in processed_relationships:
+                logger.debug("process_extracted_data: Skipping relationship %s because it's a duplicate", relationship)
+                continue
+            
             # Skip if source or target don't exist in our entity map
             if source_name not in entity_map or target_name not in entity_map:
-                logger.info(f"process_extracted_data: Skipping relationship {relationship} because source or target doesn't exist in entity map")
+                logger.debug("process_extracted_data: Skipping relationship %s because source or target doesn't exist in entity map", relationship)
                 continue
                 
-            # Create a unique key for this relationship to avoid duplicates
-            rel_key = f"{source_name}|{rel_type}|{target_name}"
+            processed_relationships.add(rel_key)
             
-            if rel_key in processed_relationships:
-                logger.info(f"process_extracted_data: Skipping relationship {relationship} because it's a duplicate")
+            # Build relationship properties
+            rel_properties = {
+                "user_id": user_id,
+                "confidence": relationship.get("confidence", 0.7),
+                "context": relationship.get("context", "")
+            }
+            
+            # Use Gemini-provided fact if available, or create one if not
+            if relationship.get("fact"):
+                rel_properties["fact"] = relationship.get("fact")
+            else:
+                # Create a fallback fact property that describes the relationship in natural language
+                rel_properties["fact"] = f"{source_name} {_relationship_phrase(rel_type)} {target_name}"
+            
+            # Add source-specific properties
+            if source_type == "chat":
+                rel_properties["message_id"] = source_id
+            else:
+                rel_properties["source_id"] = source_id
+            
+            candidate_relationships.append((relationship, source_name, target_name, rel_type, rel_properties))
+        
+        # Check which relationships already exist in one round-trip, passing the fact to check for semantic similarity
+        relationships_exist = await self.graphiti.relationship_exists_batch(
+            [
+                (entity_map[source_name], entity_map[target_name], rel_type, rel_properties.get("fact"))
+                for _, source_name, target_name, rel_type, rel_properties in candidate_relationships
+            ],
+            scope=scope
+        )
+        
+        # Process relationships
+        relationships_to_create = []
+        for candidate, relationship_exists in zip(candidate_relationships, relationships_exist):
+            if relationship_exists:
+                logger.info(f"process_extracted_data: Skipping relationship {candidate[0]} because it already exists")
+                continue
+            relationships_to_create.append(candidate)
+        
+        # Write all new relationships in one query per relationship type
+        rel_ids = await self.graphiti.create_relationships(
+            [
+                (entity_map[source_name], entity_map[target_name], rel_type, rel_properties)
+                for _, source_name, target_name, rel_type, rel_properties in relationships_to_create
+            ],
+            scope=scope,
+            owner_id=owner_id
+        )
+        
+        for (relationship, source_name, target_name, rel_type, rel_properties), rel_id in zip(
+            relationships_to_create, rel_ids
+        ):
+            if not rel_id:
+                logger.error(f"process_extracted_data: Error creating relationship {relationship}")
                 continue
-                
-            processed_relationships.add(rel_key)
             
-            try:
-                # Create relationship between entities
-                rel_properties = {
-                    "user_id": user_id,
-                    "confidence": relationship.get("confidence", 0.7),
-                    "context": relationship.get("context", "")
-                }
-                
-                # Use Gemini-provided fact if available, or create one if not
-                if relationship.get("fact"):
-                    rel_properties["fact"] = relationship.get("fact")
-                else:
-                    # Create a fallback fact property that describes the relationship in natural language
-                    rel_properties["fact"] = f"{source_name} {rel_type.lower().replace('_', ' ')} {target_name}"
-                
-                # Add source-specific properties
-                if source_type == "chat":
-                    rel_properties["message_id"] = source_id
-                else:
-                    rel_properties["source_id"] = source_id
-                
-                # Check if relationship already exists
-                relationship_exists = await self.graphiti.relationship_exists(
-                    source_id=entity_map[source_name],
-                    target_id=entity_map[target_name],
-                    rel_type=rel_type,
-                    scope=scope,
-                    fact=rel_properties.get("fact")  # Pass the fact to check for semantic similarity
-                )
-                
-                if relationship_exists:
-                    logger.info(f"process_extracted_data: Skipping relationship {relationship} because it already exists")
-                    continue
-                    
-                rel_id = await self.graphiti.create_relationship(
-                    source_id=entity_map[source_name],
-                    target_id=entity_map[target_name],
-                    rel_type=rel_type,
-                    properties=rel_properties,
-                    scope=scope,
-                    owner_id=owner_id
-                )
-                
-                created_relationships.append({
-                    "id": rel_id,
-                    "source": source_name,
-                    "target": target_name,
-                    "type": rel_type,
-                    "fact": rel_properties.get("fact"),
-                    "valid_from": rel_properties.get("valid_from"),
-                    "valid_to": rel_properties.get("valid_to"),
-                    "scope": scope,
-                    "owner_id": owner_id
-                })
-            except Exception as e:
-                logger.error(f"process_extracted_data: Error creating relationship: {str(e)}")
+            created_relationships.append({
+                "id": rel_id,
+                "source": source_name,
+                "target": target_name,
+                "type": rel_type,
+                "fact": rel_properties.get("fact"),
+                "valid_from": rel_properties.get("valid_from"),
+                "valid_to": rel_properties.get("valid_to"),
+                "scope": scope,
+                "owner_id": owner_id
+            })
         
         # Comment out automatic user-trait relationship creation
         # Now traits will be properly associated with their correct entities via the relationship extraction
@@ -665,7 +730,10 @@ class ExtractionPipeline:
             chunk_boundaries=chunk_boundaries,
             update_profile=update_profile
         )
-        logger.info(f"2. Extracted entities, relationships, and traits, updated profile: {extraction_results}")
+        logger.info(f"2. Extracted {len(extraction_results.get('entities', []))} entities, "
+                    f"{len(extraction_results.get('relationships', []))} relationships, "
+                    f"{len(extraction_results.get('traits', []))} traits")
+        logger.debug("2. Extracted entities, relationships, and traits, updated profile: %s", extraction_results)
         
         processing_result = None
         if settings.ENABLE_GRAPHITI_INGESTION:   
@@ -679,7 +747,8 @@ class ExtractionPipeline:
                 owner_id=owner_id,
                 source="document"
             )
-            logger.info(f"3. Processed extracted data into Graphiti: {processing_result}")
+            logger.info(f"3. Processed extracted data into Graphiti for {file_path}")
+            logger.debug("3. Processed extracted data into Graphiti: %s", processing_result)
         else:   
             logger.info(f"3. Skipping Graphiti processing for {file_path} because Graphiti ingestion is disabled")
         
@@ -690,7 +759,8 @@ class ExtractionPipeline:
         }
     
     async def process_chat_message(self, message_content, user_id, message_id, 
-                                 metadata, scope="user", owner_id=None, update_profile=True):
+                                 metadata, scope="user", owner_id=None, update_profile=True,
+                                 entity_results=None):
         """Complete chat message processing pipeline.
         Depending on configuration, may store data in Graphiti and/or update user profile.
         
@@ -701,6 +771,7 @@ class ExtractionPipeline:
             metadata: Message metadata
             scope: Content scope
             owner_id: Owner ID
+            entity_results: Optional pre-computed entity extraction for the message
             
         Returns:
             Dictionary with processing results and extraction results
@@ -722,19 +793,23 @@ class ExtractionPipeline:
             metadata=metadata,
             source_type="chat",
             process_chunks=False,  # Chat messages are typically short
-            update_profile=update_profile
+            update_profile=update_profile,
+            entity_results=entity_results
         )
         
-        if extraction_results.get("entities") or extraction_results.get("relationships") or extraction_results.get("traits"):
-            logger.info(f"Extracted {len(extraction_results.get('entities', []))} entities, "
-                      f"{len(extraction_results.get('relationships', []))} relationships, "
-                      f"{len(extraction_results.get('traits', []))} traits from chat message")
+        entities = extraction_results.get("entities") or []
+        relationships = extraction_results.get("relationships") or []
+        traits = extraction_results.get("traits") or []
+        has_results = bool(entities or relationships or traits)
+        
+        if has_results:
+            logger.info(f"Extracted {len(entities)} entities, "
+                      f"{len(relationships)} relationships, "
+                      f"{len(traits)} traits from chat message")
             result["extraction"] = extraction_results
         
         # Process into Graphiti only if enabled
-        if settings.ENABLE_GRAPHITI_INGESTION and (extraction_results.get("entities") or 
-                                        extraction_results.get("relationships") or 
-                                        extraction_results.get("traits")):
+        if settings.ENABLE_GRAPHITI_INGESTION and has_results:
             processing_result = await self.process_extracted_data(
                 extraction_results,
                 user_id,
@@ -1,21 +1,25 @@
 """Graphiti service for knowledge graph operations."""
 
-from typing import Any, Dict, List, Optional, Literal, Set
+from typing import Any, Dict, List, Optional, Literal, Set, Tuple
 from datetime import datetime, timezone, timedelta
 import json
 import uuid
 import sys
 import asyncio
-from functools import wraps
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache, wraps
 
 from neo4j import GraphDatabase
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
 import openai
 
 from graphiti_core import Graphiti
 from graphiti_core.nodes import EpisodeType
 from graphiti_core.search.search_config_recipes import NODE_HYBRID_SEARCH_RRF
 from app.core.config import settings
-from app.services.common.constants import TRAIT_TYPE_TO_RELATIONSHIP_MAPPING, RELATIONSHIP_TYPES
+from app.services.common.constants import ENTITY_TYPE_MAPPING, TRAIT_TYPE_TO_RELATIONSHIP_MAPPING, RELATIONSHIP_TYPES_TUPLE
+from app.services.common.retry import transient_retry
 
 import logging
 logger = logging.getLogger(__name__)
@@ -26,6 +30,108 @@ ContentScope = Literal["user", "twin", "global"]
 # Create a global lock for synchronizing operations
 _mem0_lock = asyncio.Lock()
 
+
+# Session opened by GraphitiService.session() for the current task; _run_cypher
+# reuses it instead of opening one per query. asyncio.to_thread copies the context,
+# so the executor thread sees the same value as the awaiting coroutine.
+_current_session: ContextVar = ContextVar("graphiti_neo4j_session", default=None)
+
+
+# Cypher for the batched ingestion queries. Neo4j caches execution plans by query
+# text, so everything that varies per call goes through parameters; only labels and
+# relationship types, which Cypher cannot parameterize, are filled into the templates.
+FIND_ENTITIES_CYPHER = """
+UNWIND $rows AS row
+MATCH (n)
+WHERE (n.name = row.name OR n.title = row.name)
+AND (size(row.labels) = 0 OR any(label IN row.labels WHERE label IN labels(n)))
+AND ($scope IS NULL OR n.scope = $scope)
+AND ($owner_id IS NULL OR n.owner_id = $owner_id)
+WITH row, collect(n)[0] AS n
+RETURN
+    row.index as index,
+    elementId(n) as id,
+    n.uuid as uuid,
+    labels(n) as labels,
+    n.name as name,
+    n.title as title,
+    n.scope as scope,
+    n.owner_id as owner_id
+"""
+
+RELATIONSHIP_EXISTS_BATCH_CYPHER = """
+UNWIND $rows AS row
+MATCH (a)-[r]->(b)
+WHERE elementId(a) = row.source_id AND elementId(b) = row.target_id
+AND type(r) = row.rel_type AND r.scope = $scope
+RETURN row.index as index, collect(r.fact) as facts
+"""
+
+CREATE_ENTITIES_CYPHER_TEMPLATE = """
+UNWIND $rows AS row
+MERGE (e:{label} {{{merge_keys}}})
+ON CREATE SET e += row.properties
+RETURN row.index as index, elementId(e) as entity_id
+"""
+
+CREATE_RELATIONSHIPS_CYPHER_TEMPLATE = """
+UNWIND $rows AS row
+MATCH (a) WHERE elementId(a) = row.source_id
+MATCH (b) WHERE elementId(b) = row.target_id
+MERGE (a)-[r:{rel_type} {{uuid: row.properties.uuid}}]->(b)
+ON CREATE SET r = row.properties
+RETURN row.index as index, elementId(r) as rel_id
+"""
+
+
+@lru_cache(maxsize=256)
+def _create_entities_cypher(label: str, key_prop: str, has_scope: bool, has_owner: bool) -> str:
+    """Fill CREATE_ENTITIES_CYPHER_TEMPLATE for one label and set of merge keys."""
+    merge_keys = [f"{key_prop}: row.key"]
+    if has_scope:
+        merge_keys.append("scope: $scope")
+    if has_owner:
+        merge_keys.append("owner_id: row.owner_id")
+    return CREATE_ENTITIES_CYPHER_TEMPLATE.format(label=label, merge_keys=", ".join(merge_keys))
+
+
+@lru_cache(maxsize=256)
+def _create_relationships_cypher(rel_type: str) -> str:
+    """Fill CREATE_RELATIONSHIPS_CYPHER_TEMPLATE for one relationship type."""
+    return CREATE_RELATIONSHIPS_CYPHER_TEMPLATE.format(rel_type=rel_type)
+
+
+# Module-level Neo4j driver shared by every GraphitiService so its connection pool
+# is reused across requests and tasks instead of reopened per instance. The sync
+# driver is thread-safe and not tied to an event loop, unlike the Graphiti client.
+_neo4j_driver = None
+
+
+def get_neo4j_driver():
+    """Get or create the shared Neo4j driver used for custom Cypher queries."""
+    global _neo4j_driver
+    if _neo4j_driver is None:
+        logger.info("Initializing Neo4j driver...")
+        _neo4j_driver = GraphDatabase.driver(
+            settings.NEO4J_URI,
+            auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+            max_connection_pool_size=settings.NEO4J_MAX_CONNECTION_POOL_SIZE,
+        )
+    return _neo4j_driver
+
+
+def close_neo4j_driver() -> None:
+    """Close the shared Neo4j driver (call on process shutdown)."""
+    global _neo4j_driver
+    if _neo4j_driver is not None:
+        _neo4j_driver.close()
+        _neo4j_driver = None
+
+
+def _is_transient_neo4j_error(exc: BaseException) -> bool:
+    """True for Neo4j failures that are worth retrying (lost connection, deadlock, etc.)."""
+    return isinstance(exc, (ServiceUnavailable, SessionExpired, TransientError))
+
 # Helper to convert sync operations to async (for API compatibility)
 def async_wrap(func):
     """Wraps a synchronous function to be called asynchronously.
@@ -73,10 +179,7 @@ class GraphitiService:
         )
         
         # Also keep direct Neo4j access for custom queries
-        self.driver = GraphDatabase.driver(
-            settings.NEO4J_URI,
-            auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-        )
+        self.driver = get_neo4j_driver()
         
     async def initialize_graph(self):
         """Initialize the graph database with indices and constraints.
@@ -103,7 +206,7 @@ class GraphitiService:
             # relationship_types = relationship_types + [
             #     "RELATED_TO", "KNOWS", "ORGANIZED", "INVOLVED", "PARTICIPATED_IN", "WORKS_FOR", "OWNS"
             # ]
-            relationship_types = RELATIONSHIP_TYPES
+            relationship_types = RELATIONSHIP_TYPES_TUPLE
             
             # Build the index creation query
             labels_str = "|".join(index_labels)
@@ -177,14 +280,31 @@ class GraphitiService:
             # Don't re-raise, initialization should proceed if possible
         # --- END ADDED --- 
         
+        # Uniqueness constraints on the keys create_entities merges on, so concurrent
+        # ingestion workers merging the same new entity end up sharing one node.
+        # Nodes without an owner_id (global scope) are not covered by the constraint.
+        for label in sorted(set(ENTITY_TYPE_MAPPING.values())):
+            key_prop = "title" if label == "Document" else "name"
+            constraint_query = f"""
+            CREATE CONSTRAINT entity_{label}_key IF NOT EXISTS
+            FOR (n:{label})
+            REQUIRE (n.{key_prop}, n.scope, n.owner_id) IS UNIQUE
+            """
+            try:
+                await self.execute_cypher(constraint_query)
+            except Exception as e:
+                # Usually existing duplicates; merge them and re-run initialization
+                logger.error(f"Failed to create uniqueness constraint for {label}: {e}")
+        
     async def close(self):
-        """Close the connections to Neo4j."""
+        """Close the Graphiti client.
+
+        The shared Neo4j driver stays open for other instances; use
+        close_neo4j_driver() to shut it down.
+        """
         if hasattr(self, 'client') and self.client:
             await self.client.close()
         
-        if hasattr(self, 'driver') and self.driver:
-            self.driver.close()
-        
     async def execute_cypher(self, query: str, params: dict[str, Any] | None = None, 
                             transaction_id: str | None = None) -> list[dict[str, Any]]:
         """Execute a Cypher query against the Neo4j database.
@@ -208,14 +328,11 @@ class GraphitiService:
         query_preview = query.strip().replace("\n", " ")[:100] + ("..." if len(query) > 100 else "")
         logger.debug(f"Executing Cypher query: {query_preview}")
         
-        # Execute query directly with Neo4j driver
+        # Execute query directly with Neo4j driver, off the event loop thread
         try:
-            with self.driver.session() as session:
-                result = session.run(query, **params)
-                # Convert results to a list of dictionaries
-                data = result.data()
-                logger.debug(f"Query returned {len(data)} results")
-                return data
+            data = await asyncio.to_thread(self._run_cypher, query, params)
+            logger.debug(f"Query returned {len(data)} results")
+            return data
         except Exception as e:
             # Log the error and reraise
             logger.error(f"Error executing Cypher query: {str(e)}. Query: {query}")
@@ -227,6 +344,36 @@ class GraphitiService:
             
             raise
 
+    @contextmanager
+    def session(self):
+        """Share one Neo4j session across every query run inside the block.
+
+        Queries are still executed one at a time, so the block must not issue
+        concurrent execute_cypher calls. Nested blocks reuse the outer session.
+
+        Yields:
+            The underlying Neo4j session
+        """
+        existing = _current_session.get()
+        if existing is not None:
+            yield existing
+            return
+
+        with self.driver.session() as session:
+            token = _current_session.set(session)
+            try:
+                yield session
+            finally:
+                _current_session.reset(token)
+
+    def _run_cypher(self, query: str, params: dict[str, Any]) -> list[dict[str, Any]]:
+        """Run a Cypher query on the (thread-safe) sync driver and return the rows as dicts."""
+        session = _current_session.get()
+        if session is not None:
+            return session.run(query, **params).data()
+        with self.driver.session() as session:
+            return session.run(query, **params).data()
+
     async def add_episode(
         self, content: str, user_id: str, metadata: dict[str, Any] | None = None,
         scope: ContentScope = "user", owner_id: str = None
@@ -397,7 +544,9 @@ class GraphitiService:
             """
             
             # logger.info(f"Executing custom relationship search query: {final_query} with params: {params}")
-            search_results = await self.execute_cypher(final_query, params)
+            async for attempt in transient_retry(_is_transient_neo4j_error):
+                with attempt:
+                    search_results = await self.execute_cypher(final_query, params)
             
             # Format results
             formatted_results = []
@@ -537,7 +686,9 @@ class GraphitiService:
             """
             
             # logger.info(f"Executing custom node search query: {final_query} with params: {params}")
-            search_results = await self.execute_cypher(final_query, params)
+            async for attempt in transient_retry(_is_transient_neo4j_error):
+                with attempt:
+                    search_results = await self.execute_cypher(final_query, params)
             
             # Format results (minimal formatting needed as query returns desired fields)
             formatted_results = []
@@ -615,7 +766,7 @@ class GraphitiService:
                     update_props["owner_id"] = final_owner_id
                     
                 if update_props:
-                    logger.info(f"Updating entity {entity_id} with properties: {update_props}")
+                    logger.debug("Updating entity %s with properties: %s", entity_id, update_props)
                     update_success = await self.update_entity(entity_id, update_props, transaction_id)
                     if not update_success:
                         logger.warning(f"Failed to update entity {entity_id} with scope/owner_id")
@@ -776,7 +927,7 @@ class GraphitiService:
                 update_props["valid_to"] = properties.get("valid_to")
                     
                 if update_props:
-                    logger.info(f"Updating relationship {rel_id} with properties: {update_props}")
+                    logger.debug("Updating relationship %s with properties: %s", rel_id, update_props)
                     update_success = await self.update_relationship(rel_id, update_props, transaction_id)
                     if not update_success:
                         logger.warning(f"Failed to update relationship {rel_id} with scope/owner_id")
@@ -793,6 +944,124 @@ class GraphitiService:
             # For testing, return a mock ID if creation failed
             return str(uuid.uuid4()) # Keep mock ID generation for robustness in tests
     
+    async def create_entities(self, entities: List[Tuple[str, Dict[str, Any]]],
+                              scope: ContentScope = "user", owner_id: str = None) -> List[Optional[str]]:
+        """Create several entities with one MERGE ... UNWIND query per label.
+        
+        Entities are merged on their name (title for Documents), scope and owner. The
+        uniqueness constraints created by initialize_graph make the MERGE lock on those
+        keys, so two concurrent ingestions of the same entity end up sharing one node.
+        
+        Args:
+            entities: List of (entity_type, properties) tuples
+            scope: Content scope ("user", "twin", or "global")
+            owner_id: ID of the owner (user or twin ID, or None for global)
+            
+        Returns:
+            One elementId per input entity, in input order; None where the entity
+            failed validation or could not be written
+        """
+        entity_ids: List[Optional[str]] = [None] * len(entities)
+        groups: Dict[Tuple[str, str, bool], List[Dict[str, Any]]] = {}
+        
+        for index, (entity_type, properties) in enumerate(entities):
+            try:
+                self._validate_entity_schema(entity_type, properties)
+            except ValueError as e:
+                logger.error(f"Error creating entity {entity_type}: {e}")
+                continue
+            
+            final_owner_id = owner_id or (properties.get("user_id") if scope == "user" else None)
+            key_prop = "title" if entity_type == "Document" else "name"
+            initial_properties = {k: v for k, v in properties.items() if k not in ("scope", "owner_id")}
+            if final_owner_id:
+                initial_properties["owner_id"] = final_owner_id
+            if scope:
+                initial_properties["scope"] = scope
+            
+            groups.setdefault((entity_type, key_prop, bool(final_owner_id)), []).append({
+                "index": index,
+                "key": properties.get(key_prop),
+                "owner_id": final_owner_id,
+                "properties": initial_properties
+            })
+        
+        for (entity_type, key_prop, has_owner), rows in groups.items():
+            query = _create_entities_cypher(entity_type, key_prop, bool(scope), has_owner)
+            
+            try:
+                result = await self.execute_cypher(query, {"rows": rows, "scope": scope})
+                for record in result:
+                    entity_ids[record["index"]] = str(record["entity_id"])
+                logger.info(f"Created {len(result)} {entity_type} entities")
+            except Exception as e:
+                logger.error(f"Error creating {len(rows)} {entity_type} entities: {e}")
+        
+        return entity_ids
+    
+    async def create_relationships(self, relationships: List[Tuple[str, str, str, Dict[str, Any]]],
+                                   scope: ContentScope = None, owner_id: str = None) -> List[Optional[str]]:
+        """Create several relationships with one UNWIND query per relationship type.
+        
+        The same pair and type may legitimately hold several facts, so callers dedupe
+        with relationship_exists_batch. Relationships from a source message (or
+        document) are merged on a uuid derived from their endpoints, type and source,
+        so re-running ingestion for a message whose commit failed reuses them.
+        
+        Args:
+            relationships: List of (source_id, target_id, rel_type, properties) tuples
+            scope: Optional content scope for the relationships
+            owner_id: Optional owner ID for the relationships
+            
+        Returns:
+            One elementId per input relationship, in input order; None where it
+            could not be written
+        """
+        rel_ids: List[Optional[str]] = [None] * len(relationships)
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        now = datetime.now(timezone.utc).isoformat()
+        
+        for index, (source_id, target_id, rel_type, properties) in enumerate(relationships):
+            properties = properties or {}
+            final_owner_id = owner_id
+            if not final_owner_id and "user_id" in properties and scope == "user":
+                final_owner_id = properties["user_id"]
+            
+            initial_properties = {k: v for k, v in properties.items() if k not in ("scope", "owner_id")}
+            source_ref = properties.get("message_id") or properties.get("source_id")
+            if source_ref:
+                initial_properties.setdefault(
+                    "uuid", str(uuid.uuid5(uuid.NAMESPACE_OID, f"{source_id}:{rel_type}:{target_id}:{source_ref}"))
+                )
+            else:
+                initial_properties.setdefault("uuid", str(uuid.uuid4()))
+            initial_properties["valid_from"] = properties.get("valid_from") or now
+            initial_properties["valid_to"] = properties.get("valid_to")
+            if scope:
+                initial_properties["scope"] = scope
+            if final_owner_id:
+                initial_properties["owner_id"] = final_owner_id
+            
+            groups.setdefault(rel_type, []).append({
+                "index": index,
+                "source_id": source_id,
+                "target_id": target_id,
+                "properties": initial_properties
+            })
+        
+        for rel_type, rows in groups.items():
+            query = _create_relationships_cypher(rel_type)
+            
+            try:
+                result = await self.execute_cypher(query, {"rows": rows})
+                for record in result:
+                    rel_ids[record["index"]] = str(record["rel_id"])
+                logger.info(f"Created {len(result)} {rel_type} relationships")
+            except Exception as e:
+                logger.error(f"Error creating {len(rows)} {rel_type} relationships: {e}")
+        
+        return rel_ids
+    
     async def update_relationship(self, relationship_id: str, properties: dict[str, Any],
                                  transaction_id: str | None = None) -> bool:
         """Update a relationship's properties.
@@ -1213,7 +1482,7 @@ class GraphitiService:
             updated = result[0]["updated"] > 0 if result else False
             
             if updated:
-                logger.info(f"Updated node {uuid} with properties: {properties}")
+                logger.debug("Updated node %s with properties: %s", uuid, properties)
             else:
                 logger.warning(f"No node found with UUID {uuid}")
                 
@@ -1288,6 +1557,51 @@ class GraphitiService:
             logger.error(f"Error finding entity: {e}")
             return None
 
+    async def find_entities(
+        self,
+        entities: List[Tuple[str, Optional[str]]],
+        scope: ContentScope = None,
+        owner_id: str = None
+    ) -> Dict[Tuple[str, Optional[str]], Dict[str, Any]]:
+        """Find several entities by (name, type) in a single query.
+        
+        Matches the same way as find_entity, but sends every lookup in one
+        UNWIND round-trip.
+        
+        Args:
+            entities: List of (name, entity_type) tuples; entity_type may be None
+                or a comma-separated list of labels
+            scope: Optional scope to filter by
+            owner_id: Optional owner ID to filter by
+            
+        Returns:
+            Dictionary mapping each (name, entity_type) that was found to its entity data
+        """
+        if not entities:
+            return {}
+        
+        try:
+            rows = [
+                {
+                    "index": i,
+                    "name": name,
+                    "labels": [label.strip() for label in (entity_type or "").split(",") if label.strip()]
+                }
+                for i, (name, entity_type) in enumerate(entities)
+            ]
+            params = {"rows": rows, "scope": scope or None, "owner_id": owner_id or None}
+            
+            result = await self.execute_cypher(FIND_ENTITIES_CYPHER, params)
+            
+            found = {}
+            for record in result:
+                entity = {k: v for k, v in record.items() if v is not None and k != "index"}
+                found[entities[record["index"]]] = entity
+            return found
+        except Exception as e:
+            logger.error(f"Error finding entities: {e}")
+            return {}
+
     async def list_nodes(self, limit: int = 10, offset: int = 0, node_type: Optional[str] = None, scope: ContentScope = None, owner_id: str = None) -> List[Dict[str, Any]]:
         """List nodes from the knowledge graph with pagination.
         
@@ -1932,6 +2246,51 @@ class GraphitiService:
             logger.error(f"Error in relationship_exists: {e}")
             return False
             
+    async def relationship_exists_batch(
+        self,
+        relationships: List[Tuple[str, str, str, Optional[str]]],
+        scope: ContentScope = "user"
+    ) -> List[bool]:
+        """Check several relationships for existence in a single query.
+        
+        Same semantics as relationship_exists: with a fact, only a relationship
+        with a similar fact counts as existing.
+        
+        Args:
+            relationships: List of (source_id, target_id, rel_type, fact) tuples;
+                fact may be None
+            scope: Content scope ("user", "twin", or "global")
+            
+        Returns:
+            One flag per input relationship, in input order
+        """
+        if not relationships:
+            return []
+        
+        try:
+            rows = [
+                {"index": i, "source_id": source_id, "target_id": target_id, "rel_type": rel_type}
+                for i, (source_id, target_id, rel_type, _) in enumerate(relationships)
+            ]
+            
+            result = await self.execute_cypher(RELATIONSHIP_EXISTS_BATCH_CYPHER, {"rows": rows, "scope": scope})
+            
+            exists = [False] * len(relationships)
+            for record in result:
+                fact = relationships[record["index"]][3]
+                if not fact:
+                    exists[record["index"]] = True
+                    continue
+                for existing_fact in record["facts"]:
+                    if existing_fact and self._are_facts_similar(existing_fact, fact):
+                        logger.info(f"Found similar existing fact: '{existing_fact}' vs new fact: '{fact}'")
+                        exists[record["index"]] = True
+                        break
+            return exists
+        except Exception as e:
+            logger.error(f"Error in relationship_exists_batch: {e}")
+            return [False] * len(relationships)
+            
     def _are_facts_similar(self, fact1: str, fact2: str) -> bool:
         """Check if two facts are semantically similar.
         
@@ -13,7 +13,9 @@ from google.generativeai.types import GenerationConfig
 from app.services.common.constants import (
     TRAIT_TYPE_TO_RELATIONSHIP_MAPPING, 
     RELATIONSHIP_TYPES,
+    RELATIONSHIP_TYPES_TUPLE,
     ENTITY_TYPE_MAPPING,
+    ENTITY_PAIR_RELATIONSHIP_MAPPING,
     IMPORTANT_ENTITY_TYPES
 )
 
@@ -67,12 +69,15 @@ class EntityExtractor:
                 logger.error(f"Failed to initialize Gemini API: {e}")
                 raise
     
-    def extract_entities(self, text: str, chunk_index: int = 0) -> List[Dict[str, Any]]:
+    def extract_entities(self, text: str, chunk_index: int = 0,
+                         failures: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """Extract entities from text.
         
         Args:
             text: Text to extract entities from
             chunk_index: Index of the chunk this text belongs to
+            failures: Optional list that Gemini errors are appended to, since the
+                result falls back rather than raising
             
         Returns:
             List of extracted entities with details
@@ -134,33 +139,47 @@ class EntityExtractor:
             # If we couldn't extract JSON or got an empty list, try a different approach
             if not entities:
                 logger.warning("Failed to extract entities JSON from Gemini response, retrying with structured prompt")
-                return self._fallback_entity_extraction(text, chunk_index)
+                return self._fallback_entity_extraction(text, chunk_index, failures)
             
             # Post-process entities to match our expected format
-            for entity in entities:
-                # Set default values for any missing fields
-                entity.setdefault("confidence", 0.8)
-                entity.setdefault("start", 0)
-                entity.setdefault("end", len(entity["text"]) if "text" in entity else 0)
-                entity.setdefault("context", "")
-                
-                # Map entity type to our system type
-                entity_type = ENTITY_TYPE_MAPPING.get(entity.get("label", ""), "Unknown")
-                entity["entity_type"] = entity_type
-                
-                # Add sentence_id and chunk_index
-                entity["sentence_id"] = 0  # Simplified, we don't track sentences
-                entity["chunk_index"] = chunk_index
-                
-                # Filter low confidence entities
-                if entity.get("confidence", 0) < self.min_confidence:
-                    entities.remove(entity)
-            
-            return entities
+            return self._normalize_entities(entities, chunk_index)
         
         except Exception as e:
             logger.error(f"Error calling Gemini API for entity extraction: {e}")
-            return self._fallback_entity_extraction(text, chunk_index)
+            if failures is not None:
+                failures.append(f"entity extraction: {e}")
+            return self._fallback_entity_extraction(text, chunk_index, failures)
+    
+    def _normalize_entities(self, entities: List[Dict[str, Any]], chunk_index: int = 0) -> List[Dict[str, Any]]:
+        """Fill in defaults and system types for raw Gemini entities, dropping low-confidence ones.
+        
+        Args:
+            entities: Entities as parsed from the Gemini response
+            chunk_index: Index of the chunk the entities belong to
+            
+        Returns:
+            Entities above min_confidence, in our expected format
+        """
+        normalized = []
+        for entity in entities:
+            # Set default values for any missing fields
+            entity.setdefault("confidence", 0.8)
+            entity.setdefault("start", 0)
+            entity.setdefault("end", len(entity["text"]) if "text" in entity else 0)
+            entity.setdefault("context", "")
+            
+            # Map entity type to our system type
+            entity["entity_type"] = ENTITY_TYPE_MAPPING.get(entity.get("label", ""), "Unknown")
+            
+            # Add sentence_id and chunk_index
+            entity["sentence_id"] = 0  # Simplified, we don't track sentences
+            entity["chunk_index"] = chunk_index
+            
+            # Filter low confidence entities
+            if entity.get("confidence", 0) >= self.min_confidence:
+                normalized.append(entity)
+        
+        return normalized
     
     def _extract_json_from_response(self, response_text: str) -> List[Dict[str, Any]]:
         """Extract JSON from the Gemini response text.
@@ -186,12 +205,14 @@ class EntityExtractor:
         # If no JSON found or parsing failed, return empty list
         return []
     
-    def _fallback_entity_extraction(self, text: str, chunk_index: int = 0) -> List[Dict[str, Any]]:
+    def _fallback_entity_extraction(self, text: str, chunk_index: int = 0,
+                                    failures: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """Fallback method for entity extraction.
         
         Args:
             text: Text to extract entities from
             chunk_index: Index of the chunk this text belongs to
+            failures: Optional list that Gemini errors are appended to
             
         Returns:
             List of extracted entities with details
@@ -246,15 +267,19 @@ class EntityExtractor:
         
         except Exception as e:
             logger.error(f"Error in fallback entity extraction: {e}")
+            if failures is not None:
+                failures.append(f"fallback entity extraction: {e}")
             # Return empty list if all extraction methods fail
             return []
     
-    def extract_relationships(self, text: str, entities: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    def extract_relationships(self, text: str, entities: Optional[List[Dict[str, Any]]] = None,
+                              failures: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """Extract potential relationships between entities.
         
         Args:
             text: Text to extract relationships from
             entities: Optional pre-extracted entities. If None, entities will be extracted from text.
+            failures: Optional list that Gemini errors are appended to
             
         Returns:
             List of potential relationships
@@ -267,7 +292,7 @@ class EntityExtractor:
         
         # Use provided entities or extract them if not provided
         if entities is None:
-            entities = self.extract_entities(text)
+            entities = self.extract_entities(text, failures=failures)
         
         if len(entities) < 1:
             logger.warning(f"Not enough entities found for relationship extraction: {entities}")
@@ -275,8 +300,7 @@ class EntityExtractor:
         
         # Create list of valid relationship types for the prompt, including trait types
         # Added trait relationship types
-        rel_types = RELATIONSHIP_TYPES
-        rel_types_str = ", ".join([f'"{rel_type}"' for rel_type in rel_types])
+        rel_types_str = ", ".join([f'"{rel_type}"' for rel_type in RELATIONSHIP_TYPES_TUPLE])
         
         # Create prompt for relationship extraction
         entity_mentions = ", ".join([f"{e['text']} ({e['entity_type']})" for e in entities])
@@ -340,39 +364,54 @@ class EntityExtractor:
                 return []
             
             # Post-process relationships to ensure proper typing and defaults
-            for rel in relationships:
-                # Add sentence_id field to match original API
-                rel.setdefault("sentence_id", 0)
-                
-                # Validate and possibly correct relationship type
-                source_type = rel.get("source_type")
-                target_type = rel.get("target_type")
-                
-                if source_type and target_type:
-                    # Ensure relationship type is from our defined set
-                    if rel.get("relationship") not in rel_types:
-                        # Is the type just "MISSING"? Let's log it to see if we need to add more types
-                        if rel.get("relationship") == "MISSING":
-                            logger.warning(f"Missing relationship type for {source_type} and {target_type}")
-                        
-                        # Use our mapping function to determine the proper relationship, this will fallback to MENTIONED_WITH if no other type is found
-                        rel["relationship"] = self._determine_relationship_type(source_type, target_type)
-                else:
-                    # If type information is missing, use default
-                    rel["relationship"] = "MENTIONED_WITH"
-            
-            return relationships
+            return self._normalize_relationships(relationships)
         
         except Exception as e:
             logger.error(f"Error calling Gemini API for relationship extraction: {e}")
+            if failures is not None:
+                failures.append(f"relationship extraction: {e}")
             return []
     
-    def extract_keywords(self, text: str, top_n: int = 10) -> List[Dict[str, Any]]:
+    def _normalize_relationships(self, relationships: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill in defaults and validate relationship types for raw Gemini relationships.
+        
+        Args:
+            relationships: Relationships as parsed from the Gemini response
+            
+        Returns:
+            The same relationships, with types mapped onto RELATIONSHIP_TYPES
+        """
+        for rel in relationships:
+            # Add sentence_id field to match original API
+            rel.setdefault("sentence_id", 0)
+            
+            # Validate and possibly correct relationship type
+            source_type = rel.get("source_type")
+            target_type = rel.get("target_type")
+            
+            if source_type and target_type:
+                # Ensure relationship type is from our defined set
+                if rel.get("relationship") not in RELATIONSHIP_TYPES:
+                    # Is the type just "MISSING"? Let's log it to see if we need to add more types
+                    if rel.get("relationship") == "MISSING":
+                        logger.warning(f"Missing relationship type for {source_type} and {target_type}")
+                    
+                    # Use our mapping function to determine the proper relationship, this will fallback to MENTIONED_WITH if no other type is found
+                    rel["relationship"] = self._determine_relationship_type(source_type, target_type)
+            else:
+                # If type information is missing, use default
+                rel["relationship"] = "MENTIONED_WITH"
+        
+        return relationships
+    
+    def extract_keywords(self, text: str, top_n: int = 10,
+                         failures: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """Extract important keywords from text.
         
         Args:
             text: Text to extract keywords from
             top_n: Maximum number of keywords to return
+            failures: Optional list that Gemini errors are appended to
             
         Returns:
             List of keywords with relevance scores
@@ -416,6 +455,8 @@ class EntityExtractor:
         
         except Exception as e:
             logger.error(f"Error calling Gemini API for keyword extraction: {e}")
+            if failures is not None:
+                failures.append(f"keyword extraction: {e}")
             return []
     
     def process_document(self, content: str, chunk_boundaries: List[Tuple[int, int]] = None) -> Dict[str, Any]:
@@ -426,20 +467,23 @@ class EntityExtractor:
             chunk_boundaries: Optional list of chunk boundaries as (start, end) tuples
             
         Returns:
-            Dictionary with extracted entities, relationships, and keywords
+            Dictionary with extracted entities, relationships, and keywords, plus
+            "extraction_failed": True if a Gemini call errored and the result is partial
         """
         if not content:
             return {"entities": [], "relationships": [], "keywords": []}
+        
+        failures: List[str] = []
             
         # Extract keywords from the entire document
-        keywords = self.extract_keywords(content)
+        keywords = self.extract_keywords(content, failures=failures)
         
         if chunk_boundaries:
             # Process entities by chunk
             all_entities = []
             for i, (start, end) in enumerate(chunk_boundaries):
                 chunk_content = content[start:end]
-                chunk_entities = self.extract_entities(chunk_content, chunk_index=i)
+                chunk_entities = self.extract_entities(chunk_content, chunk_index=i, failures=failures)
                 
                 # Adjust start and end positions to the original document
                 for entity in chunk_entities:
@@ -449,25 +493,106 @@ class EntityExtractor:
                 all_entities.extend(chunk_entities)
             
             # Process relationships from the entire document
-            all_relationships = self.extract_relationships(content, all_entities)
+            all_relationships = self.extract_relationships(content, all_entities, failures=failures)
             # logger.info(f"process_document: Extracted relationships: {all_relationships}")
             
-            return {
+            result = {
                 "entities": all_entities,
                 "relationships": all_relationships,
                 "keywords": keywords
             }
         else:
             # Process the whole document as a single chunk
-            entities = self.extract_entities(content)
-            relationships = self.extract_relationships(content, entities)
+            entities = self.extract_entities(content, failures=failures)
+            relationships = self.extract_relationships(content, entities, failures=failures)
             # logger.info(f"process_document: Extracted relationships: {relationships}")
             
-            return {
+            result = {
                 "entities": entities,
                 "relationships": relationships,
                 "keywords": keywords
             }
+        
+        if failures:
+            result["extraction_failed"] = True
+        return result
+    
+    def process_documents_batch(self, documents: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """Extract entities and relationships for several short texts in one Gemini call.
+        
+        Packing chat messages into a single prompt amortizes the request overhead and
+        instructions across the batch. Keywords are not extracted here. Any document
+        missing from the response, or the whole batch if the response can't be parsed,
+        falls back to process_document.
+        
+        Args:
+            documents: List of (id, text) tuples; ids must be unique
+            
+        Returns:
+            Dictionary mapping each id to a process_document-style result; only
+            individual fallbacks can carry "extraction_failed"
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = [(doc_id, text) for doc_id, text in documents if text and text.strip()]
+        for doc_id, text in documents:
+            if not text or not text.strip():
+                results[doc_id] = {"entities": [], "relationships": [], "keywords": []}
+        
+        if not pending:
+            return results
+        
+        self._ensure_model_initialized()
+        
+        rel_types_str = ", ".join([f'"{rel_type}"' for rel_type in RELATIONSHIP_TYPES_TUPLE])
+        documents_str = "\n\n".join(f"DOCUMENT {doc_id}:\n{text}" for doc_id, text in pending)
+        
+        prompt = f"""
+        Extract entities and the relationships between them from each of the documents below.
+        Treat every document independently.
+        
+        Entities: use the label PERSON, ORG, GPE, LOC, PRODUCT, WORK_OF_ART, EVENT, DATE, TIME, MONEY, PERCENT, NORP, FAC, LAW, LANGUAGE, ORDINAL, CARDINAL, QUANTITY, NAMED_BEING, or a trait label ATTRIBUTE, INTEREST, SKILL, PREFERENCE, LIKE, DISLIKE.
+        "I" should count as a person. Only include high-quality entities useful or relevant about the text's author.
+        
+        Relationships: the relationship MUST be one of: {rel_types_str}. Use "MISSING" if none fits.
+        Only include relationships clearly supported by the document.
+        
+        Return ONLY a JSON object keyed by document id, where each value has:
+        - entities: list of objects with text, label, start, end, confidence (0-1), context
+        - relationships: list of objects with source, source_type, target, target_type, relationship, context, confidence (0-1), fact
+        Every document id must appear, with empty lists if nothing was found.
+        
+        {documents_str}
+        """
+        
+        parsed = None
+        try:
+            # Make API call to Gemini - generate_content is not async
+            response = self._model.generate_content(prompt)
+            json_match = re.search(r'\{[\s\S]*\}', response.text)
+            if json_match:
+                parsed = json.loads(json_match.group(0))
+        except Exception as e:
+            logger.error(f"Error calling Gemini API for batch extraction of {len(pending)} documents: {e}")
+        
+        if not isinstance(parsed, dict):
+            parsed = {}
+        
+        for doc_id, text in pending:
+            doc_result = parsed.get(str(doc_id))
+            if not isinstance(doc_result, dict):
+                logger.warning(f"Batch extraction returned nothing usable for document {doc_id}, extracting individually")
+                results[doc_id] = self.process_document(text)
+                continue
+            
+            entities = [e for e in doc_result.get("entities") or [] if isinstance(e, dict)]
+            relationships = [r for r in doc_result.get("relationships") or [] if isinstance(r, dict)]
+            results[doc_id] = {
+                "entities": self._normalize_entities(entities),
+                "relationships": self._normalize_relationships(relationships),
+                "keywords": []
+            }
+        
+        return results
     
     def _determine_relationship_type(self, source_type: str, target_type: str) -> str:
         """Determine relationship type based on entity types.
@@ -479,41 +604,5 @@ class EntityExtractor:
         Returns:
             Relationship type
         """
-        # Map of common entity type pairs to relationship types
-        relationship_map = {
-            ("Person", "Organization"): "ASSOCIATED_WITH",
-            ("Organization", "Person"): "HAS_MEMBER",
-            ("Person", "Person"): "RELATED_TO",
-            ("Person", "Location"): "LOCATED_IN",
-            ("Organization", "Location"): "BASED_IN",
-            ("Person", "Document"): "CREATED",
-            ("Document", "Person"): "CREATED_BY",
-            ("Person", "Event"): "PARTICIPATED_IN",
-            ("Event", "Person"): "INVOLVED",
-            ("Organization", "Event"): "ORGANIZED",
-            ("Event", "Organization"): "ORGANIZED_BY",
-            ("Event", "Location"): "LOCATED_IN",
-            ("Person", "Date"): "ASSOCIATED_WITH",
-            ("Event", "Date"): "OCCURRED_ON",
-            ("Document", "Date"): "PUBLISHED_ON",
-            ("Organization", "Document"): "PUBLISHED",
-            ("Document", "Organization"): "PUBLISHED_BY",
-            ("Person", "Product"): "ASSOCIATED_WITH",
-            ("Organization", "Product"): "PRODUCED",
-            ("Product", "Organization"): "PRODUCED_BY",
-            # Added trait/attribute relationship mappings
-            ("Person", "Cardinal"): "HAS_ATTRIBUTE",  # For age and numeric attributes
-            ("Person", "Attribute"): "HAS_ATTRIBUTE",
-            ("Person", "Interest"): "INTERESTED_IN",
-            ("Person", "Skill"): "HAS_SKILL",
-            ("Person", "Preference"): "LIKES",
-            ("Person", "Dislike"): "DISLIKES",
-            # Common entity types that should be treated as attributes
-            ("Person", "Number"): "HAS_ATTRIBUTE",
-            ("Person", "Quantity"): "HAS_ATTRIBUTE",
-            ("Person", "Age"): "HAS_ATTRIBUTE",
-            ("Person", "Date"): "HAS_ATTRIBUTE",  # For birthdays, etc.
-        }
-        
         # Get relationship type from map, or use default
-        return relationship_map.get((source_type, target_type), "MENTIONED_WITH") 
\ No newline at end of file
+        return ENTITY_PAIR_RELATIONSHIP_MAPPING.get((source_type, target_type), "MENTIONED_WITH") 
\ No newline at end of file
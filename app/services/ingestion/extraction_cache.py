@@ -0,0 +1,157 @@
+"""Redis-backed cache of entity extraction results for short chat messages.
+
+Chat traffic is full of repeated snippets ("thanks", "ok sounds good") that each
+cost several Gemini round-trips to extract nothing. CachedEntityExtractor keys
+results on the normalized message text, so a repeat from any worker process
+skips the LLM entirely. Results from an extraction that hit a Gemini error are
+not cached, so an outage doesn't suppress extraction until the TTL runs out.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "extraction"
+
+
+def normalize_content(content: str) -> str:
+    """Whitespace-insensitive form of a message, for cache keys.
+
+    Case is kept: cached entity text and offsets come from the message, and
+    entity names become graph merge keys.
+    """
+    return " ".join(content.split())
+
+
+# Shared across extractors in a process
+_redis_client = None
+
+
+def get_redis_client() -> redis.Redis:
+    """Get or create the shared Redis client used for extraction caching."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_client
+
+
+class CachedEntityExtractor:
+    """Wraps an EntityExtractor and caches process_document results in Redis.
+
+    Only unchunked extractions are cached; anything else is delegated unchanged.
+    Redis errors are logged and treated as misses.
+    """
+
+    def __init__(
+        self,
+        extractor: Any,
+        redis_client: Optional[redis.Redis] = None,
+        ttl_seconds: int = settings.EXTRACTION_CACHE_TTL_SECONDS,
+    ):
+        """Initialize the cache.
+
+        Args:
+            extractor: EntityExtractor to call on a miss
+            redis_client: Redis client (defaults to the shared one)
+            ttl_seconds: How long a cached extraction stays valid
+        """
+        self.extractor = extractor
+        self.redis = redis_client or get_redis_client()
+        self.ttl_seconds = ttl_seconds
+
+    def __getattr__(self, name: str) -> Any:
+        # Everything not cached here (extract_entities, extract_keywords, ...) goes straight through
+        if name == "extractor":
+            raise AttributeError(name)
+        return getattr(self.extractor, name)
+
+    def _key(self, content: str) -> str:
+        digest = hashlib.sha256(normalize_content(content).encode("utf-8")).hexdigest()
+        return f"{CACHE_KEY_PREFIX}:{self.extractor.model_name}:{digest}"
+
+    def _get_many(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        try:
+            values = self.redis.mget(keys)
+        except redis.RedisError as e:
+            logger.warning(f"Extraction cache lookup failed: {e}")
+            return [None] * len(keys)
+        return [json.loads(value) if value else None for value in values]
+
+    def _put_many(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        # Partial results from a failed Gemini call would hide the message until the TTL
+        entries = {key: result for key, result in entries.items() if not result.get("extraction_failed")}
+        if not entries:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, result in entries.items():
+                pipe.set(key, json.dumps(result), ex=self.ttl_seconds)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Extraction cache write failed: {e}")
+
+    def process_document(self, content: str, chunk_boundaries: List[Tuple[int, int]] = None) -> Dict[str, Any]:
+        """Cached version of EntityExtractor.process_document.
+
+        Args:
+            content: Piece of text - document, chat message
+            chunk_boundaries: Optional list of chunk boundaries; bypasses the cache
+
+        Returns:
+            Dictionary with extracted entities, relationships, and keywords
+        """
+        if not content or chunk_boundaries:
+            return self.extractor.process_document(content, chunk_boundaries)
+
+        key = self._key(content)
+        cached = self._get_many([key])[0]
+        if cached is not None:
+            logger.info("Extraction cache hit")
+            return cached
+
+        result = self.extractor.process_document(content)
+        self._put_many({key: result})
+        return result
+
+    def process_documents_batch(self, documents: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """Cached version of EntityExtractor.process_documents_batch.
+
+        Only documents that miss the cache are sent to the extractor.
+
+        Args:
+            documents: List of (id, text) tuples; ids must be unique
+
+        Returns:
+            Dictionary mapping each id to a process_document-style result
+        """
+        if not documents:
+            return {}
+
+        keys = {doc_id: self._key(text or "") for doc_id, text in documents}
+        cached = dict(zip(keys.values(), self._get_many(list(keys.values()))))
+
+        results = {}
+        misses = []
+        for doc_id, text in documents:
+            hit = cached.get(keys[doc_id])
+            if hit is not None:
+                results[doc_id] = hit
+            else:
+                misses.append((doc_id, text))
+
+        if len(misses) < len(documents):
+            logger.info(f"Extraction cache hit for {len(documents) - len(misses)} of {len(documents)} documents")
+
+        if misses:
+            extracted = self.extractor.process_documents_batch(misses)
+            results.update(extracted)
+            self._put_many({keys[doc_id]: result for doc_id, result in extracted.items() if doc_id in keys})
+
+        return results
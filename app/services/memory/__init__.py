@@ -6,13 +6,20 @@ import os
 import uuid
 import asyncio
 from functools import wraps
-import json
 from datetime import datetime, timezone
 
+import orjson
 from mem0 import MemoryClient  # Import MemoryClient instead of Memory
 
 from app.core.config import settings
 from app.core.constants import DEFAULT_USER_ID
+from app.services.common.retry import is_transient_http_error, transient_retry
+
+try:
+    from mem0.exceptions import NetworkError as Mem0NetworkError, RateLimitError as Mem0RateLimitError
+    _MEM0_TRANSIENT_ERRORS = (Mem0NetworkError, Mem0RateLimitError)
+except ImportError:  # older mem0ai surfaces raw httpx errors instead
+    _MEM0_TRANSIENT_ERRORS = ()
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +28,16 @@ _mem0_client = None
 # Lock to ensure serialized access to Mem0 operations
 _mem0_lock = asyncio.Lock()
 
+def _dumps_preview(value: Any, max_chars: int = 200) -> str:
+    """Serialize a Mem0 payload for debug logging, truncated to max_chars."""
+    return orjson.dumps(value, default=str)[:max_chars].decode("utf-8", errors="ignore")
+
+
+def _is_transient_mem0_error(exc: BaseException) -> bool:
+    """True for Mem0 failures that are worth retrying (network, rate limit, 5xx, attempt timeout)."""
+    return isinstance(exc, (asyncio.TimeoutError, *_MEM0_TRANSIENT_ERRORS)) or is_transient_http_error(exc)
+
+
 def get_mem0_client():
     """Get or create the singleton Mem0 client."""
     global _mem0_client
@@ -171,7 +188,8 @@ class MemoryService:
             logger.error(f"Error adding memory after {max_retries} attempts: {last_error}")
             return {"error": str(last_error), "memory_id": None, "user_id": user_id}
     
-    async def search(self, query: str, user_id: str, limit: int = 5, metadata_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    async def search(self, query: str, user_id: str, limit: int = 5, metadata_filter: Optional[Dict[str, Any]] = None, preview_chars: Optional[int] = None,
+                     timeout: float = settings.MEM0_SEARCH_TIMEOUT_SECONDS) -> List[Dict[str, Any]]:
         """Search Mem0 for memories.
         
         Args:
@@ -179,6 +197,10 @@ class MemoryService:
             user_id: The user ID to filter results by
             limit: Maximum number of results to return
             metadata_filter: Optional metadata filter criteria to refine search results
+            preview_chars: Optional cap on returned content length; longer content is
+                truncated to this many characters and flagged with "content_truncated"
+            timeout: Total time allowed, retries included; callers with their own
+                deadline should pass it so retries fit inside it
             
         Returns:
             List of search results
@@ -195,66 +217,78 @@ class MemoryService:
             ]
             
         logger.info(f"Searching memories for user {user_id} with query: {query}")
-        # Define a function to run with lock
-        async def _search_with_lock():
-            async with _mem0_lock:
-                try:
-                    # Convert synchronous call to async
-                    search_func = async_wrap(self.client.search)
-                    # Use parameters as recommended
-                    raw_results = await asyncio.wait_for(
-                        search_func(
-                            query=query, 
-                            user_id=user_id, 
-                            top_k=limit,
-                            metadata=metadata_filter,
-                            version="v2",
-                            output_format="v1.1",
-                            filters={
-                                "AND": [
-                                    {"user_id": user_id}
-                                ]
-                            }
-                        ),
-                        timeout=3  # 3 second timeout
-                    )
-                    
-                    # Normalize the results format
-                    if isinstance(raw_results, dict) and "results" in raw_results:
-                        raw_memories = raw_results["results"]
-                    elif isinstance(raw_results, list):
-                        raw_memories = raw_results
-                    else:
-                        logger.warning(f"Unexpected result format from Mem0 search: {type(raw_results)}")
-                        raw_memories = []
-                        
-                    # Debug the first raw memory if available
-                    if raw_memories and len(raw_memories) > 0:
-                        first_raw = raw_memories[0]
-                        logger.debug(f"First raw search result: {json.dumps(first_raw)[:200]}...")
+        # Reads don't take _mem0_lock: the hosted client's HTTP session is safe to share
+        # across executor threads, and the lock only guards writes
+        async def _search():
+            try:
+                # Convert synchronous call to async
+                search_func = async_wrap(self.client.search)
+                # Use parameters as recommended; retry transient API failures with backoff.
+                # Each attempt is capped so a hung call still leaves room to retry within the budget
+                attempt_timeout = min(settings.MEM0_SEARCH_ATTEMPT_TIMEOUT_SECONDS, timeout)
+                async for attempt in transient_retry(_is_transient_mem0_error):
+                    with attempt:
+                        raw_results = await asyncio.wait_for(
+                            search_func(
+                                query=query, 
+                                user_id=user_id, 
+                                top_k=limit,
+                                metadata=metadata_filter,
+                                version="v2",
+                                output_format="v1.1",
+                                filters={
+                                    "AND": [
+                                        {"user_id": user_id}
+                                    ]
+                                }
+                            ),
+                            timeout=attempt_timeout
+                        )
+                
+                # Normalize the results format
+                if isinstance(raw_results, dict) and "results" in raw_results:
+                    raw_memories = raw_results["results"]
+                elif isinstance(raw_results, list):
+                    raw_memories = raw_results
+                else:
+                    logger.warning(f"Unexpected result format from Mem0 search: {type(raw_results)}")
+                    raw_memories = []
                     
-                    # Process each memory through the normalizer with similarity score preservation
-                    normalized_results = []
-                    for memory in raw_memories:
-                        if isinstance(memory, dict):
-                            normalized = self._normalize_memory(memory)
-                            # Preserve similarity score if present
-                            if "similarity" in memory:
-                                normalized["similarity"] = memory["similarity"]
-                            elif "score" in memory:
-                                normalized["similarity"] = memory["score"]
-                            normalized_results.append(normalized)
+                # Debug the first raw memory if available (serializing it isn't free, so only when enabled)
+                if raw_memories and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"First raw search result: {_dumps_preview(raw_memories[0])}...")
+                
+                # Process each memory through the normalizer with similarity score preservation
+                normalized_results = []
+                for memory in raw_memories:
+                    if isinstance(memory, dict):
+                        normalized = self._normalize_memory(memory)
+                        # Preserve similarity score if present
+                        if "similarity" in memory:
+                            normalized["similarity"] = memory["similarity"]
+                        elif "score" in memory:
+                            normalized["similarity"] = memory["score"]
+                        # Only ship a bounded preview of large memories to the caller
+                        if preview_chars is not None:
+                            content = normalized.get("content") or ""
+                            if len(content) > preview_chars:
+                                normalized["content"] = content[:preview_chars]
+                                normalized["content_truncated"] = True
+                            raw_memory = normalized.get("memory")
+                            if isinstance(raw_memory, str) and len(raw_memory) > preview_chars:
+                                normalized["memory"] = raw_memory[:preview_chars]
+                        normalized_results.append(normalized)
+                
+                logger.info(f"Memory search for user {user_id} returned {len(normalized_results)} results")
+                return normalized_results
                     
-                    logger.info(f"Memory search for user {user_id} returned {len(normalized_results)} results")
-                    return normalized_results
-                        
-                except Exception as e:
-                    logger.error(f"Error in search: {e}")
-                    return [{"error": str(e)}]
+            except Exception as e:
+                logger.error(f"Error in search: {e}")
+                return [{"error": str(e)}]
         
         # Execute with timeout
         try:
-            return await asyncio.wait_for(_search_with_lock(), timeout=8)
+            return await asyncio.wait_for(_search(), timeout=timeout)
         except asyncio.TimeoutError:
             logger.error(f"Timeout in search for query '{query}'")
             return [{"error": "Search operation timed out"}]
@@ -538,10 +572,9 @@ class MemoryService:
                         logger.warning(f"Unexpected result format from Mem0 get_all: {type(raw_results)}")
                         raw_memories = []
                     
-                    # Debug the first raw memory if available
-                    if raw_memories and len(raw_memories) > 0:
-                        first_raw = raw_memories[0]
-                        logger.debug(f"First raw memory: {json.dumps(first_raw)[:200]}...")
+                    # Debug the first raw memory if available (serializing it isn't free, so only when enabled)
+                    if raw_memories and logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"First raw memory: {_dumps_preview(raw_memories[0])}...")
                         
                     # Process each memory through the normalizer
                     normalized_results = [
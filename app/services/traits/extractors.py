@@ -1,6 +1,7 @@
 """Trait extractors for different data sources."""
 
 from abc import ABC, abstractmethod
+import asyncio
 import logging
 from typing import Any, Dict, List, Optional
 from datetime import datetime
@@ -216,7 +217,7 @@ class ChatTraitExtractor(TraitExtractor):
         
         try:
             # Use the trait extraction method defined in the base class
-            raw_traits = self._extract_traits_with_llm(content)
+            raw_traits = await asyncio.to_thread(self._extract_traits_with_llm, content)
             
             # Convert to our Trait objects
             traits = []
@@ -261,7 +262,7 @@ class DocumentTraitExtractor(TraitExtractor):
         
         try:
             # Use the trait extraction method defined in the base class
-            raw_traits = self._extract_traits_with_llm(content)
+            raw_traits = await asyncio.to_thread(self._extract_traits_with_llm, content)
             
             # Convert to our Trait objects
             traits = []
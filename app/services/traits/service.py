@@ -1,13 +1,14 @@
 """Service for extracting traits from various sources and updating user profiles."""
 
 import logging
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 from datetime import datetime
+from weakref import WeakKeyDictionary
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import update
 from sqlalchemy.orm import joinedload
-import json
-from collections import defaultdict
+from sqlalchemy.orm.attributes import set_committed_value
+import orjson
 
 from app.db.models.user import User
 from app.db.models.user_profile import UserProfile
@@ -15,6 +16,72 @@ from app.services.traits.extractors import Trait, TraitExtractor, ChatTraitExtra
 
 logger = logging.getLogger(__name__)
 
+# Profile list field and update counters for each trait type stored as a list;
+# preferences are a nested dict and handled separately
+LIST_TRAIT_SECTIONS = {
+    "skill": ("skills", "skills_added", "skills_updated"),
+    "interest": ("interests", "interests_added", "interests_updated"),
+    "dislike": ("dislikes", "dislikes_added", "dislikes_updated"),
+    "attribute": ("attributes", "attributes_added", "attributes_updated"),
+}
+
+# Sections compared by interest/dislike conflict resolution
+CONFLICT_SECTIONS = frozenset({"interests", "dislikes"})
+
+# Trait types the extractors can emit but UserProfile has no column for
+UNSUPPORTED_TRAIT_TYPES = frozenset({"like"})
+
+# UserProfile columns written back by _persist_profile
+PROFILE_TRAIT_COLUMNS = ("skills", "interests", "preferences", "dislikes", "attributes", "last_updated_source")
+
+# casefolded name -> (index, item) maps for each list section, kept per profile instance so a
+# batch of messages for one user doesn't rebuild them every time. An entry is valid
+# only while the profile still holds the lists it was built from: a commit, rollback
+# or refresh loads new lists and so invalidates it.
+_trait_indexes: "WeakKeyDictionary[UserProfile, Tuple[Dict[str, list], Dict[str, Dict[str, tuple]]]]" = WeakKeyDictionary()
+
+
+def _index_by_name(items: List[Any]) -> Dict[str, Tuple[int, Dict[str, Any]]]:
+    """Map each named trait in a profile list section to its (index, item)."""
+    return {item["name"].casefold(): (idx, item) for idx, item in enumerate(items) if isinstance(item, dict) and item.get("name")}
+
+
+def _get_or_build_indexes(profile: UserProfile) -> Dict[str, Dict[str, Tuple[int, Dict[str, Any]]]]:
+    """Give the profile fresh copies of its list sections and return their name indexes.
+
+    The copies are reassigned so SQLAlchemy sees the JSON columns change; being
+    shallow, they keep the indexes of a cached entry valid.
+
+    Args:
+        profile: UserProfile about to be updated
+
+    Returns:
+        Dictionary mapping each list section to its casefolded name -> (index, item) map
+    """
+    cached = _trait_indexes.get(profile)
+    lists = {}
+    valid = cached is not None
+    for section, _, _ in LIST_TRAIT_SECTIONS.values():
+        value = getattr(profile, section, None)
+        valid = valid and value is cached[0][section]
+        if not isinstance(value, list):
+            value = orjson.loads(value or "[]")
+        lists[section] = list(value)
+        setattr(profile, section, lists[section])
+
+    if valid:
+        maps = cached[1]
+    else:
+        maps = {section: _index_by_name(items) for section, items in lists.items()}
+    _trait_indexes[profile] = (lists, maps)
+    return maps
+
+
+def _same_trait(existing: Dict[str, Any], trait_data: Dict[str, Any]) -> bool:
+    """True when trait_data differs from the stored trait only by its last_updated timestamp."""
+    return all(existing.get(key) == value for key, value in trait_data.items() if key != "last_updated")
+
+
 class TraitExtractionService:
     """Service for extracting traits from various sources and updating user profiles."""
     
@@ -27,6 +94,9 @@ class TraitExtractionService:
     MIN_CONFIDENCE_TRAIT_LIKE = 0.7
     MIN_CONFIDENCE_TRAIT_ATTRIBUTE = 0.7
     
+    # Minimum confidence gap for an interest/dislike conflict to drop either side
+    CONFIDENCE_EPSILON = 0.05
+    
     # Source reliability weights
     SOURCE_WEIGHTS = {
         "chat": 0.9,
@@ -36,13 +106,16 @@ class TraitExtractionService:
         "social_media": 0.6,
     }
     
-    def __init__(self, db_session: AsyncSession = None):
+    def __init__(self, db_session: AsyncSession = None, autocommit: bool = True):
         """Initialize the service.
         
         Args:
             db_session: Optional database session
+            autocommit: Commit after each profile update; when False the caller
+                owns the transaction and commits once for a whole batch
         """
         self.db = db_session
+        self.autocommit = autocommit
         self._extractors = {
             "chat": ChatTraitExtractor(),
             "document": DocumentTraitExtractor(),
@@ -124,6 +197,7 @@ class TraitExtractionService:
         
         # Apply source weight to confidence scores
         source_weight = self.SOURCE_WEIGHTS.get(source_type, 0.7)
+        thresholds = self._confidence_thresholds()
         
         for trait in traits:
             # Adjust confidence based on source reliability
@@ -131,29 +205,31 @@ class TraitExtractionService:
             trait.confidence = round(adjusted_confidence, 2)
             
             # logger.info(f"Trait {trait.name} has confidence {trait.confidence} after source weight adjustment")
-            # Filter by minimum confidence thresholds
-            if trait.confidence < self.MIN_CONFIDENCE_TRAIT:
-                logger.info(f"Skipping trait {trait.name} with confidence {trait.confidence} (below threshold {self.MIN_CONFIDENCE_TRAIT})")
-                continue
-                
-            # Apply trait-specific confidence thresholds
-            if trait.trait_type == "skill" and trait.confidence < self.MIN_CONFIDENCE_TRAIT_SKILL:
-                continue
-            elif trait.trait_type == "interest" and trait.confidence < self.MIN_CONFIDENCE_TRAIT_INTEREST:
-                continue
-            elif trait.trait_type == "preference" and trait.confidence < self.MIN_CONFIDENCE_TRAIT_PREFERENCE:
-                continue
-            elif trait.trait_type == "like" and trait.confidence < self.MIN_CONFIDENCE_TRAIT_LIKE:
-                continue
-            elif trait.trait_type == "dislike" and trait.confidence < self.MIN_CONFIDENCE_TRAIT_DISLIKE:
-                continue
-            elif trait.trait_type == "attribute" and trait.confidence < self.MIN_CONFIDENCE_TRAIT_ATTRIBUTE:
+            # Filter by the minimum confidence threshold for this trait type
+            threshold = thresholds.get(trait.trait_type, self.MIN_CONFIDENCE_TRAIT)
+            if trait.confidence < threshold:
+                logger.info(f"Skipping trait {trait.name} with confidence {trait.confidence} (below threshold {threshold})")
                 continue
             
             processed_traits.append(trait)
         
         return processed_traits
     
+    def _confidence_thresholds(self) -> Dict[str, float]:
+        """Effective minimum confidence per trait type: the general threshold or the type's own, whichever is higher."""
+        type_thresholds = {
+            "skill": self.MIN_CONFIDENCE_TRAIT_SKILL,
+            "interest": self.MIN_CONFIDENCE_TRAIT_INTEREST,
+            "preference": self.MIN_CONFIDENCE_TRAIT_PREFERENCE,
+            "like": self.MIN_CONFIDENCE_TRAIT_LIKE,
+            "dislike": self.MIN_CONFIDENCE_TRAIT_DISLIKE,
+            "attribute": self.MIN_CONFIDENCE_TRAIT_ATTRIBUTE,
+        }
+        return {
+            trait_type: max(self.MIN_CONFIDENCE_TRAIT, threshold)
+            for trait_type, threshold in type_thresholds.items()
+        }
+    
     async def _update_user_profile(self, user_id: str, traits: List[Trait]) -> Dict[str, Any]:
         """Update user profile with extracted traits.
         
@@ -172,32 +248,32 @@ class TraitExtractionService:
             # Log the number of traits being processed
             logger.info(f"Updating profile for user {user_id} with {len(traits)} traits")
             
-            # Query user with profile efficiently - don't load unnecessary relationships
-            query = (
-                select(User)
-                .where(User.id == user_id)
-                .options(joinedload(User.profile))
-            )
-            
-            # Execute the query
-            result = self.db.execute(query)
-            user = result.unique().scalars().first()
-            
-            if not user:
-                logger.warning(f"User {user_id} not found")
-                return {"updated": False, "reason": "user_not_found"}
-            
-            profile = user.profile
-            
-            if not profile:
-                logger.warning(f"Profile for user {user_id} not found")
-                return {"updated": False, "reason": "profile_not_found"}
-            
-            # Update profile with traits
-            updates = self._apply_traits_to_profile(profile, traits)
+            # Work in a savepoint so a failure only discards this update, not the caller's batch
+            with self.db.begin_nested():
+                # Load user with profile in one query; a user already in the session
+                # (e.g. eager-loaded with a batch of chat messages) costs no query at all
+                user = self.db.get(User, user_id, options=[joinedload(User.profile)])
+                
+                if not user:
+                    logger.warning(f"User {user_id} not found")
+                    return {"updated": False, "reason": "user_not_found"}
+                
+                profile = user.profile
+                
+                if not profile:
+                    logger.warning(f"Profile for user {user_id} not found")
+                    return {"updated": False, "reason": "profile_not_found"}
+                
+                # Update profile with traits
+                updates = self._apply_traits_to_profile(profile, traits)
+                # Nothing cleared its threshold or beat a stored trait: skip the write
+                changed = any(updates.values())
+                if changed:
+                    self._persist_profile(profile)
             
-            # Commit changes
-            self.db.commit()
+            # Commit changes; a no-op update has nothing to commit
+            if self.autocommit and changed:
+                self.db.commit()
             
             return {
                 "updated": True,
@@ -206,12 +282,27 @@ class TraitExtractionService:
             }
             
         except Exception as e:
-            await self.db.rollback()
+            if self.autocommit:
+                self.db.rollback()
             logger.error(f"Error updating profile for user {user_id}: {str(e)}")
             import traceback
             logger.error(traceback.format_exc())
             return {"updated": False, "reason": str(e)}
     
+    def _persist_profile(self, profile: UserProfile) -> None:
+        """Write the profile's trait columns with one explicit UPDATE.
+        
+        The values are then marked as committed on the instance, so the ORM flush
+        doesn't diff the nested JSON a second time or write the row again.
+        
+        Args:
+            profile: UserProfile updated by _apply_traits_to_profile
+        """
+        values = {column: getattr(profile, column) for column in PROFILE_TRAIT_COLUMNS}
+        self.db.execute(update(UserProfile).where(UserProfile.id == profile.id).values(**values))
+        for column, value in values.items():
+            set_committed_value(profile, column, value)
+    
     def _apply_traits_to_profile(self, profile: UserProfile, traits: List[Trait]) -> Dict[str, Any]:
         """Apply traits to user profile, handling conflicts and merging.
         
@@ -231,222 +322,173 @@ class TraitExtractionService:
             "preferences_updated": 0,
             "dislikes_added": 0,
             "dislikes_updated": 0,
-            "likes_added": 0,
-            "likes_updated": 0,
             "attributes_added": 0,
             "attributes_updated": 0
         }
         
         try:
-            # Initialize profile sections if they don't exist or load from JSON
-            skills = profile.skills if isinstance(profile.skills, list) else json.loads(profile.skills or '[]')
-            interests = profile.interests if isinstance(profile.interests, list) else json.loads(profile.interests or '[]')
-            preferences = profile.preferences if isinstance(profile.preferences, dict) else json.loads(profile.preferences or '{}')
-            dislikes = profile.dislikes if isinstance(profile.dislikes, list) else json.loads(profile.dislikes or '[]')
-            attributes = profile.attributes if isinstance(profile.attributes, list) else json.loads(profile.attributes or '[]')
-            likes = profile.likes if isinstance(profile.likes, list) else json.loads(profile.likes or '[]')
+            # Initialize preferences if they don't exist or load from JSON
+            preferences = profile.preferences if isinstance(profile.preferences, dict) else orjson.loads(profile.preferences or '{}')
             
             # Ensure profile fields are mutable lists/dicts for updates
-            profile.skills = list(skills)
-            profile.interests = list(interests)
             profile.preferences = dict(preferences)
-            profile.dislikes = list(dislikes)
-            profile.attributes = list(attributes)
-            profile.likes = list(likes)
-            # Create maps of existing traits for deduplication and confidence checks
-            # Store index along with data for easier update/removal
-            skill_map = {s.get("name", "").lower(): (idx, s) for idx, s in enumerate(profile.skills) if isinstance(s, dict) and s.get("name")}
-            interest_map = {i.get("name", "").lower(): (idx, i) for idx, i in enumerate(profile.interests) if isinstance(i, dict) and i.get("name")}
-            preference_map = {}
-            for category, prefs_dict in profile.preferences.items():
-                if isinstance(prefs_dict, dict):
-                    for name, details in prefs_dict.items():
-                        if isinstance(details, dict):
-                           preference_map[name.lower()] = (category, name, details) # Store category, original name, details
-            dislike_map = {d.get("name", "").lower(): (idx, d) for idx, d in enumerate(profile.dislikes) if isinstance(d, dict) and d.get("name")}
-            like_map = {l.get("name", "").lower(): (idx, l) for idx, l in enumerate(profile.likes) if isinstance(l, dict) and l.get("name")}
-            attribute_map = {a.get("name", "").lower(): (idx, a) for idx, a in enumerate(profile.attributes) if isinstance(a, dict) and a.get("name")}
+            # Maps of existing traits for deduplication and confidence checks, with
+            # each item's index for easier update/removal
+            section_maps = _get_or_build_indexes(profile)
+            # Store category, original name, details for each preference in one pass
+            preference_map = {
+                name.casefold(): (category, name, details)
+                for category, prefs_dict in profile.preferences.items() if isinstance(prefs_dict, dict)
+                for name, details in prefs_dict.items() if isinstance(details, dict)
+            }
             
             # Track staged additions (items not found in existing maps)
-            staged_skills = []
-            staged_interests = []
-            staged_preferences = defaultdict(dict) # category -> {name: details}
-            staged_dislikes = []
-            staged_attributes = []
-            staged_likes = []
+            staged = {section: [] for section in section_maps}
+            staged_preferences = [] # (category, name, details)
+            # List sections changed by this call; conflicts can only come from these
+            touched_sections = set()
+            # Low-confidence trait names, reported once after staging
+            skipped_names = []
+            # Names of traits with no profile column to land in, reported once after staging
+            unsupported_names = []
+            
+            # One timestamp for the whole batch of traits
+            last_updated = datetime.now().isoformat()
             
             # --- Step 1: Process incoming traits ---
             for trait in traits:
                 trait_type = trait.trait_type.lower()
                 name = trait.name.strip()
                 confidence = trait.confidence
-                evidence = trait.evidence
                 strength = trait.strength or 0.7
-                source = trait.source
                 
                 if not name:
                     continue
                 
                 # Skip low confidence traits
                 if confidence < self.MIN_CONFIDENCE_TRAIT:
-                    logger.info(f"Skipping trait {name} with confidence {confidence} (below threshold {self.MIN_CONFIDENCE_TRAIT})")
+                    skipped_names.append(name)
                     continue
                 
-                name_lower = name.lower()
+                name_lower = name.casefold()
                 
                 # Prepare the data structure for the trait
                 trait_data = {
                     "name": name,
                     "confidence": confidence,
-                    "source": source,
-                    "evidence": evidence,
+                    "source": trait.source,
+                    "evidence": trait.evidence,
                     "strength": strength,
-                    "last_updated": datetime.now().isoformat()
+                    "last_updated": last_updated
                 }
 
-                # Handle each trait type
-                if trait_type == "skill":
-                    trait_data["proficiency"] = strength
-                    if name_lower in skill_map:
-                        idx, existing_skill = skill_map[name_lower]
-                        # Update existing only if new confidence is higher or equal
-                        if confidence >= existing_skill.get("confidence", 0):
-                            profile.skills[idx] = trait_data 
-                            updates["skills_updated"] += 1
-                    else:
-                        # Stage trait for addition
-                        staged_skills.append(trait_data)
-                        updates["skills_added"] += 1
-                        
-                elif trait_type == "interest":
-                    if name_lower in interest_map:
-                        idx, existing_interest = interest_map[name_lower]
-                        if confidence >= existing_interest.get("confidence", 0):
-                            profile.interests[idx] = trait_data
-                            updates["interests_updated"] += 1
-                    else:
-                        staged_interests.append(trait_data)
-                        updates["interests_added"] += 1
-                        
-                elif trait_type == "preference":
+                if trait_type in UNSUPPORTED_TRAIT_TYPES:
+                    unsupported_names.append(name)
+                    continue
+
+                if trait_type == "preference":
                     category = "general" # Default category
                     if name_lower in preference_map:
                         orig_category, orig_name, existing_preference = preference_map[name_lower]
-                        if confidence >= existing_preference.get("confidence", 0):
+                        if confidence >= existing_preference.get("confidence", 0) and not _same_trait(existing_preference, trait_data):
                             # Update directly in the profile's preference dict
                             profile.preferences[orig_category][orig_name] = trait_data
                             updates["preferences_updated"] += 1
                     else:
                         # Stage new preference under its category
-                        staged_preferences[category][name] = trait_data
+                        staged_preferences.append((category, name, trait_data))
                         updates["preferences_added"] += 1
-                    
-                elif trait_type == "dislike":
-                    if name_lower in dislike_map:
-                        idx, existing_dislike = dislike_map[name_lower]
-                        if confidence >= existing_dislike.get("confidence", 0):
-                            profile.dislikes[idx] = trait_data
-                            updates["dislikes_updated"] += 1
-                    else:
-                        staged_dislikes.append(trait_data)
-                        updates["dislikes_added"] += 1
-                        
-                elif trait_type == "like":
-                    if name_lower in like_map:
-                        idx, existing_like = like_map[name_lower]
-                        if confidence >= existing_like.get("confidence", 0):
-                            profile.likes[idx] = trait_data
-                            updates["likes_updated"] += 1
-                    else:
-                        staged_likes.append(trait_data)
-                        updates["likes_added"] += 1
-                        
-                elif trait_type == "attribute":
-                    if name_lower in attribute_map:
-                        idx, existing_attribute = attribute_map[name_lower]
-                        if confidence >= existing_attribute.get("confidence", 0):
-                            profile.attributes[idx] = trait_data
-                            updates["attributes_updated"] += 1
-                    else:
-                        staged_attributes.append(trait_data)
-                        updates["attributes_added"] += 1
-            
-            # Debug log: Print the staged traits
-            # logger.info(f"adding staged skills: {staged_skills}")
-            # logger.info(f"adding staged interests: {staged_interests}")
-            # logger.info(f"adding staged preferences: {staged_preferences}")
-            # logger.info(f"adding staged dislikes: {staged_dislikes}")
-            # logger.info(f"adding staged attributes: {staged_attributes}")
+                    continue
+                
+                # Every other trait type lives in a list section of the profile
+                section_info = LIST_TRAIT_SECTIONS.get(trait_type)
+                if section_info is None:
+                    continue
+                section, added_key, updated_key = section_info
+                
+                if trait_type == "skill":
+                    trait_data["proficiency"] = strength
+                
+                existing = section_maps[section].get(name_lower)
+                if existing is not None:
+                    idx, existing_item = existing
+                    # Update existing only if new confidence is higher or equal and something changed
+                    if confidence >= existing_item.get("confidence", 0) and not _same_trait(existing_item, trait_data):
+                        getattr(profile, section)[idx] = trait_data
+                        section_maps[section][name_lower] = (idx, trait_data)
+                        updates[updated_key] += 1
+                        touched_sections.add(section)
+                else:
+                    # Stage trait for addition
+                    staged[section].append(trait_data)
+                    updates[added_key] += 1
+                    touched_sections.add(section)
             
             # TODO: should we check for dupes here? maybe ask LLM to merge traits + increase confidence?
             
             # --- Step 2: Add staged new traits ---
-            if staged_skills:
-                profile.skills.extend(staged_skills)
-                
-            if staged_interests:
-                profile.interests.extend(staged_interests)
-                
-            if staged_dislikes:
-                profile.dislikes.extend(staged_dislikes)
-                
-            if staged_attributes:
-                profile.attributes.extend(staged_attributes)
-
-            if staged_likes:
-                profile.likes.extend(staged_likes)
+            for section, staged_items in staged.items():
+                items = getattr(profile, section)
+                for item in staged_items:
+                    section_maps[section][item["name"].casefold()] = (len(items), item)
+                    items.append(item)
                 
             # Merge staged preferences into the profile preferences dictionary
-            if staged_preferences:
-                for category, new_prefs in staged_preferences.items():
-                    if category not in profile.preferences:
-                        profile.preferences[category] = {}
-                    profile.preferences[category].update(new_prefs)
+            for category, name, details in staged_preferences:
+                profile.preferences.setdefault(category, {})[name] = details
+
+            if skipped_names:
+                logger.info(f"Skipped {len(skipped_names)} traits below confidence {self.MIN_CONFIDENCE_TRAIT}: {skipped_names}")
+            if unsupported_names:
+                logger.info(f"Skipped {len(unsupported_names)} traits of unsupported types (no profile column): {unsupported_names}")
+            changed = {key: count for key, count in updates.items() if count}
+            if changed:
+                logger.info(f"Staged profile trait changes: {changed}")
 
             # --- Step 3: Conflict Resolution between lists (Interest vs. Dislike) ---
-            # Rebuild maps based on the potentially updated lists
-            interest_map_final = {i.get("name", "").lower(): (idx, i) for idx, i in enumerate(profile.interests) if isinstance(i, dict) and i.get("name")}
-            dislike_map_final = {d.get("name", "").lower(): (idx, d) for idx, d in enumerate(profile.dislikes) if isinstance(d, dict) and d.get("name")}
-            like_map_final = {l.get("name", "").lower(): (idx, l) for idx, l in enumerate(profile.likes) if isinstance(l, dict) and l.get("name")}
-            conflicting_names = set(interest_map_final.keys()) & set(dislike_map_final.keys()) & set(like_map_final.keys())
+            # Nothing to resolve unless this call changed one of the lists involved
+            if touched_sections.isdisjoint(CONFLICT_SECTIONS):
+                conflicting_names = set()
+            else:
+                # The maps were kept in step with the updated lists
+                interest_map_final = section_maps["interests"]
+                dislike_map_final = section_maps["dislikes"]
+                conflicting_names = interest_map_final.keys() & dislike_map_final.keys()
             
-            # Keep track of indices to remove to avoid modifying list while iterating
-            indices_to_remove_from_interests = set()
-            indices_to_remove_from_dislikes = set()
-            indices_to_remove_from_likes = set()
             if conflicting_names:
                 logger.warning(f"Found conflicts between interests and dislikes for: {conflicting_names}")
                 
+                # Casefolded names whose interest or dislike loses the conflict
+                interest_losers = set()
+                dislike_losers = set()
                 for name_lower in conflicting_names:
-                    interest_idx, interest_item = interest_map_final[name_lower]
-                    dislike_idx, dislike_item = dislike_map_final[name_lower]
-                    like_idx, like_item = like_map_final[name_lower]
+                    interest_item = interest_map_final[name_lower][1]
+                    dislike_item = dislike_map_final[name_lower][1]
                     
-                    # Keep the one with higher or equal confidence
-                    if interest_item.get("confidence", 0) >= dislike_item.get("confidence", 0):
-                        indices_to_remove_from_dislikes.add(dislike_idx)
+                    # Keep the clearly more confident one; near-ties are noise, so leave both
+                    gap = interest_item.get("confidence", 0) - dislike_item.get("confidence", 0)
+                    if gap > self.CONFIDENCE_EPSILON:
+                        dislike_losers.add(name_lower)
                         logger.info(f"Resolving conflict for '{interest_item.get('name')}': Keeping interest, removing dislike.")
-                    else:
-                        indices_to_remove_from_interests.add(interest_idx)
+                    elif -gap > self.CONFIDENCE_EPSILON:
+                        interest_losers.add(name_lower)
                         logger.info(f"Resolving conflict for '{dislike_item.get('name')}': Keeping dislike, removing interest.")
-                        
-                # Filter out the lower confidence items using list comprehension with indices
-                if indices_to_remove_from_interests:
-                    profile.interests = [item for idx, item in enumerate(profile.interests) if idx not in indices_to_remove_from_interests]
-                    # Update the counts to reflect removals
-                    updates["interests_added"] -= len(indices_to_remove_from_interests)
-                    if updates["interests_added"] < 0:
-                        updates["interests_added"] = 0
                 
-                if indices_to_remove_from_dislikes:
-                    profile.dislikes = [item for idx, item in enumerate(profile.dislikes) if idx not in indices_to_remove_from_dislikes]
+                # Filter the losers out by name; the lists are this call's own copies, updated
+                # in place so the cached indexes stay tied to them, and re-indexed after
+                for section, losers in (("interests", interest_losers), ("dislikes", dislike_losers)):
+                    if not losers:
+                        continue
+                    items = getattr(profile, section)
+                    items[:] = [item for item in items if not (isinstance(item, dict) and item.get("name", "").casefold() in losers)]
+                    section_maps[section] = _index_by_name(items)
                     # Update the counts to reflect removals
-                    updates["dislikes_added"] -= len(indices_to_remove_from_dislikes)
-                    if updates["dislikes_added"] < 0:
-                        updates["dislikes_added"] = 0
+                    added_key = f"{section}_added"
+                    updates[added_key] = max(updates[added_key] - len(losers), 0)
 
             # Update metadata
-            profile.last_updated_source = f"trait_extraction_{traits[0].source}" if traits else "trait_extraction"
+            if any(updates.values()):
+                profile.last_updated_source = f"trait_extraction_{traits[0].source}" if traits else "trait_extraction"
             
             return updates
             
@@ -1,7 +1,9 @@
 """Celery app configuration."""
 
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 
+from app.core.async_runner import close_worker_loop, get_worker_loop
 from app.core.config import settings
 
 celery_app = Celery(
@@ -25,4 +27,26 @@ celery_app.conf.update(
     enable_utc=True,
     task_track_started=True,
     worker_hijack_root_logger=False,
-) 
\ No newline at end of file
+    worker_prefetch_multiplier=settings.CELERY_WORKER_PREFETCH_MULTIPLIER,
+) 
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs) -> None:
+    """Set up per-process state when a (forked) worker process starts."""
+    from app.db.session import engine, sync_engine
+    from app.services.memory import get_mem0_client
+
+    # Connections inherited from the parent must not be shared across processes;
+    # drop them so each child builds its own pool, then keep that pool for its lifetime
+    sync_engine.dispose(close=False)
+    engine.sync_engine.dispose(close=False)
+
+    get_worker_loop()
+    get_mem0_client()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs) -> None:
+    """Close the worker's event loop on process exit."""
+    close_worker_loop()
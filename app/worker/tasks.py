@@ -11,7 +11,8 @@ from app.worker.tasks.file_tasks import process_file, process_directory
 from app.worker.tasks.graphiti_tasks import (
     process_chat_message_graphiti,
     process_pending_messages_graphiti,
-    process_conversation_graphiti
+    process_conversation_graphiti,
+    flush_buffered_messages_graphiti
 )
 
 # Note: Any new tasks should be added to appropriate submodules in the app/worker/tasks/ directory
@@ -1,13 +1,15 @@
 import logging
+from datetime import datetime, timezone
 from typing import Dict, Optional, Any, List
 
+from app.core.async_runner import run_async
 from app.worker.celery_app import celery_app
 from app.db.session import get_db_session  # Use synchronous session
-from app.services.conversation.mem0_ingestion_sync import SyncChatMem0Ingestion
-from sqlalchemy import select
+from app.services.conversation.mem0_ingestion_sync import SyncChatMem0Ingestion, mem0_unclaimed
+from sqlalchemy import and_, case, select, update
+from sqlalchemy.orm import Session
 from app.db.models.chat_message import ChatMessage, MessageRole
 from app.db.models.conversation import Conversation
-import asyncio
 
 logger = logging.getLogger(__name__)
 
@@ -22,23 +24,22 @@ def process_chat_message(message_id: str) -> Dict[str, Any]:
     Returns:
         Processing results dictionary
     """
-    logger.info(f"TASK: Processing chat message {message_id}")
+    logger.info("TASK: Processing chat message %s", message_id)
     try:
         # Use fully synchronous implementation
         mem0_result = _process_message_sync(message_id)
-        logger.info(f"Processing message in mem0: {message_id} with result: {mem0_result}")
+        logger.info("Processing message in mem0: %s with result: %s", message_id, mem0_result)
         
-        # Trigger Graphiti processing asynchronously
-        from app.worker.tasks.graphiti_tasks import process_chat_message_graphiti
-        graphiti_task = process_chat_message_graphiti.delay(message_id)
+        # Buffer for Graphiti so messages arriving together are ingested as one batch
+        from app.worker.tasks.graphiti_tasks import enqueue_message_for_graphiti
         
-        # Add Graphiti task ID to result
-        mem0_result["graphiti_task_id"] = graphiti_task.id
+        # Add Graphiti task ID to result (None when an already scheduled flush covers it)
+        mem0_result["graphiti_task_id"] = enqueue_message_for_graphiti(message_id)
         
         return mem0_result
         
     except Exception as e:
-        logger.error(f"Error processing message {message_id}: {str(e)}")
+        logger.exception("Error processing message %s", message_id)
         return {
             "status": "error",
             "reason": str(e),
@@ -70,7 +71,7 @@ def process_pending_messages(limit: int = 50) -> Dict[str, Any]:
         return mem0_result
         
     except Exception as e:
-        logger.error(f"Error processing pending messages: {str(e)}")
+        logger.exception("Error processing pending messages")
         return {
             "status": "error",
             "reason": str(e)
@@ -101,7 +102,7 @@ def process_conversation(conversation_id: str) -> Dict[str, Any]:
         return mem0_result
         
     except Exception as e:
-        logger.error(f"Error processing conversation {conversation_id}: {str(e)}")
+        logger.exception("Error processing conversation %s", conversation_id)
         return {
             "status": "error",
             "reason": str(e),
@@ -192,7 +193,7 @@ def summarize_conversation(conversation_id: str) -> Dict[str, Any]:
         # Use fully synchronous implementation
         return _summarize_conversation_sync(conversation_id)
     except Exception as e:
-        logger.error(f"Error summarizing conversation {conversation_id}: {str(e)}")
+        logger.exception("Error summarizing conversation %s", conversation_id)
         return {
             "status": "error",
             "reason": str(e),
@@ -204,24 +205,49 @@ def _process_message_sync(message_id: str) -> Dict[str, Any]:
     """Synchronous implementation of process_chat_message."""
     # Use a synchronous DB session
     with get_db_session() as db:
+        claimed = False
         try:
-            # Get message
-            query = select(ChatMessage).where(ChatMessage.id == message_id)
-            result = db.execute(query)
-            message = result.scalars().first()
+            # Look up and claim the message in one round trip. The claim is a timestamp,
+            # committed before the Mem0 call so no row lock is held across it; a claim
+            # left by a worker that died mid-call goes stale and can be taken over.
+            # Rows that exist but can't be claimed keep their timestamp and are still
+            # returned, which tells them apart from unknown IDs.
+            claim_time = datetime.now(timezone.utc)
+            claimable = and_(ChatMessage.processed_in_mem0.is_(False), mem0_unclaimed(claim_time))
+            message = db.execute(
+                select(ChatMessage).from_statement(
+                    update(ChatMessage)
+                    .where(ChatMessage.id == message_id)
+                    .values(mem0_claimed_at=case((claimable, claim_time), else_=ChatMessage.mem0_claimed_at))
+                    .returning(ChatMessage)
+                )
+            ).scalars().first()
+            db.commit()
 
-            if not message:
+            if message is None:
                 return {
                     "status": "error",
                     "reason": "message_not_found",
                     "message_id": message_id
                 }
             
+            claimed = message.mem0_claimed_at == claim_time and not message.processed_in_mem0
+            if not claimed:
+                # Already processed, or claimed by another worker
+                return {
+                    "status": "skipped",
+                    "reason": "not_pending",
+                    "message_id": message_id
+                }
+            
             # Create service with synchronous ingestion
             ingestion_service = SyncChatMem0Ingestion(db)
             
             # Process message
             result = ingestion_service.process_message(message)
+            if result["status"] == "error":
+                _release_mem0_claim(db, message_id)
+                return result
             
             logger.info(f"Successfully processed message {message_id}")
             
@@ -229,10 +255,22 @@ def _process_message_sync(message_id: str) -> Dict[str, Any]:
             
         except Exception as e:
             db.rollback()
+            if claimed:
+                _release_mem0_claim(db, message_id)
             logger.error(f"Error in _process_message_sync: {str(e)}")
             raise
 
 
+def _release_mem0_claim(db: Session, message_id: str) -> None:
+    """Drop the claim on a message that failed, so the pending sweep retries it right away."""
+    db.execute(
+        update(ChatMessage)
+        .where(ChatMessage.id == message_id)
+        .values(mem0_claimed_at=None)
+    )
+    db.commit()
+
+
 def _process_pending_messages_sync(limit: int = 50) -> Dict[str, Any]:
     """Synchronous implementation of process_pending_messages."""
     # Use a synchronous DB session
@@ -307,14 +345,13 @@ def _summarize_conversation_sync(conversation_id: str) -> Dict[str, Any]:
                         # Re-raise to be caught by the outer try/except
                         raise
             
-            # Use asyncio.run() to execute the async function. 
-            # This creates a new event loop and closes it automatically.
+            # Run the async function on the worker's persistent event loop
             try:
-                result = asyncio.run(run_summarization())
+                result = run_async(run_summarization())
                 return result
             except Exception as e:
-                # Catch errors specifically from the asyncio.run() call
-                logger.error(f"Failed to summarize conversation {conversation_id} using asyncio.run: {str(e)}", exc_info=True)
+                # Catch errors specifically from the async execution
+                logger.error(f"Failed to summarize conversation {conversation_id} on the worker loop: {str(e)}", exc_info=True)
                 return {
                     "status": "error",
                     "reason": f"Async execution failed: {str(e)}",
@@ -1,10 +1,10 @@
 """Celery tasks for file processing."""
 
-import asyncio
 import logging
 from typing import Dict, List, Optional, Any
 
 from app.worker import celery_app
+from app.core.async_runner import run_async
 from app.services.ingestion import IngestionService
 from app.services.ingestion.file_service import FileService
 
@@ -42,14 +42,8 @@ def process_file(file_path: str, user_id: str, scope: str = "user", owner_id: st
         
         ingestion_service.file_service.get_file_metadata = get_metadata_with_original
     
-    # Process file
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
-    result = loop.run_until_complete(
+    # Process file on the worker's persistent event loop
+    result = run_async(
         ingestion_service.process_file(
             file_path, 
             user_id,
@@ -85,17 +79,9 @@ def process_directory(
     # We need to run our async code in a synchronous context
     ingestion_service = IngestionService()
     
-    # Run the async function using asyncio
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        # If there's no event loop in this thread, create one
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
-    # Process the directory
+    # Process the directory on the worker's persistent event loop
     try:
-        result = loop.run_until_complete(
+        result = run_async(
             ingestion_service.process_directory(
                 user_id,
                 directory, 
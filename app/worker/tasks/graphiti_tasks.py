@@ -4,11 +4,15 @@ import logging
 from typing import Dict, Optional, Any, List
 import asyncio
 
+import redis
+
+from app.core.config import settings
 from app.worker.celery_app import celery_app
 from app.db.session import get_db_session
-from app.services.conversation.graphiti_ingestion import ChatGraphitiIngestion
+from app.services.conversation.graphiti_ingestion import ChatGraphitiIngestion, MESSAGE_LOAD_OPTIONS
 from app.services.graph import GraphitiService
 from app.services.ingestion.entity_extraction_factory import get_entity_extractor
+from app.services.ingestion.extraction_cache import get_redis_client
 from sqlalchemy import select
 from app.db.models.chat_message import ChatMessage
 from app.db.models.conversation import Conversation
@@ -17,6 +21,55 @@ from app.services.extraction_pipeline import ExtractionPipeline
 
 logger = logging.getLogger(__name__)
 
+# Redis list of message IDs waiting for the next buffered flush, and the flag that
+# keeps at most one flush scheduled per window
+PENDING_MESSAGES_KEY = "graphiti:pending_message_ids"
+FLUSH_SCHEDULED_KEY = "graphiti:flush_scheduled"
+
+
+def enqueue_message_for_graphiti(message_id: str) -> Optional[str]:
+    """Buffer a chat message so it is ingested into Graphiti with its neighbours.
+    
+    Messages arriving within GRAPHITI_BUFFER_FLUSH_SECONDS of each other are
+    processed by one flush task, sharing batched extraction and graph writes.
+    Falls back to a single-message task if Redis is unavailable.
+    
+    Args:
+        message_id: ID of the message to process
+        
+    Returns:
+        ID of the task that will process the message, or None if an already
+        scheduled flush will pick it up
+    """
+    try:
+        client = get_redis_client()
+        client.rpush(PENDING_MESSAGES_KEY, message_id)
+        return _schedule_flush(client)
+    except redis.RedisError as e:
+        logger.warning(f"Could not buffer message {message_id} for Graphiti, processing it alone: {e}")
+        return process_chat_message_graphiti.delay(message_id).id
+
+
+def _schedule_flush(client: redis.Redis) -> Optional[str]:
+    """Schedule a flush of the buffer unless one is already pending.
+    
+    Returns:
+        ID of the scheduled flush task, or None if one was already scheduled
+    """
+    if not client.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=settings.GRAPHITI_BUFFER_FLUSH_SECONDS):
+        return None
+    task = flush_buffered_messages_graphiti.apply_async(countdown=settings.GRAPHITI_BUFFER_FLUSH_SECONDS)
+    return task.id
+
+
+def _requeue_buffered_messages(client: redis.Redis, message_ids: List[str]) -> None:
+    """Put a failed batch back in the buffer and make sure a later flush retries it."""
+    try:
+        client.rpush(PENDING_MESSAGES_KEY, *message_ids)
+        _schedule_flush(client)
+    except redis.RedisError as e:
+        logger.error(f"Could not requeue {len(message_ids)} messages for Graphiti, they stay unprocessed: {message_ids}: {e}")
+
 
 @celery_app.task(name="app.worker.tasks.graphiti_tasks.process_chat_message_graphiti")
 def process_chat_message_graphiti(message_id: str) -> Dict[str, Any]:
@@ -61,6 +114,47 @@ def process_pending_messages_graphiti(limit: int = 50) -> Dict[str, Any]:
         }
 
 
+@celery_app.task(name="app.worker.tasks.graphiti_tasks.flush_buffered_messages_graphiti")
+def flush_buffered_messages_graphiti() -> Dict[str, Any]:
+    """Process the chat messages buffered by enqueue_message_for_graphiti.
+    
+    Drains the buffer GRAPHITI_BUFFER_BATCH_SIZE messages at a time. A batch
+    that fails as a whole is pushed back onto the buffer for a later flush.
+    
+    Returns:
+        Processing results dictionary, summed over all drained batches
+    """
+    totals = {"total": 0, "success": 0, "skipped": 0, "errors": 0}
+    try:
+        client = get_redis_client()
+        # Messages buffered from here on schedule the next flush
+        client.delete(FLUSH_SCHEDULED_KEY)
+        while True:
+            message_ids = client.lpop(PENDING_MESSAGES_KEY, settings.GRAPHITI_BUFFER_BATCH_SIZE)
+            if not message_ids:
+                return totals
+            
+            message_ids = [message_id.decode() for message_id in message_ids]
+            try:
+                batch_result = _process_messages_graphiti_sync(message_ids)
+            except Exception:
+                _requeue_buffered_messages(client, message_ids)
+                raise
+            if batch_result.get("status") == "error":
+                # The batch was rolled back, so none of it is flagged as processed yet
+                _requeue_buffered_messages(client, message_ids)
+                return {"status": "error", "reason": batch_result.get("reason"), **totals}
+            for key in totals:
+                totals[key] += batch_result.get(key, 0)
+    except Exception as e:
+        logger.error(f"Error flushing buffered messages for Graphiti: {str(e)}", exc_info=True)
+        return {
+            "status": "error",
+            "reason": str(e),
+            **totals
+        }
+
+
 @celery_app.task(name="app.worker.tasks.graphiti_tasks.process_conversation_graphiti")
 def process_conversation_graphiti(conversation_id: str) -> Dict[str, Any]:
     """Process all messages in a conversation for Graphiti.
@@ -91,9 +185,10 @@ def _process_message_graphiti_sync(message_id: str) -> Dict[str, Any]:
             # Get the message (sync query okay)
             # Important: Fetch the message here, *not* just check for processed status,
             # as the ingestion service needs the message object.
-            query = select(ChatMessage).where(ChatMessage.id == message_id)
+            # Conversation, user and profile come back in the same round trip
+            query = select(ChatMessage).options(*MESSAGE_LOAD_OPTIONS).where(ChatMessage.id == message_id)
             result = db.execute(query)
-            message = result.scalars().first()
+            message = result.unique().scalars().first()
             
             if not message:
                 logger.warning(f"GRAPHITI_TASK: Message {message_id} not found when task started.")
@@ -153,6 +248,16 @@ def _process_pending_messages_graphiti_sync(limit: int = 50) -> Dict[str, Any]:
             raise
 
 
+def _process_messages_graphiti_sync(message_ids: List[str]) -> Dict[str, Any]:
+    """Synchronous implementation of flush_buffered_messages_graphiti for one batch."""
+    with get_db_session() as db:
+        graphiti_service = GraphitiService()
+        entity_extractor = get_entity_extractor()
+        ingestion_service = ChatGraphitiIngestion(db, graphiti_service, entity_extractor)
+        
+        return ingestion_service.process_messages(message_ids)
+
+
 def _process_conversation_graphiti_sync(conversation_id: str) -> Dict[str, Any]:
     """Synchronous implementation of process_conversation_graphiti."""
     # Use a synchronous DB session
@@ -0,0 +1,83 @@
+"""Tests for the semantic context cache."""
+
+from unittest.mock import patch
+
+import pytest
+
+from app.services.agent.context_cache import ResponseCache, SemanticContextCache
+
+
+class StubEmbeddings:
+    """Return preset vectors per query."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def aembed_query(self, text):
+        return self.vectors[text]
+
+
+@pytest.fixture
+def cache():
+    return SemanticContextCache(
+        embeddings=StubEmbeddings({
+            "where do I work?": [1.0, 0.0],
+            "where do i work": [0.99, 0.05],
+            "what do I like?": [0.0, 1.0],
+        }),
+        similarity_threshold=0.92,
+        ttl_seconds=60,
+        max_entries_per_user=2,
+    )
+
+
+@pytest.mark.asyncio
+async def test_similar_query_hits_and_unrelated_query_misses(cache):
+    embedding = await cache.embed("where do I work?")
+    cache.store("user-1", "c-1", "where do I work?", embedding, "works at Acme", 0)
+
+    hit = cache.lookup("user-1", "c-1", await cache.embed("where do i work"), 0)
+    assert hit is not None
+    assert hit[0] == "works at Acme"
+
+    assert cache.lookup("user-1", "c-1", await cache.embed("what do I like?"), 0) is None
+    assert cache.lookup("user-2", "c-1", embedding, 0) is None
+    assert cache.lookup("user-1", "c-2", embedding, 0) is None
+
+
+@pytest.mark.asyncio
+async def test_entries_from_an_older_memory_version_are_dropped(cache):
+    embedding = await cache.embed("where do I work?")
+    cache.store("user-1", "c-1", "where do I work?", embedding, "works at Acme", 0)
+
+    assert cache.lookup("user-1", "c-1", embedding, 1) is None
+    assert cache.lookup("user-1", "c-1", embedding, 0) is None
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl(cache):
+    embedding = await cache.embed("where do I work?")
+    with patch("app.services.agent.context_cache.time.time", return_value=1000.0):
+        cache.store("user-1", "c-1", "where do I work?", embedding, "works at Acme", 0)
+
+    with patch("app.services.agent.context_cache.time.time", return_value=1061.0):
+        assert cache.lookup("user-1", "c-1", embedding, 0) is None
+
+
+@pytest.mark.asyncio
+async def test_oldest_entry_is_evicted_beyond_capacity(cache):
+    for query in ("where do I work?", "what do I like?"):
+        cache.store("user-1", "c-1", query, await cache.embed(query), query, 0)
+    cache.store("user-1", "c-1", "third", [0.6, 0.8], "third", 0)
+
+    assert cache.lookup("user-1", "c-1", await cache.embed("where do I work?"), 0) is None
+    assert cache.lookup("user-1", "c-1", await cache.embed("what do I like?"), 0)[0] == "what do I like?"
+
+
+def test_response_cache_ignores_entries_from_an_older_memory_version():
+    cache = ResponseCache(maxsize=8, ttl_seconds=60)
+    cache.put("user-1", "c-1", "Where do I work?", 3, "Acme")
+
+    assert cache.get("user-1", "c-1", "where do i work?", 3) == "Acme"
+    assert cache.get("user-1", "c-1", "where do i work?", 4) is None
+    assert cache.get("user-1", "c-2", "where do i work?", 3) is None
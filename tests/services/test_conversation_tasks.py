@@ -0,0 +1,68 @@
+"""Tests for claiming single chat messages for Mem0 ingestion."""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from app.worker.tasks import conversation_tasks
+
+CLAIM_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def returned_row(row):
+    result = MagicMock()
+    result.scalars.return_value.first.return_value = row
+    return result
+
+
+def run_with_db(db, ingestion=None):
+    session = MagicMock()
+    session.__enter__.return_value = db
+    with patch.object(conversation_tasks, "get_db_session", return_value=session), \
+         patch.object(conversation_tasks, "datetime", MagicMock(now=MagicMock(return_value=CLAIM_TIME))), \
+         patch.object(conversation_tasks, "SyncChatMem0Ingestion", return_value=ingestion or MagicMock()):
+        return conversation_tasks._process_message_sync("m1")
+
+
+def test_unknown_message_is_not_found():
+    """An ID with no row is an error, not a skip."""
+    db = MagicMock()
+    db.execute.return_value = returned_row(None)
+
+    result = run_with_db(db)
+
+    assert result == {"status": "error", "reason": "message_not_found", "message_id": "m1"}
+    db.execute.assert_called_once()
+
+
+def test_message_claimed_elsewhere_is_skipped():
+    """An existing row that another worker holds keeps its claim and is skipped."""
+    db = MagicMock()
+    db.execute.return_value = returned_row(SimpleNamespace(
+        id="m1", processed_in_mem0=False, mem0_claimed_at=datetime(2025, 12, 31, tzinfo=timezone.utc)
+    ))
+
+    result = run_with_db(db)
+
+    assert result == {"status": "skipped", "reason": "not_pending", "message_id": "m1"}
+    db.execute.assert_called_once()
+
+
+def test_claim_is_committed_before_mem0_and_released_on_failure():
+    """The claim is committed before the Mem0 call and dropped if ingestion fails."""
+    message = SimpleNamespace(id="m1", processed_in_mem0=False, mem0_claimed_at=CLAIM_TIME)
+    db = MagicMock()
+    db.execute.return_value = returned_row(message)
+    ingestion = MagicMock()
+
+    def process_message(claimed_message):
+        assert claimed_message is message and db.commit.call_count == 1
+        return {"status": "error", "reason": "mem0 down", "message_id": "m1"}
+
+    ingestion.process_message.side_effect = process_message
+
+    result = run_with_db(db, ingestion)
+
+    assert result["status"] == "error"
+    assert db.execute.call_count == 2
+    assert db.commit.call_count == 2
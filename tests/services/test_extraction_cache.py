@@ -0,0 +1,114 @@
+"""Tests for the Redis-backed entity extraction cache."""
+
+from unittest.mock import MagicMock
+
+import pytest
+import redis
+
+from app.services.ingestion.entity_extraction_gemini import EntityExtractor
+from app.services.ingestion.extraction_cache import CachedEntityExtractor
+
+
+class FakeRedis:
+    """Just enough of redis.Redis for the cache: mget and a non-transactional pipeline."""
+
+    def __init__(self):
+        self.store = {}
+
+    def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        fake = self
+        pipe = MagicMock()
+        pipe.set.side_effect = lambda key, value, ex=None: fake.store.__setitem__(key, value.encode())
+        return pipe
+
+
+def result_for(text):
+    return {"entities": [{"text": text}], "relationships": [], "keywords": []}
+
+
+@pytest.fixture
+def extractor():
+    extractor = MagicMock(model_name="gemini-test")
+    extractor.process_document.side_effect = lambda content, chunk_boundaries=None: result_for(content)
+    extractor.process_documents_batch.side_effect = lambda docs: {doc_id: result_for(text) for doc_id, text in docs}
+    return extractor
+
+
+def test_repeat_message_skips_the_extractor(extractor):
+    """Messages that differ only in whitespace share one extraction."""
+    cached = CachedEntityExtractor(extractor, redis_client=FakeRedis())
+
+    first = cached.process_document("Thanks, sounds good")
+    second = cached.process_document("  Thanks,   sounds good ")
+
+    assert second == first
+    assert extractor.process_document.call_count == 1
+
+
+def test_different_casing_is_extracted_separately(extractor):
+    """Entity names keep the casing of the message they were extracted from."""
+    cached = CachedEntityExtractor(extractor, redis_client=FakeRedis())
+
+    cached.process_document("i met bob at acme")
+
+    assert cached.process_document("I met Bob at Acme") == result_for("I met Bob at Acme")
+    assert extractor.process_document.call_count == 2
+
+
+def test_failed_extractions_are_not_cached(extractor):
+    """A result built after a Gemini error is returned but extracted again next time."""
+    extractor.process_document.side_effect = [
+        {**result_for("I work at Acme"), "extraction_failed": True},
+        result_for("I work at Acme"),
+    ]
+    extractor.process_documents_batch.side_effect = lambda docs: {
+        doc_id: {**result_for(text), "extraction_failed": True} for doc_id, text in docs
+    }
+    cached = CachedEntityExtractor(extractor, redis_client=FakeRedis())
+
+    assert cached.process_document("I work at Acme")["extraction_failed"]
+    assert cached.process_document("I work at Acme") == result_for("I work at Acme")
+    cached.process_documents_batch([("m1", "I like tea")])
+    cached.process_documents_batch([("m2", "I like tea")])
+
+    assert extractor.process_document.call_count == 2
+    assert extractor.process_documents_batch.call_count == 2
+
+
+def test_batch_only_sends_misses(extractor):
+    """A batch sends only uncached documents to the extractor and caches what comes back."""
+    cached = CachedEntityExtractor(extractor, redis_client=FakeRedis())
+    cached.process_document("ok")
+
+    results = cached.process_documents_batch([("m1", " ok"), ("m2", "I work at Acme")])
+
+    extractor.process_documents_batch.assert_called_once_with([("m2", "I work at Acme")])
+    assert results == {"m1": result_for("ok"), "m2": result_for("I work at Acme")}
+    assert cached.process_documents_batch([("m3", "I  work at Acme")]) == {"m3": result_for("I work at Acme")}
+
+
+def test_redis_errors_fall_through_to_the_extractor(extractor):
+    """An unavailable Redis is treated as a miss rather than failing extraction."""
+    broken = MagicMock()
+    broken.mget.side_effect = redis.ConnectionError("down")
+    broken.pipeline.return_value.execute.side_effect = redis.ConnectionError("down")
+    cached = CachedEntityExtractor(extractor, redis_client=broken)
+
+    assert cached.process_document("hello") == result_for("hello")
+
+
+def test_extractor_flags_results_after_a_gemini_error():
+    """process_document marks results it had to build without a working Gemini call."""
+    gemini = EntityExtractor.__new__(EntityExtractor)
+    gemini._initialized = True
+    gemini.min_confidence = 0.6
+    gemini._model = MagicMock()
+    gemini._model.generate_content.side_effect = RuntimeError("503 unavailable")
+
+    result = gemini.process_document("I work at Acme")
+
+    assert result["extraction_failed"]
+    assert result["entities"] == [] and result["relationships"] == []
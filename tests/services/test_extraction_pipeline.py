@@ -0,0 +1,93 @@
+"""Tests for storing extracted data in Graphiti through the extraction pipeline."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services.extraction_pipeline import ExtractionPipeline
+
+
+def entity(text, entity_type="Person", confidence=0.9):
+    return {"text": text, "entity_type": entity_type, "confidence": confidence}
+
+
+@pytest.fixture
+def graphiti():
+    graphiti = MagicMock()
+    graphiti.find_entities = AsyncMock(return_value={("Alice", "Person"): {"id": "existing-alice"}})
+    graphiti.create_entities = AsyncMock(
+        side_effect=lambda rows, **kwargs: [f"new-{properties['name']}" for _, properties in rows]
+    )
+    graphiti.relationship_exists_batch = AsyncMock(return_value=[True, False])
+    graphiti.create_relationships = AsyncMock(side_effect=lambda rows, **kwargs: [f"rel-{i}" for i in range(len(rows))])
+    return graphiti
+
+
+@pytest.mark.asyncio
+async def test_graph_calls_are_batched(graphiti):
+    """Entities and relationships are each looked up and written in a single graph call."""
+    pipeline = ExtractionPipeline(entity_extractor=MagicMock(), graphiti_service=graphiti)
+    extraction = {
+        "entities": [entity("Alice"), entity("Acme", "Organization"), entity("Alice"), entity("Bob", confidence=0.1),
+                     entity("Acme", "Company", confidence=0.7)],
+        "relationships": [
+            {"source": "Alice", "target": "Acme", "relationship": "WORKS_FOR", "confidence": 0.9, "fact": "Alice works at Acme"},
+            {"source": "Acme", "target": "Alice", "relationship": "HAS_MEMBER", "confidence": 0.9},
+            {"source": "Alice", "target": "Bob", "relationship": "RELATED_TO", "confidence": 0.9},
+        ],
+    }
+
+    result = await pipeline.process_extracted_data(extraction, "user-1", "m1", scope="user", owner_id="user-1", source="chat")
+
+    graphiti.find_entities.assert_awaited_once_with(
+        [("Alice", "Person"), ("Acme", "Organization")], scope="user", owner_id="user-1"
+    )
+    assert [e["name"] for e in result["entities"]] == ["Acme"]
+
+    (checked,), kwargs = graphiti.relationship_exists_batch.await_args
+    assert checked == [
+        ("existing-alice", "new-Acme", "WORKS_FOR", "Alice works at Acme"),
+        ("new-Acme", "existing-alice", "HAS_MEMBER", "Acme has member Alice"),
+    ]
+    assert [r["type"] for r in result["relationships"]] == ["HAS_MEMBER"]
+    graphiti.create_entities.assert_awaited_once()
+    (created,), _ = graphiti.create_relationships.await_args
+    assert [(source, target, rel_type) for source, target, rel_type, _ in created] == [
+        ("new-Acme", "existing-alice", "HAS_MEMBER")
+    ]
+    graphiti.session.assert_called_once_with()
+
+
+def test_run_cypher_reuses_the_open_session():
+    """Queries inside GraphitiService.session() share one Neo4j session."""
+    from app.services.graph import GraphitiService
+
+    service = GraphitiService.__new__(GraphitiService)
+    service.driver = MagicMock()
+    shared = service.driver.session.return_value.__enter__.return_value
+
+    with service.session():
+        service._run_cypher("RETURN 1", {})
+        with service.session():
+            service._run_cypher("RETURN 2", {})
+
+    assert service.driver.session.call_count == 1
+    assert shared.run.call_count == 2
+
+    service._run_cypher("RETURN 3", {})
+    assert service.driver.session.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_resolved_entities_skip_the_lookup_for_later_messages(graphiti):
+    """Entities found or created for one message are not looked up again for the next."""
+    pipeline = ExtractionPipeline(entity_extractor=MagicMock(), graphiti_service=graphiti)
+    extraction = {"entities": [entity("Alice"), entity("Acme", "Organization")], "relationships": []}
+
+    await pipeline.process_extracted_data(extraction, "user-1", "m1", scope="user", owner_id="user-1", source="chat")
+    second = {"entities": [entity("Alice"), entity("Acme", "Organization"), entity("Bob")], "relationships": []}
+    result = await pipeline.process_extracted_data(second, "user-1", "m2", scope="user", owner_id="user-1", source="chat")
+
+    (looked_up,), _ = graphiti.find_entities.await_args
+    assert looked_up == [("Bob", "Person")]
+    assert [e["name"] for e in result["entities"]] == ["Bob"]
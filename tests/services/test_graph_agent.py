@@ -0,0 +1,385 @@
+"""Tests for the LangGraph twin agent."""
+
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services.agent.context_cache import ResponseCache, SemanticContextCache
+from app.services.agent.graph_agent import TwinAgent, AgentState, MEM0_PREVIEW_CHARS, _normalize_mem0_hit
+
+
+class FakeEmbeddings:
+    """Deterministic embeddings: identical text gives identical vectors."""
+
+    async def aembed_query(self, text):
+        return [float(ord(c)) for c in text.lower().ljust(32)[:32]]
+
+
+@pytest.fixture
+def agent():
+    """Create a TwinAgent with mocked external services."""
+    mem0_service = MagicMock()
+    mem0_service.search = AsyncMock(return_value=[])
+    graphiti_service = MagicMock()
+    graphiti_service.search = AsyncMock(return_value=[])
+    llm = MagicMock()
+    llm.ainvoke = AsyncMock(return_value=AIMessage(content="Hello from the twin"))
+    with patch("app.services.agent.graph_agent._get_memory_service", return_value=mem0_service), \
+         patch("app.services.agent.graph_agent._get_graphiti_service", return_value=graphiti_service), \
+         patch("app.services.agent.graph_agent._get_llm", return_value=llm), \
+         patch("app.services.agent.graph_agent.get_context_cache",
+               return_value=SemanticContextCache(embeddings=FakeEmbeddings())), \
+         patch("app.services.agent.graph_agent.get_response_cache", return_value=ResponseCache()), \
+         patch("app.services.agent.graph_agent.get_memory_version", AsyncMock(return_value=0)):
+        yield TwinAgent(db_session=MagicMock())
+
+
+@pytest.mark.asyncio
+async def test_merge_context_marks_truncated_mem0_content(agent):
+    """Truncated Mem0 previews get an ellipsis, short ones are used as-is."""
+    state = AgentState(
+        user_id="user-1",
+        messages=[HumanMessage(content="What do I like?")],
+        mem0_results=[
+            {"content": "x" * MEM0_PREVIEW_CHARS, "content_truncated": True, "similarity": 0.9, "metadata": {}},
+            {"content": "I like hiking", "similarity": 0.8, "metadata": {"source": "chat"}},
+        ],
+    ).to_dict()
+
+    result = await agent._merge_context(state)
+
+    assert "x" * MEM0_PREVIEW_CHARS + "..." in result["merged_context"]
+    assert "I like hiking (relevance: 0.80, source: chat)" in result["merged_context"]
+
+
+@pytest.mark.asyncio
+async def test_empty_retrieval_leaves_context_out_of_prompt(agent):
+    """With nothing retrieved the prompt is just the static instructions."""
+    state = AgentState(
+        user_id="user-1",
+        messages=[HumanMessage(content="What do I like?")],
+        graphiti_results={"entities": [], "graph": []},
+    ).to_dict()
+
+    result = await agent._merge_context(state)
+    assert result == {"merged_context": ""}
+
+    await agent._generate_response({**state, **result})
+    messages = agent.llm.ainvoke.await_args.args[0]
+    assert messages[0].content == TwinAgent._SYSTEM_PREFIX.rstrip()
+
+
+@pytest.mark.asyncio
+async def test_chat_skips_retrieval_for_greeting(agent):
+    """Greetings go straight to the LLM without touching Mem0 or Graphiti."""
+    response = await agent.chat(user_message="Thanks!", user_id="user-1")
+
+    assert response == "Hello from the twin"
+    agent.mem0_service.search.assert_not_awaited()
+    agent.graphiti_service.search.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_chat_retrieves_for_regular_question(agent):
+    """Informational questions still go through both retrievers."""
+    response = await agent.chat(user_message="What projects am I working on?", user_id="user-1")
+
+    assert response == "Hello from the twin"
+    agent.mem0_service.search.assert_awaited_once()
+    agent.graphiti_service.search.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_slow_retriever_is_dropped_after_deadline(agent):
+    """A retriever that misses the deadline contributes no results but doesn't fail the turn."""
+    async def slow_search(**kwargs):
+        await asyncio.sleep(10)
+        return [{"fact": "never returned"}]
+
+    agent.graphiti_service.search = slow_search
+    state = AgentState(user_id="user-1", messages=[HumanMessage(content="Where do I work?")]).to_dict()
+
+    with patch("app.services.agent.graph_agent.settings.AGENT_RETRIEVAL_TIMEOUT_SECONDS", 0.01):
+        result = await agent._retrieve_from_graphiti(state)
+
+    assert result["graphiti_results"] == {"graph": []}
+    assert "error" not in result
+    assert result["retrieval_degraded"]
+
+
+@pytest.mark.asyncio
+async def test_mem0_error_hits_are_dropped_and_mark_retrieval_degraded(agent):
+    """MemoryService's {"error": ...} hits are a failure, not an empty memory."""
+    agent.mem0_service.search = AsyncMock(return_value=[{"error": "mem0 timed out"}])
+    state = AgentState(user_id="user-1", messages=[HumanMessage(content="Where do I work?")]).to_dict()
+
+    result = await agent._retrieve_from_mem0(state)
+
+    assert result["mem0_results"] == []
+    assert result["retrieval_degraded"]
+
+
+@pytest.mark.asyncio
+async def test_degraded_context_is_not_cached(agent):
+    """A turn whose Mem0 search failed retrieves again for the next similar question."""
+    agent.mem0_service.search = AsyncMock(return_value=[{"error": "mem0 timed out"}])
+    agent.response_cache = None
+
+    await agent.chat(user_message="Where do I work?", user_id="user-1")
+    await agent.chat(user_message="Where do I work?", user_id="user-1")
+
+    assert agent.mem0_service.search.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_retrieve_context_runs_sources_concurrently(agent):
+    """Mem0 and Graphiti are queried side by side, not one after the other."""
+    async def slow_mem0(**kwargs):
+        await asyncio.sleep(0.2)
+        return [{"content": "I like hiking", "score": 0.9}]
+
+    async def slow_graphiti(**kwargs):
+        await asyncio.sleep(0.2)
+        return [{"fact": "User works at Acme"}]
+
+    agent.mem0_service.search = slow_mem0
+    agent.graphiti_service.search = slow_graphiti
+    state = AgentState(user_id="user-1", messages=[HumanMessage(content="Where do I work?")]).to_dict()
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    result = await agent._retrieve_context(state)
+    elapsed = loop.time() - started
+
+    assert elapsed < 0.35
+    assert result["mem0_results"][0]["content"] == "I like hiking"
+    assert result["graphiti_results"] == {"graph": [{"fact": "User works at Acme"}]}
+    assert "error" not in result
+
+
+def test_extract_last_user_prefers_state_field():
+    """The precomputed field wins; the message scan is only a fallback."""
+    messages = [HumanMessage(content="first"), AIMessage(content="reply"), HumanMessage(content="second")]
+
+    assert TwinAgent._extract_last_user({"messages": messages, "last_user_message": "cached"}) == "cached"
+    assert TwinAgent._extract_last_user({"messages": messages}) == "second"
+    assert TwinAgent._extract_last_user({"messages": [AIMessage(content="reply")]}) is None
+
+
+@pytest.mark.asyncio
+async def test_repeated_question_is_served_from_context_cache(agent):
+    """Asking nearly the same question twice only hits the retrievers once."""
+    await agent.chat(user_message="What projects am I working on?", user_id="user-1")
+    await agent.chat(user_message="what projects am I working on", user_id="user-1")
+
+    agent.mem0_service.search.assert_awaited_once()
+    agent.graphiti_service.search.assert_awaited_once()
+    assert agent.llm.ainvoke.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_agents_share_one_compiled_workflow(agent):
+    """The graph is compiled once; each turn runs against its own agent."""
+    other = TwinAgent(db_session=MagicMock())
+    other.llm = MagicMock()
+    other.llm.ainvoke = AsyncMock(return_value=AIMessage(content="Hello from the other twin"))
+
+    assert await agent.chat(user_message="Hi", user_id="user-1") == "Hello from the twin"
+    assert await other.chat(user_message="Hi", user_id="user-2") == "Hello from the other twin"
+    assert agent._get_compiled_workflow() is other._get_compiled_workflow()
+
+
+@pytest.mark.asyncio
+async def test_mem0_results_keep_only_fields_used_for_context(agent):
+    """Mem0 hits are reduced to the fields _merge_context reads."""
+    agent.mem0_service.search = AsyncMock(return_value=[
+        {"memory": "I like hiking", "score": 0.8, "metadata": None, "embedding": [0.1] * 8, "id": "m1"},
+    ])
+    state = AgentState(user_id="user-1", messages=[HumanMessage(content="What do I like?")]).to_dict()
+
+    result = await agent._retrieve_from_mem0(state)
+
+    assert result["mem0_results"] == [{
+        "content": "I like hiking",
+        "similarity": 0.8,
+        "metadata": {},
+        "categories": None,
+        "content_truncated": False,
+    }]
+
+
+@pytest.mark.asyncio
+async def test_exact_repeat_is_served_from_response_cache(agent):
+    """An exact repeat (modulo case and spacing) skips the graph and the LLM."""
+    first = await agent.chat(user_message="Where do I work?", user_id="user-1")
+    second = await agent.chat(user_message="  where do I   WORK? ", user_id="user-1")
+    other_user = await agent.chat(user_message="Where do I work?", user_id="user-2")
+
+    assert first == second == other_user == "Hello from the twin"
+    assert agent.llm.ainvoke.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_response_cache_is_per_conversation_and_memory_version(agent):
+    """A repeat in another conversation, or after new memories were ingested, runs the graph again."""
+    await agent.chat(user_message="Where do I work?", user_id="user-1", conversation_id="c-1")
+    await agent.chat(user_message="Where do I work?", user_id="user-1", conversation_id="c-2")
+    with patch("app.services.agent.graph_agent.get_memory_version", AsyncMock(return_value=1)):
+        await agent.chat(user_message="Where do I work?", user_id="user-1", conversation_id="c-1")
+
+    assert agent.llm.ainvoke.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_turns_are_not_cached(agent):
+    """Error replies are never served from the response cache."""
+    agent.llm.ainvoke = AsyncMock(side_effect=[RuntimeError("boom"), AIMessage(content="Recovered")])
+
+    first = await agent.chat(user_message="Where do I work?", user_id="user-1")
+    second = await agent.chat(user_message="Where do I work?", user_id="user-1")
+
+    assert first.startswith("I encountered an error")
+    assert second == "Recovered"
+
+
+@pytest.mark.asyncio
+async def test_replies_from_degraded_retrieval_are_not_cached(agent):
+    """A reply generated while Mem0 was failing is not served to the next exact repeat."""
+    agent.mem0_service.search = AsyncMock(return_value=[{"error": "mem0 timed out"}])
+
+    await agent.chat(user_message="Where do I work?", user_id="user-1")
+    await agent.chat(user_message="Where do I work?", user_id="user-1")
+
+    assert agent.llm.ainvoke.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_system_prompt_starts_with_stable_prefix(agent):
+    """The static instructions lead the system prompt, followed by the turn's context."""
+    state = AgentState(
+        user_id="user-1",
+        messages=[HumanMessage(content="Where do I work?")],
+        merged_context="Relevant context:\n\nUser works at Acme",
+    ).to_dict()
+
+    await agent._generate_response(state)
+
+    messages = agent.llm.ainvoke.await_args.args[0]
+    assert messages[0].content == TwinAgent._SYSTEM_PREFIX + "Relevant context:\n\nUser works at Acme"
+    assert agent.llm.ainvoke.await_args.kwargs["extra_body"] == {"prompt_cache_key": "twin:user-1"}
+
+
+def test_normalize_mem0_hit_fallbacks():
+    """Content and similarity fall back through the shapes Mem0 has returned."""
+    assert _normalize_mem0_hit({"message": {"content": "from dict"}})["content"] == "from dict"
+    assert _normalize_mem0_hit({"content": "", "message": "from str"})["content"] == "from str"
+    assert _normalize_mem0_hit({"memory": "m", "similarity": None, "score": 0.3})["similarity"] == 0.3
+    assert _normalize_mem0_hit({})["similarity"] == 0.5
+    assert _normalize_mem0_hit({})["content"] == ""
+
+
+@pytest.mark.asyncio
+async def test_failed_retrieval_skips_the_llm_call(agent):
+    """When every context source fails the turn ends before the paid LLM call."""
+    agent.mem0_service.search = AsyncMock(side_effect=RuntimeError("mem0 down"))
+    agent.graphiti_service.search = AsyncMock(side_effect=RuntimeError("neo4j down"))
+
+    response = await agent.chat(user_message="Where do I work?", user_id="user-1")
+
+    assert response == ("I encountered an error: Mem0 retrieval error: mem0 down; "
+                        "Graphiti retrieval error: neo4j down")
+    agent.llm.ainvoke.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_one_failed_source_keeps_the_other_results(agent):
+    """A Graphiti failure doesn't throw away good Mem0 results."""
+    agent.mem0_service.search = AsyncMock(return_value=[{"memory": "User works at Acme", "score": 0.9}])
+    agent.graphiti_service.search = AsyncMock(side_effect=RuntimeError("neo4j down"))
+
+    response = await agent.chat(user_message="Where do I work?", user_id="user-1")
+
+    assert response == "Hello from the twin"
+    assert "User works at Acme" in agent.llm.ainvoke.await_args.args[0][0].content
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_yields_llm_tokens(agent):
+    """Streamed turns forward tokens as the LLM produces them."""
+    async def astream(messages, **kwargs):
+        for token in ["You ", "work ", "at Acme"]:
+            yield AIMessage(content=token)
+
+    agent.llm.astream = astream
+
+    chunks = [chunk async for chunk in agent.chat_stream(user_message="Where do I work?", user_id="user-1")]
+
+    assert chunks == ["You ", "work ", "at Acme"]
+    agent.llm.ainvoke.assert_not_awaited()
+    # The full reply is cached, so a non-streamed repeat gets the same answer
+    assert await agent.chat(user_message="Where do I work?", user_id="user-1") == "You work at Acme"
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_yields_whole_reply_when_llm_is_skipped(agent):
+    """Cache hits and errors come through as a single chunk."""
+    agent.response_cache.put("user-1", None, "Where do I work?", 0, "At Acme")
+
+    chunks = [chunk async for chunk in agent.chat_stream(user_message="Where do I work?", user_id="user-1")]
+
+    assert chunks == ["At Acme"]
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_raises_when_llm_fails_after_tokens(agent):
+    """A turn that breaks mid-stream surfaces as an error, not a truncated reply."""
+    async def astream(messages, **kwargs):
+        yield AIMessage(content="You ")
+        raise RuntimeError("connection reset")
+
+    agent.llm.astream = astream
+
+    chunks = []
+    with pytest.raises(RuntimeError, match="connection reset"):
+        async for chunk in agent.chat_stream(user_message="Where do I work?", user_id="user-1"):
+            chunks.append(chunk)
+
+    assert chunks == ["You "]
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_questions_share_one_turn(agent):
+    """A question asked again while the first is still running waits for that answer."""
+    async def slow_llm(messages, **kwargs):
+        await asyncio.sleep(0.05)
+        return AIMessage(content="You work at Acme")
+
+    agent.llm.ainvoke = AsyncMock(side_effect=slow_llm)
+
+    first, second = await asyncio.gather(
+        agent.chat(user_message="Where do I work?", user_id="user-1"),
+        agent.chat(user_message="where do I work?", user_id="user-1"),
+    )
+
+    assert first == second == "You work at Acme"
+    assert agent.llm.ainvoke.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_same_question_in_another_conversation_runs_its_own_turn(agent):
+    """Concurrent identical questions from different conversations are answered separately."""
+    async def slow_llm(messages, **kwargs):
+        await asyncio.sleep(0.05)
+        return AIMessage(content="You work at Acme")
+
+    agent.llm.ainvoke = AsyncMock(side_effect=slow_llm)
+
+    await asyncio.gather(
+        agent.chat(user_message="Where do I work?", user_id="user-1", conversation_id="c-1"),
+        agent.chat(user_message="Where do I work?", user_id="user-1", conversation_id="c-2"),
+    )
+
+    assert agent.llm.ainvoke.await_count == 2
@@ -0,0 +1,224 @@
+"""Tests for batched chat message ingestion into Graphiti."""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy.sql.dml import Update
+
+from app.db.models.chat_message import MessageRole
+from app.services.conversation.graphiti_ingestion import ChatGraphitiIngestion, is_extractable
+
+
+def make_message(message_id, role=MessageRole.USER, content="I started learning Rust at Acme"):
+    return SimpleNamespace(
+        id=message_id, role=role, content=content, user_id="user-1", conversation_id="c-1",
+        conversation=SimpleNamespace(id="c-1", title="Chat"), user=SimpleNamespace(id="user-1", profile=None),
+        processed_in_graphiti=False, is_stored_in_graphiti=False, created_at=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+def scalars_result(rows):
+    result = MagicMock()
+    result.unique.return_value.scalars.return_value.all.return_value = rows
+    return result
+
+
+def bulk_flag_updates(db):
+    """Map is_stored_in_graphiti -> message ids for each bulk UPDATE issued on the session."""
+    updates = {}
+    for call in db.execute.call_args_list:
+        statement = call.args[0]
+        if isinstance(statement, Update) and "id_1" in statement.compile().params:
+            params = statement.compile().params
+            assert params["processed_in_graphiti"] is True
+            updates[params["is_stored_in_graphiti"]] = params["id_1"]
+    return updates
+
+
+@pytest.fixture
+def service():
+    with patch("app.services.conversation.graphiti_ingestion.TraitExtractionService"), \
+         patch("app.services.conversation.graphiti_ingestion.ExtractionPipeline"), \
+         patch("app.services.conversation.graphiti_ingestion.bump_memory_version"):
+        yield ChatGraphitiIngestion(
+            db_session=MagicMock(), graphiti_service=MagicMock(), entity_extractor=MagicMock(), max_concurrency=2
+        )
+
+
+def test_pending_messages_run_concurrently_up_to_the_limit(service):
+    """Pipeline calls overlap, but never more than max_concurrency at once."""
+    messages = [make_message(f"m{i}") for i in range(5)]
+    in_flight = 0
+    peak = 0
+
+    async def fake_pipeline(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"processing": {"entities": [{"id": kwargs["message_id"]}]}}
+
+    service.extraction_pipeline.process_chat_message = fake_pipeline
+    service.entity_extractor.process_documents_batch.return_value = {}
+    service.db.execute.return_value = scalars_result(messages)
+
+    results = service.process_pending_messages(limit=5)
+
+    assert results["success"] == 5
+    assert [d["message_id"] for d in results["details"]] == [m.id for m in messages]
+    assert peak == 2
+    # Conversation and user come from the eager-loaded batch query, not one query per message
+    selects = [call for call in service.db.execute.call_args_list if not isinstance(call.args[0], Update)]
+    assert len(selects) == 1
+    assert bulk_flag_updates(service.db) == {True: [m.id for m in messages]}
+    service.db.commit.assert_called_once()
+
+
+def test_entity_extraction_is_batched_across_messages(service):
+    """User messages share batched extraction calls; assistant messages are left out."""
+    service.extraction_batch_size = 2
+    messages = [make_message("m0"), make_message("m1"), make_message("m2"),
+                make_message("a0", role=MessageRole.ASSISTANT)]
+    service.entity_extractor.process_documents_batch.side_effect = lambda group: {
+        doc_id: {"entities": [{"text": doc_id}], "relationships": []} for doc_id, _ in group
+    }
+    received = {}
+
+    async def fake_pipeline(**kwargs):
+        received[kwargs["message_id"]] = kwargs["entity_results"]
+        return {"processing": {"entities": kwargs["entity_results"]["entities"]}}
+
+    service.extraction_pipeline.process_chat_message = fake_pipeline
+    service.db.execute.return_value = scalars_result(messages)
+
+    results = service.process_pending_messages(limit=4)
+
+    groups = [call.args[0] for call in service.entity_extractor.process_documents_batch.call_args_list]
+    assert sorted(len(group) for group in groups) == [1, 2]
+    assert received == {m: {"entities": [{"text": m}], "relationships": []} for m in ("m0", "m1", "m2")}
+    assert results["success"] == 3
+    assert results["skipped"] == 1
+    assert bulk_flag_updates(service.db) == {True: ["m0", "m1", "m2"], False: ["a0"]}
+
+
+def test_pending_query_leaves_assistant_and_empty_messages_to_sql(service):
+    """Ineligible messages are flagged by one UPDATE and excluded from the limited select."""
+    service.db.execute.return_value = scalars_result([])
+
+    service.process_pending_messages(limit=5)
+
+    skip, select_ = (call.args[0] for call in service.db.execute.call_args_list)
+    assert isinstance(skip, Update)
+    assert skip.compile().params["is_stored_in_graphiti"] is False
+    where = str(select_.whereclause.compile())
+    assert "chat_message.role != :role_1" in where
+    assert "length(trim(chat_message.content)) > :length_1" in where
+    service.db.commit.assert_called_once()
+
+
+def test_failed_message_does_not_roll_back_the_batch(service):
+    """One failing message is reported as an error while the rest of the batch still commits."""
+    messages = [make_message("m0"), make_message("m1")]
+
+    async def fake_pipeline(**kwargs):
+        if kwargs["message_id"] == "m1":
+            raise RuntimeError("neo4j unavailable")
+        return {"processing": {"entities": [{"id": kwargs["message_id"]}]}}
+
+    service.extraction_pipeline.process_chat_message = fake_pipeline
+    service.entity_extractor.process_documents_batch.return_value = {}
+    service.db.execute.return_value = scalars_result(messages)
+
+    results = service.process_pending_messages(limit=2)
+
+    assert (results["success"], results["errors"]) == (1, 1)
+    assert bulk_flag_updates(service.db) == {True: ["m0"]}
+    service.db.rollback.assert_not_called()
+    service.db.commit.assert_called_once()
+
+
+@pytest.mark.parametrize("content,expected", [
+    ("ok", False),
+    ("Thanks, sounds good!", False),
+    ("👍", False),
+    ("i love tuna", True),
+    ("I'm 28", True),
+])
+def test_is_extractable(content, expected):
+    assert is_extractable(content) is expected
+
+
+def test_filler_messages_skip_the_pipeline(service):
+    """Acknowledgements are marked processed without any extraction call."""
+    messages = [make_message("m0", content="ok thanks")]
+    service.extraction_pipeline.process_chat_message = MagicMock()
+    service.db.execute.return_value = scalars_result(messages)
+
+    results = service.process_pending_messages(limit=1)
+
+    assert results["details"][0]["reason"] == "too_short"
+    service.extraction_pipeline.process_chat_message.assert_not_called()
+    service.entity_extractor.process_documents_batch.assert_not_called()
+    assert bulk_flag_updates(service.db) == {False: ["m0"]}
+
+
+def test_writes_start_before_all_extraction_batches_finish(service):
+    """A message moves on to the write stage as soon as its own extraction batch returns."""
+    service.extraction_batch_size = 2
+    messages = [make_message(f"m{i}") for i in range(4)]
+    events = []
+
+    def extract(group):
+        if group[0][0] == "m2":
+            time.sleep(0.2)
+        events.append(f"extracted {group[0][0]}")
+        return {doc_id: {"entities": [], "relationships": []} for doc_id, _ in group}
+
+    async def fake_pipeline(**kwargs):
+        events.append(f"write {kwargs['message_id']}")
+        return {"processing": {"entities": [{"id": kwargs["message_id"]}]}}
+
+    service.entity_extractor.process_documents_batch.side_effect = extract
+    service.extraction_pipeline.process_chat_message = fake_pipeline
+    service.db.execute.return_value = scalars_result(messages)
+
+    results = service.process_pending_messages(limit=4)
+
+    assert results["success"] == 4
+    assert events.index("write m0") < events.index("extracted m2")
+
+
+def test_process_conversation_pages_through_messages(service):
+    """Long conversations are read, processed and committed one page at a time."""
+    first_page = [make_message("m1"), make_message("m2")]
+    second_page = [make_message("m3")]
+
+    async def fake_pipeline(**kwargs):
+        return {"processing": {"entities": [{"id": kwargs["message_id"]}]}}
+
+    service.extraction_pipeline.process_chat_message = fake_pipeline
+    service.entity_extractor.process_documents_batch.return_value = {}
+    pages = iter([scalars_result(first_page), scalars_result(second_page)])
+    selects = []
+
+    def execute(statement):
+        if isinstance(statement, Update):
+            return MagicMock()
+        selects.append(str(statement))
+        return next(pages)
+
+    service.db.execute.side_effect = execute
+
+    with patch("app.services.conversation.graphiti_ingestion.settings.GRAPHITI_INGEST_PAGE_SIZE", 2):
+        results = service.process_conversation("c-1")
+
+    assert (results["total"], results["success"]) == (3, 3)
+    assert service.db.commit.call_count == 2
+    # Pages follow chronological order, resuming after the last (created_at, id) seen
+    assert "ORDER BY chat_message.created_at, chat_message.id" in selects[0]
+    assert "(chat_message.created_at, chat_message.id) >" in selects[1]
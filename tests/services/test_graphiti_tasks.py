@@ -0,0 +1,51 @@
+"""Tests for buffering chat messages into batched Graphiti tasks."""
+
+from unittest.mock import MagicMock, patch
+
+from app.worker.tasks import graphiti_tasks
+
+
+def test_only_the_first_buffered_message_schedules_a_flush():
+    """Messages arriving within the flush window share one scheduled flush task."""
+    client = MagicMock()
+    client.set.side_effect = [True, None]
+
+    with patch.object(graphiti_tasks, "get_redis_client", return_value=client), \
+         patch.object(graphiti_tasks.flush_buffered_messages_graphiti, "apply_async") as apply_async:
+        first = graphiti_tasks.enqueue_message_for_graphiti("m0")
+        second = graphiti_tasks.enqueue_message_for_graphiti("m1")
+
+    assert [call.args[1] for call in client.rpush.call_args_list] == ["m0", "m1"]
+    apply_async.assert_called_once()
+    assert first == apply_async.return_value.id
+    assert second is None
+
+
+def test_flush_drains_the_buffer_in_batches():
+    """The flush task processes buffered IDs in batches until the list is empty."""
+    client = MagicMock()
+    client.lpop.side_effect = [[b"m0", b"m1"], [b"m2"], None]
+
+    with patch.object(graphiti_tasks, "get_redis_client", return_value=client), \
+         patch.object(graphiti_tasks, "_process_messages_graphiti_sync",
+                      side_effect=lambda ids: {"total": len(ids), "success": len(ids)}) as process:
+        result = graphiti_tasks.flush_buffered_messages_graphiti()
+
+    assert [call.args[0] for call in process.call_args_list] == [["m0", "m1"], ["m2"]]
+    assert result == {"total": 3, "success": 3, "skipped": 0, "errors": 0}
+    client.delete.assert_called_once_with(graphiti_tasks.FLUSH_SCHEDULED_KEY)
+
+
+def test_failed_batch_is_requeued_for_a_later_flush():
+    """A batch that fails as a whole goes back on the buffer and schedules another flush."""
+    client = MagicMock()
+    client.lpop.side_effect = [[b"m0", b"m1"], None]
+
+    with patch.object(graphiti_tasks, "get_redis_client", return_value=client), \
+         patch.object(graphiti_tasks, "_process_messages_graphiti_sync", side_effect=RuntimeError("db down")), \
+         patch.object(graphiti_tasks.flush_buffered_messages_graphiti, "apply_async") as apply_async:
+        result = graphiti_tasks.flush_buffered_messages_graphiti()
+
+    assert result["status"] == "error"
+    client.rpush.assert_called_once_with(graphiti_tasks.PENDING_MESSAGES_KEY, "m0", "m1")
+    apply_async.assert_called_once()
@@ -0,0 +1,47 @@
+"""Tests for chat message importance scoring."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.db.models.chat_message import MessageRole
+from app.services.conversation.base_mem0_ingestion import BaseChatMem0Ingestion
+
+
+class ScoringIngestion(BaseChatMem0Ingestion):
+    def _calculate_importance(self, message):
+        return super()._calculate_importance(message)
+
+
+def make_message(role, content, importance_score=None):
+    return SimpleNamespace(role=role, content=content, importance_score=importance_score)
+
+
+MESSAGES = [
+    make_message(MessageRole.USER, "hi"),
+    make_message(MessageRole.USER, "Important: the meeting is urgent, don't forget the deadline!"),
+    make_message(MessageRole.USER, "remember remember " * 40),
+    make_message(MessageRole.SYSTEM, "Schedule update"),
+    make_message(MessageRole.ASSISTANT, "I need to remember that"),
+]
+
+
+def test_batch_scores_match_single_message_scores():
+    service = ScoringIngestion(db_session=None)
+
+    batch = service._calculate_importance_batch(MESSAGES)
+
+    assert batch.tolist() == pytest.approx([service._calculate_importance(m) for m in MESSAGES])
+
+
+def test_prescore_only_fills_unscored_ingestible_messages():
+    service = ScoringIngestion(db_session=None)
+    scored = make_message(MessageRole.USER, "hi", importance_score=0.9)
+    unscored = make_message(MessageRole.USER, "urgent deadline")
+    assistant = make_message(MessageRole.ASSISTANT, "hello")
+
+    service._prescore_messages([scored, unscored, assistant])
+
+    assert scored.importance_score == 0.9
+    assert unscored.importance_score == pytest.approx(service._calculate_importance(unscored))
+    assert assistant.importance_score is None
@@ -0,0 +1,101 @@
+"""Tests for draining pending chat messages into Mem0."""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.db.models.chat_message import MessageRole
+from app.services.conversation.mem0_ingestion_sync import SyncChatMem0Ingestion
+
+
+def make_message(message_id, role, conversation_id="conv-1"):
+    return SimpleNamespace(
+        id=message_id, role=role, content=f"content {message_id}", user_id="user-1",
+        conversation_id=conversation_id, importance_score=None, processed_in_mem0=False,
+        is_stored_in_mem0=False, mem0_message_id=None, created_at=None, tokens=None,
+        meta_data={},
+    )
+
+
+def scalars_result(rows):
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = rows
+    return result
+
+
+@pytest.fixture
+def service():
+    with patch("app.services.conversation.mem0_ingestion_sync.get_mem0_client"), \
+         patch("app.services.conversation.base_mem0_ingestion.bump_memory_version"):
+        yield SyncChatMem0Ingestion(db_session=MagicMock())
+
+
+def test_pending_messages_share_one_lookup_and_commit(service):
+    """The batch needs one conversation query and one commit, whatever its size."""
+    messages = [
+        make_message("m1", MessageRole.USER),
+        make_message("m2", MessageRole.ASSISTANT),
+        make_message("m3", MessageRole.USER),
+        make_message("m4", MessageRole.USER, conversation_id="missing"),
+    ]
+    conversation = SimpleNamespace(id="conv-1", title="Chat", meta_data={})
+    service.db.execute.side_effect = [scalars_result(messages), scalars_result([conversation])]
+    service.mem0_client.add.side_effect = lambda *args, **kwargs: {"results": [{"id": f"mem-{kwargs['user_id']}"}]}
+
+    results = service.process_pending_messages(limit=10)
+
+    assert (results["success"], results["skipped"], results["errors"]) == (2, 1, 1)
+    assert [d["message_id"] for d in results["details"]] == ["m1", "m2", "m3", "m4"]
+    assert service.mem0_client.add.call_count == 2
+    assert service.db.execute.call_count == 2
+    service.db.commit.assert_called_once()
+    assert messages[0].is_stored_in_mem0 and messages[1].processed_in_mem0
+    assert not messages[3].processed_in_mem0
+
+
+def test_failed_mem0_add_leaves_message_pending(service):
+    """A Mem0 failure is reported for that message only and it stays unprocessed."""
+    messages = [make_message("m1", MessageRole.USER), make_message("m2", MessageRole.USER)]
+    conversation = SimpleNamespace(id="conv-1", title="Chat", meta_data={})
+    service.db.execute.side_effect = [scalars_result(messages), scalars_result([conversation])]
+    service.mem0_client.add.side_effect = [RuntimeError("mem0 down"), {"results": [{"id": "mem-2"}]}]
+
+    results = service.process_pending_messages(limit=10)
+
+    assert (results["success"], results["errors"]) == (1, 1)
+    assert not messages[0].processed_in_mem0
+    assert messages[1].mem0_message_id == "mem-2"
+
+
+def test_process_conversation_counts_results_and_summarizes(service):
+    """Processing a conversation tallies outcomes and triggers the summary check."""
+    messages = [make_message("m1", MessageRole.USER), make_message("m2", MessageRole.ASSISTANT)]
+    conversation = SimpleNamespace(id="conv-1", title="Chat", meta_data={})
+    service.db.execute.side_effect = [scalars_result(messages), scalars_result([conversation])]
+    service.mem0_client.add.return_value = {"results": [{"id": "mem-1"}]}
+
+    with patch.object(service, "_maybe_generate_summary") as summarize:
+        results = service.process_conversation("conv-1")
+
+    assert (results["success"], results["skipped"], results["errors"]) == (1, 1, 0)
+    summarize.assert_called_once_with("conv-1")
+
+
+def test_process_conversation_pages_through_messages(service):
+    """Long conversations are read and ingested one page at a time."""
+    first_page = [make_message("m1", MessageRole.USER), make_message("m2", MessageRole.USER)]
+    second_page = [make_message("m3", MessageRole.USER)]
+    conversation = SimpleNamespace(id="conv-1", title="Chat", meta_data={})
+    service.db.execute.side_effect = [
+        scalars_result(first_page), scalars_result([conversation]),
+        scalars_result(second_page), scalars_result([conversation]),
+    ]
+    service.mem0_client.add.return_value = {"results": [{"id": "mem"}]}
+
+    with patch("app.services.conversation.mem0_ingestion_sync.settings.MEM0_INGEST_PAGE_SIZE", 2), \
+         patch.object(service, "_maybe_generate_summary"):
+        results = service.process_conversation("conv-1")
+
+    assert (results["total"], results["success"]) == (3, 3)
+    assert service.db.commit.call_count == 2
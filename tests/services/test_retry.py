@@ -0,0 +1,71 @@
+"""Tests for the shared transient-error retry policy."""
+
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.common.retry import is_transient_http_error, transient_retry
+
+
+def _status_error(status):
+    request = httpx.Request("POST", "https://api.mem0.ai/v2/memories/search/")
+    response = httpx.Response(status, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def test_only_rate_limits_server_errors_and_transport_errors_are_transient():
+    assert is_transient_http_error(_status_error(429))
+    assert is_transient_http_error(_status_error(503))
+    assert is_transient_http_error(httpx.ConnectError("refused"))
+    assert not is_transient_http_error(_status_error(400))
+    assert not is_transient_http_error(ValueError("bad input"))
+
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried_then_succeed():
+    call = AsyncMock(side_effect=[_status_error(503), _status_error(429), "ok"])
+
+    with patch("asyncio.sleep", new=AsyncMock()):
+        async for attempt in transient_retry(is_transient_http_error):
+            with attempt:
+                result = await call()
+
+    assert result == "ok"
+    assert call.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_permanent_failures_are_raised_immediately():
+    call = AsyncMock(side_effect=_status_error(401))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        async for attempt in transient_retry(is_transient_http_error):
+            with attempt:
+                await call()
+
+    assert call.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_mem0_search_retries_a_hung_attempt_within_its_budget():
+    """A stalled Mem0 search attempt times out and is retried before the overall deadline."""
+    import time
+
+    from app.services.memory import MemoryService
+
+    calls = []
+
+    def search(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            time.sleep(0.3)
+        return {"results": [{"id": "m1", "memory": "I like hiking", "score": 0.9}]}
+
+    with patch("app.services.memory.get_mem0_client", return_value=MagicMock(search=search)), \
+         patch("app.services.memory.settings.MEM0_SEARCH_ATTEMPT_TIMEOUT_SECONDS", 0.1), \
+         patch("asyncio.sleep", new=AsyncMock()):
+        service = MemoryService()
+        results = await service.search(query="what do I like?", user_id="user-1", timeout=1.0)
+
+    assert len(calls) == 2
+    assert results[0]["similarity"] == 0.9
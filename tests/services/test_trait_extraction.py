@@ -6,6 +6,7 @@ import json
 from datetime import datetime
 
 from app.services.traits import TraitExtractionService, Trait
+from app.services.traits.service import _trait_indexes
 
 
 def test_trait_class():
@@ -110,4 +111,201 @@ async def test_extract_traits_chat(mock_chat_extract, mock_process_traits, mock_
     # Check result
     assert result["status"] == "success"
     assert len(result["traits"]) == 1
-    assert result["traits"][0]["name"] == "Python programming" 
\ No newline at end of file
+    assert result["traits"][0]["name"] == "Python programming" 
+
+def test_apply_traits_to_profile_updates_and_adds():
+    """Known traits are replaced when confidence does not drop; new ones are appended."""
+    with patch("app.services.traits.service.ChatTraitExtractor"), \
+         patch("app.services.traits.service.DocumentTraitExtractor"):
+        service = TraitExtractionService()
+    profile = MagicMock(
+        skills=json.dumps([{"name": "Python", "confidence": 0.8}]),
+        interests=[{"name": "Hiking", "confidence": 0.95}],
+        preferences={},
+        dislikes=[],
+        attributes=[],
+        likes=[],
+    )
+    traits = [
+        Trait(trait_type="skill", name="python", confidence=0.9, evidence="", source="chat", strength=0.6),
+        Trait(trait_type="interest", name="hiking", confidence=0.8, evidence="", source="chat"),
+        Trait(trait_type="like", name="Tuna", confidence=0.9, evidence="", source="chat"),
+        Trait(trait_type="preference", name="Window seat", confidence=0.9, evidence="", source="chat"),
+    ]
+
+    updates = service._apply_traits_to_profile(profile, traits)
+
+    assert updates["skills_updated"] == 1
+    assert profile.skills[0]["name"] == "python" and profile.skills[0]["proficiency"] == 0.6
+    assert updates["interests_updated"] == 0 and profile.interests[0]["confidence"] == 0.95
+    assert "likes_added" not in updates and profile.likes == []
+    assert profile.preferences["general"]["Window seat"]["confidence"] == 0.9
+
+
+
+def test_trait_indexes_are_reused_until_the_profile_reloads():
+    """Consecutive updates to one profile patch the cached name indexes instead of rebuilding them."""
+    with patch("app.services.traits.service.ChatTraitExtractor"), \
+         patch("app.services.traits.service.DocumentTraitExtractor"):
+        service = TraitExtractionService()
+    profile = MagicMock(skills=[], interests=[], preferences={}, dislikes=[], attributes=[], likes=[])
+
+    service._apply_traits_to_profile(profile, [Trait(trait_type="skill", name="Go", confidence=0.8, evidence="", source="chat")])
+    maps = _trait_indexes[profile][1]
+    updates = service._apply_traits_to_profile(profile, [Trait(trait_type="skill", name="go", confidence=0.9, evidence="", source="chat")])
+
+    assert _trait_indexes[profile][1] is maps
+    assert updates["skills_updated"] == 1 and [s["name"] for s in profile.skills] == ["go"]
+
+    # A reloaded section invalidates the cached indexes
+    profile.skills = [{"name": "Rust", "confidence": 0.9}]
+    service._apply_traits_to_profile(profile, [Trait(trait_type="skill", name="rust", confidence=0.95, evidence="", source="chat")])
+    assert _trait_indexes[profile][1] is not maps
+    assert [s["name"] for s in profile.skills] == ["rust"]
+
+
+@pytest.mark.asyncio
+async def test_update_user_profile_writes_traits_with_one_update():
+    """Trait columns go out in a single UPDATE and leave no pending ORM changes."""
+    from sqlalchemy import inspect
+    from sqlalchemy.sql.dml import Update
+    from app.db.models.user_profile import UserProfile
+
+    profile = UserProfile(id="p-1", skills=[], interests=[], preferences={}, dislikes=[], attributes=[])
+    db = MagicMock()
+    db.get.return_value = MagicMock(profile=profile)
+    with patch("app.services.traits.service.ChatTraitExtractor"), \
+         patch("app.services.traits.service.DocumentTraitExtractor"):
+        service = TraitExtractionService(db_session=db)
+
+    result = await service._update_user_profile(
+        "user-1", [Trait(trait_type="skill", name="Go", confidence=0.9, evidence="", source="chat")]
+    )
+
+    assert result["updated"] is True
+    updates = [call.args[0] for call in db.execute.call_args_list if isinstance(call.args[0], Update)]
+    assert len(updates) == 1
+    assert updates[0].compile().params["skills"][0]["name"] == "Go"
+    assert not inspect(profile).attrs.skills.history.has_changes()
+
+
+@pytest.mark.asyncio
+async def test_update_user_profile_skips_the_write_when_nothing_changes():
+    """Traits that don't beat what the profile already holds cause no UPDATE."""
+    from sqlalchemy.sql.dml import Update
+    from app.db.models.user_profile import UserProfile
+
+    profile = UserProfile(id="p-1", skills=[{"name": "Go", "confidence": 0.95}], interests=[],
+                          preferences={}, dislikes=[], attributes=[])
+    db = MagicMock()
+    db.get.return_value = MagicMock(profile=profile)
+    with patch("app.services.traits.service.ChatTraitExtractor"), \
+         patch("app.services.traits.service.DocumentTraitExtractor"):
+        service = TraitExtractionService(db_session=db)
+
+    result = await service._update_user_profile(
+        "user-1", [Trait(trait_type="skill", name="go", confidence=0.9, evidence="", source="chat")]
+    )
+
+    assert result["updated"] is True
+    assert not any(isinstance(call.args[0], Update) for call in db.execute.call_args_list)
+    db.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_like_traits_are_not_staged_or_written():
+    """UserProfile has no likes column, so like traits neither count as changes nor trigger a write."""
+    from sqlalchemy.sql.dml import Update
+    from app.db.models.user_profile import UserProfile
+
+    profile = UserProfile(id="p-1", skills=[], interests=[], preferences={}, dislikes=[], attributes=[])
+    db = MagicMock()
+    db.get.return_value = MagicMock(profile=profile)
+    with patch("app.services.traits.service.ChatTraitExtractor"), \
+         patch("app.services.traits.service.DocumentTraitExtractor"):
+        service = TraitExtractionService(db_session=db)
+
+    result = await service._update_user_profile(
+        "user-1", [Trait(trait_type="like", name="Tuna", confidence=0.9, evidence="", source="chat")]
+    )
+
+    assert not any(result["updates"].values())
+    assert not hasattr(profile, "likes")
+    assert not any(isinstance(call.args[0], Update) for call in db.execute.call_args_list)
+    db.commit.assert_not_called()
+
+
+def test_restating_a_stored_trait_is_not_an_update():
+    """A trait identical to the stored one apart from its timestamp leaves the profile untouched."""
+    with patch("app.services.traits.service.ChatTraitExtractor"), \
+         patch("app.services.traits.service.DocumentTraitExtractor"):
+        service = TraitExtractionService()
+    stored = {"name": "Chess", "confidence": 0.9, "source": "chat", "evidence": "plays weekly",
+              "strength": 0.7, "last_updated": "2024-01-01T00:00:00"}
+    profile = MagicMock(skills=[], interests=[stored], preferences={}, dislikes=[], attributes=[], likes=[])
+
+    updates = service._apply_traits_to_profile(
+        profile, [Trait(trait_type="interest", name="Chess", confidence=0.9, evidence="plays weekly", source="chat")]
+    )
+
+    assert not any(updates.values())
+    assert profile.interests[0] is stored
+
+
+def test_conflicting_interest_is_removed_and_indexes_stay_valid():
+    """The less confident side of an interest/dislike conflict is deleted and the cached indexes follow."""
+    with patch("app.services.traits.service.ChatTraitExtractor"), \
+         patch("app.services.traits.service.DocumentTraitExtractor"):
+        service = TraitExtractionService()
+    profile = MagicMock(
+        skills=[],
+        interests=[{"name": "Golf", "confidence": 0.8}, {"name": "Jazz", "confidence": 0.8}, {"name": "Chess", "confidence": 0.8}],
+        preferences={},
+        dislikes=[{"name": "Jazz", "confidence": 0.95}],
+        attributes=[],
+        likes=[{"name": "Jazz", "confidence": 0.9}],
+    )
+
+    service._apply_traits_to_profile(profile, [Trait(trait_type="interest", name="Chess", confidence=0.9, evidence="new", source="chat")])
+
+    assert [i["name"] for i in profile.interests] == ["Golf", "Chess"]
+    assert _trait_indexes[profile][1]["interests"]["chess"] == (1, profile.interests[1])
+
+
+def test_near_tie_conflict_keeps_both_sides():
+    """An interest/dislike conflict within CONFIDENCE_EPSILON leaves both lists untouched."""
+    with patch("app.services.traits.service.ChatTraitExtractor"), \
+         patch("app.services.traits.service.DocumentTraitExtractor"):
+        service = TraitExtractionService()
+    profile = MagicMock(
+        skills=[],
+        interests=[{"name": "Jazz", "confidence": 0.8}],
+        preferences={},
+        dislikes=[],
+        attributes=[],
+        likes=[{"name": "Jazz", "confidence": 0.9}],
+    )
+
+    updates = service._apply_traits_to_profile(profile, [Trait(trait_type="dislike", name="Jazz", confidence=0.82, evidence="new", source="chat")])
+
+    assert [i["name"] for i in profile.interests] == ["Jazz"]
+    assert [d["name"] for d in profile.dislikes] == ["Jazz"]
+    assert updates["dislikes_added"] == 1
+
+def test_process_traits_applies_per_type_thresholds():
+    """A trait type's own threshold applies when it is stricter than the general one."""
+    with patch("app.services.traits.service.ChatTraitExtractor"), \
+         patch("app.services.traits.service.DocumentTraitExtractor"):
+        service = TraitExtractionService()
+    service.MIN_CONFIDENCE_TRAIT_SKILL = 0.85
+
+    traits = [
+        Trait(trait_type="skill", name="Go", confidence=0.9, evidence="", source="chat"),
+        Trait(trait_type="interest", name="Chess", confidence=0.9, evidence="", source="chat"),
+        Trait(trait_type="like", name="Tea", confidence=0.7, evidence="", source="chat"),
+    ]
+
+    # Chat confidence is weighted by 0.9: 0.81, 0.81, 0.63
+    processed = service._process_traits(traits, "chat")
+
+    assert [t.name for t in processed] == ["Chess"]